@@ -1,22 +1,90 @@
-from typing import Optional, List, Dict
-import anthropic
-import openai
-from mistralai.client import MistralClient
-from mistralai.models.chat_completion import ChatMessage
+from typing import Optional, List, Dict, Iterator, Any, Tuple
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import time
 from config import Config
+from model_catalog import model_catalog
+from response_cache import response_cache, make_key
+from prompt_templates import template_registry
+from input_compaction import estimate_tokens
+from rate_limits import provider_limits, RateLimitedError
+from metrics import stage, record_stage, record_completion, first_token_seconds
+from provider_backends import get_backend
+from resume_sections import Section, split_sections, join_sections, strip_fences
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class ProviderError(Exception):
+    """A provider call failed: an API, transport or timeout error from the provider's SDK."""
+
+class CompletionInfo:
+    """Details about the most recent optimize call in the current context."""
+
+    def __init__(self, provider: str, model: str, cache_status: str,
+                 usage: Optional[Dict[str, Optional[int]]] = None,
+                 sections: Optional[Dict[str, int]] = None):
+        self.provider = provider
+        self.model = model
+        self.cache_status = cache_status  # 'hit', 'miss' or 'bypass'
+        self.usage = usage  # None when the response came from the cache
+        self.sections = sections  # block counts of an incremental optimization
+
+# Set by AIProvider.optimize_resume so callers (e.g. the API) can report on the call
+last_completion: ContextVar[Optional[CompletionInfo]] = ContextVar('last_completion', default=None)
+
+def _publish_completion(info: CompletionInfo) -> None:
+    """Report a finished optimize call to the caller and to the metrics."""
+    last_completion.set(info)
+    record_completion(info.provider, info.model, info.cache_status, info.usage)
+
+def _empty_usage() -> Dict[str, Optional[int]]:
+    return {"input_tokens": None, "cached_input_tokens": None, "uncached_input_tokens": None, "output_tokens": None}
+
+# Sent with each block of an incremental optimization, after any custom prompt
+SECTION_PROMPT = (
+    "The resume content below is {label} of a longer resume; the other sections are optimized "
+    "separately. Optimize only this part and output only its optimized text, without a section "
+    "heading, code fences or any other text."
+)
+
+def _merge_sections(sections: List[Section], infos: List[Optional[CompletionInfo]],
+                    provider: str, model: str, use_cache: bool) -> CompletionInfo:
+    """One CompletionInfo for an incremental optimization, adding up the usage of its blocks."""
+    sent = [info for info in infos if info is not None and info.cache_status != 'hit']
+    usage = _empty_usage()
+    for info in sent:
+        for name, value in (info.usage or {}).items():
+            if value is not None:
+                usage[name] = (usage[name] or 0) + value
+    optimized = sum(1 for section in sections if section.optimize)
+    report = {"total": len(sections), "optimized": optimized, "sent": len(sent),
+              "reused": optimized - len(sent), "unchanged": len(sections) - optimized}
+    if not sent:
+        return CompletionInfo(provider, model, 'hit', None, report)
+    return CompletionInfo(provider, model, 'miss' if use_cache else 'bypass', usage, report)
+
 class AIProvider:
+    temperature = 0.7
+
     def __init__(self, provider: str = Config.DEFAULT_AI_PROVIDER, model: Optional[str] = None):
         self.provider = provider.lower()
+        # Imports the provider's SDK the first time this provider is used
+        self.backend = get_backend(self.provider)
+        self._limiter = provider_limits.get(self.provider)
         self._setup_client()
-        
-        # Get available models from the API
-        self.available_models = self._fetch_available_models()
+        self._async_client = None
+
+        # Known models are accepted without a models fetch, which would hold up a cold start;
+        # anything else is checked against the provider's API
+        known_models = model_catalog.peek(self.provider) or self.backend.fallback_models
+        if model and model in known_models:
+            self.available_models = list(known_models)
+        else:
+            self.available_models = self._fetch_available_models()
         
         # If no model specified, use the first available model (usually the latest)
         self.model = model or self.available_models[0] if self.available_models else None
@@ -27,176 +95,480 @@ class AIProvider:
         if self.model not in self.available_models:
             raise ValueError(f"Invalid model '{self.model}' for provider '{self.provider}'")
 
+    def _setup_async_client(self):
+        """Create the async API client; done lazily so sync-only workers never open one."""
+        return self.backend.create_async_client()
+
     def _setup_client(self):
         """Initialize the API client based on provider."""
-        if self.provider == 'openai':
-            openai.api_key = Config.OPENAI_API_KEY
-        elif self.provider == 'anthropic':
-            self.client = anthropic.Anthropic(api_key=Config.ANTHROPIC_API_KEY)
-        elif self.provider == 'mistral':
-            self.client = MistralClient(api_key=Config.MISTRAL_API_KEY)
-        else:
-            raise ValueError(f"Unsupported AI provider: {self.provider}")
+        self.client = self.backend.create_client()
 
     def _fetch_available_models(self) -> List[str]:
-        """Fetch available models directly from the provider's API."""
-        try:
-            if self.provider == 'openai':
-                # Use OpenAI's models endpoint
-                response = openai.models.list()
-                models = [model.id for model in response.data 
-                         if model.id.startswith(('gpt-4', 'gpt-3'))]
-                logger.info(f"Fetched OpenAI models: {models}")
-                return models
-
-            elif self.provider == 'anthropic':
-                # For Anthropic, models are properties of the client
-                models = self.client.list_models()
-                available_models = [model.id for model in models 
-                                 if model.id.startswith('claude')]
-                logger.info(f"Fetched Anthropic models: {available_models}")
-                return available_models
-
-            elif self.provider == 'mistral':
-                # Use Mistral's models endpoint
-                response = self.client.list_models()
-                models = [model.id for model in response.data]
-                logger.info(f"Fetched Mistral models: {models}")
-                return models
+        """Get available models from the shared model catalog cache."""
+        return model_catalog.get(self.provider, self._list_models, self._get_fallback_models)
 
-        except Exception as e:
-            logger.error(f"Error fetching models for {self.provider}: {str(e)}")
-            # Fallback to default models if API call fails
-            return self._get_fallback_models()
+    def _list_models(self) -> List[str]:
+        """Fetch available models directly from the provider's API."""
+        return self.backend.list_models(self.client)
 
     def _get_fallback_models(self) -> List[str]:
         """Fallback model list in case API is unavailable."""
-        fallbacks = {
-            'openai': [
-                'gpt-4-turbo-preview',
-                'gpt-4',
-                'gpt-3.5-turbo'
-            ],
-            'anthropic': [
-                'claude-3-opus-20240229',
-                'claude-3-sonnet-20240229',
-                'claude-2.1'
-            ],
-            'mistral': [
-                'mistral-large-latest',
-                'mistral-medium-latest',
-                'mistral-small-latest'
-            ]
-        }
         logger.warning(f"Using fallback models for {self.provider}")
-        return fallbacks.get(self.provider, [])
+        return list(self.backend.fallback_models)
 
-    def optimize_resume(
+    def build_prompt(
         self,
         resume_content: str,
         guidelines: Optional[str] = None,
         job_description: Optional[str] = None,
         custom_prompt: Optional[str] = None,
-        base_prompt_path: str = "inputs/base_prompt.md"
+        base_prompt_path: str = "inputs/base_prompt.md",
+        template: Optional[str] = None
     ) -> str:
-        # Read base prompt from file
+        """Assemble the full optimization prompt from a cached, compiled template.
+
+        `template` selects a named template; otherwise the template at
+        `base_prompt_path` is used.
+        """
         try:
-            with open(base_prompt_path, 'r', encoding='utf-8') as f:
-                base_prompt = f.read()
+            prompt_template = (template_registry.get(template) if template
+                               else template_registry.load(base_prompt_path))
         except FileNotFoundError:
             logger.error(f"Base prompt file not found: {base_prompt_path}")
             raise
 
-        if job_description:
-            base_prompt += (
-                "Job Description to optimize for:\n"
-                "```\n"
-                f"{job_description}\n"
-                "```\n\n"
-           )
-
-        if guidelines:
-            base_prompt += (
-                "Resume Guidelines:\n"
-                "```\n"
-                f"{guidelines}\n"
-                "```\n\n"
-                "Follow these guidelines strictly for formatting and structure.\n\n"
+        return prompt_template.render(
+            resume_content=resume_content,
+            guidelines=guidelines,
+            job_description=job_description,
+            custom_prompt=custom_prompt
+        )
+
+    def optimize_resume(
+        self,
+        resume_content: str,
+        guidelines: Optional[str] = None,
+        job_description: Optional[str] = None,
+        custom_prompt: Optional[str] = None,
+        base_prompt_path: str = "inputs/base_prompt.md",
+        template: Optional[str] = None,
+        use_cache: bool = True,
+        incremental: bool = False
+    ) -> str:
+        """Optimize a resume; with `incremental`, section by section (see optimize_sections)."""
+        if incremental:
+            return self.optimize_sections(resume_content, guidelines=guidelines, job_description=job_description,
+                                          custom_prompt=custom_prompt, base_prompt_path=base_prompt_path,
+                                          template=template, use_cache=use_cache)
+
+        with stage("prompt", self.provider, self.model):
+            base_prompt = self.build_prompt(
+                resume_content,
+                guidelines=guidelines,
+                job_description=job_description,
+                custom_prompt=custom_prompt,
+                base_prompt_path=base_prompt_path,
+                template=template
             )
 
-        if custom_prompt:
-            base_prompt += (
-                "Custom prompt:\n"
-                f"{custom_prompt}\n\n"
+        return self._optimize_prompt(base_prompt, use_cache)
+
+    def optimize_sections(
+        self,
+        resume_content: str,
+        guidelines: Optional[str] = None,
+        job_description: Optional[str] = None,
+        custom_prompt: Optional[str] = None,
+        base_prompt_path: str = "inputs/base_prompt.md",
+        template: Optional[str] = None,
+        use_cache: bool = True,
+        max_concurrency: int = Config.SECTION_MAX_CONCURRENCY
+    ) -> str:
+        """Optimize a resume one block at a time and stitch the results back together in order.
+
+        Each block (summary, one experience entry, skills, ...) is its own prompt, so it is
+        cached on its own: after a small edit only the changed block goes to the provider.
+        Blocks without a cached result are sent in parallel. Headings and the contact
+        header are kept as they are.
+        """
+        sections, prompts = self._section_prompts(resume_content, guidelines, job_description,
+                                                  custom_prompt, base_prompt_path, template)
+        texts, infos = [], []
+        for section, text, info in self._iter_sections(sections, prompts, use_cache, max_concurrency):
+            texts.append(text)
+            infos.append(info)
+        # Each block already counted in the metrics; the caller sees the whole optimization
+        last_completion.set(_merge_sections(sections, infos, self.provider, self.model, use_cache))
+        return join_sections(sections, texts)
+
+    def _section_prompts(self, resume_content: str, guidelines: Optional[str], job_description: Optional[str],
+                         custom_prompt: Optional[str], base_prompt_path: str, template: Optional[str]):
+        """The resume's blocks and the prompt for each, None for blocks kept as they are."""
+        with stage("prompt", self.provider, self.model):
+            sections = split_sections(resume_content)
+            prompts = []
+            for section in sections:
+                if not section.optimize:
+                    prompts.append(None)
+                    continue
+                instructions = SECTION_PROMPT.format(label=section.label())
+                prompts.append(self.build_prompt(
+                    section.text,
+                    guidelines=guidelines,
+                    job_description=job_description,
+                    custom_prompt=f"{custom_prompt}\n\n{instructions}" if custom_prompt else instructions,
+                    base_prompt_path=base_prompt_path,
+                    template=template
+                ))
+        return sections, prompts
+
+    def _iter_sections(
+        self,
+        sections: List[Section],
+        prompts: List[Optional[str]],
+        use_cache: bool,
+        max_concurrency: int
+    ) -> Iterator[Tuple[Section, str, Optional[CompletionInfo]]]:
+        """Yield (block, optimized text, completion info) in order, while later blocks are still running."""
+        def run(prompt: str):
+            optimized_content = self._optimize_prompt(prompt, use_cache)
+            return strip_fences(optimized_content), last_completion.get()
+
+        pending = [index for index, prompt in enumerate(prompts) if prompt is not None]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(pending))),
+                                thread_name_prefix="optimize-sections") as executor:
+            futures = {index: executor.submit(run, prompts[index]) for index in pending}
+            for index, section in enumerate(sections):
+                if index in futures:
+                    yield (section, *futures[index].result())
+                else:
+                    yield section, section.text, None
+
+    def _optimize_prompt(self, prompt: str, use_cache: bool = True) -> str:
+        """Complete an assembled prompt, going through the response cache."""
+        cache_key = make_key(prompt, self.provider, self.model, self.temperature)
+        if use_cache:
+            with stage("cache", self.provider, self.model):
+                cached = response_cache.get(cache_key)
+            if cached is not None:
+                _publish_completion(CompletionInfo(self.provider, self.model, 'hit'))
+                return cached
+
+        usage = _empty_usage()
+        with stage("provider", self.provider, self.model):
+            optimized_content = self._complete(prompt, usage)
+        response_cache.put(cache_key, optimized_content)
+        _publish_completion(CompletionInfo(self.provider, self.model, 'miss' if use_cache else 'bypass', usage))
+        return optimized_content
+
+    def optimize_batch(
+        self,
+        items: List[Dict[str, Any]],
+        max_concurrency: int = Config.BATCH_MAX_CONCURRENCY,
+        use_cache: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Optimize many items concurrently and return one result per item, in input order."""
+        results = list(self.iter_batch(items, max_concurrency=max_concurrency, use_cache=use_cache))
+        return sorted(results, key=lambda result: result["index"])
+
+    def iter_batch(
+        self,
+        items: List[Dict[str, Any]],
+        max_concurrency: int = Config.BATCH_MAX_CONCURRENCY,
+        use_cache: bool = True
+    ) -> Iterator[Dict[str, Any]]:
+        """Optimize many items concurrently, yielding each result as soon as it completes.
+
+        Each item holds optimize_resume arguments (`resume_content`, `guidelines`,
+        `job_description`, `custom_prompt`, `template`). Items that assemble to the same prompt
+        are sent to the provider once and share the result. Results carry the
+        item's `index` and a `status` of 'success' or 'error'.
+        """
+        prompts: Dict[str, str] = {}
+        indices: Dict[str, List[int]] = {}
+        for index, item in enumerate(items):
+            try:
+                prompt = self.build_prompt(**item)
+            except Exception as e:
+                yield {"index": index, "status": "error", "error": str(e)}
+                continue
+            cache_key = make_key(prompt, self.provider, self.model, self.temperature)
+            prompts.setdefault(cache_key, prompt)
+            indices.setdefault(cache_key, []).append(index)
+
+        if not prompts:
+            return
+
+        def run(prompt: str) -> Dict[str, Any]:
+            optimized_content = self._optimize_prompt(prompt, use_cache)
+            return {"optimized_content": optimized_content, "cache": last_completion.get().cache_status}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(prompts))),
+                                thread_name_prefix="optimize-batch") as executor:
+            futures = {executor.submit(run, prompt): cache_key for cache_key, prompt in prompts.items()}
+            for future in as_completed(futures):
+                try:
+                    outcome = {"status": "success", **future.result()}
+                except Exception as e:
+                    outcome = {"status": "error", "error": str(e)}
+                for index in indices[futures[future]]:
+                    yield {"index": index, **outcome}
+
+    async def aoptimize_resume(
+        self,
+        resume_content: str,
+        guidelines: Optional[str] = None,
+        job_description: Optional[str] = None,
+        custom_prompt: Optional[str] = None,
+        base_prompt_path: str = "inputs/base_prompt.md",
+        template: Optional[str] = None,
+        use_cache: bool = True,
+        incremental: bool = False
+    ) -> str:
+        """Async variant of optimize_resume using the provider's async client."""
+        if incremental:
+            return await self._aoptimize_sections(resume_content, guidelines, job_description, custom_prompt,
+                                                  base_prompt_path, template, use_cache)
+
+        with stage("prompt", self.provider, self.model):
+            base_prompt = self.build_prompt(
+                resume_content,
+                guidelines=guidelines,
+                job_description=job_description,
+                custom_prompt=custom_prompt,
+                base_prompt_path=base_prompt_path,
+                template=template
             )
 
-        base_prompt += (
-            "Resume content:\n"
-            "```\n"
-            f"{resume_content}\n"
-            "```\n\n"
-        )
+        return await self._aoptimize_prompt(base_prompt, use_cache)
+
+    async def _aoptimize_prompt(self, prompt: str, use_cache: bool = True) -> str:
+        """Async variant of _optimize_prompt."""
+        cache_key = make_key(prompt, self.provider, self.model, self.temperature)
+        if use_cache:
+            with stage("cache", self.provider, self.model):
+                cached = response_cache.get(cache_key)
+            if cached is not None:
+                _publish_completion(CompletionInfo(self.provider, self.model, 'hit'))
+                return cached
 
+        usage = _empty_usage()
+        with stage("provider", self.provider, self.model):
+            optimized_content = await self._acomplete(prompt, usage)
+        response_cache.put(cache_key, optimized_content)
+        _publish_completion(CompletionInfo(self.provider, self.model, 'miss' if use_cache else 'bypass', usage))
+        return optimized_content
+
+    async def _aoptimize_sections(self, resume_content: str, guidelines: Optional[str],
+                                  job_description: Optional[str], custom_prompt: Optional[str],
+                                  base_prompt_path: str, template: Optional[str], use_cache: bool,
+                                  max_concurrency: int = Config.SECTION_MAX_CONCURRENCY) -> str:
+        """Async variant of optimize_sections; blocks run as concurrent tasks."""
+        sections, prompts = self._section_prompts(resume_content, guidelines, job_description,
+                                                  custom_prompt, base_prompt_path, template)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run(section: Section, prompt: Optional[str]):
+            if prompt is None:
+                return section.text, None
+            async with semaphore:
+                optimized_content = await self._aoptimize_prompt(prompt, use_cache)
+            # Each task runs in a copy of the context, so this is the block's own completion
+            return strip_fences(optimized_content), last_completion.get()
+
+        results = await asyncio.gather(*(run(section, prompt) for section, prompt in zip(sections, prompts)))
+        last_completion.set(_merge_sections(sections, [info for _, info in results],
+                                            self.provider, self.model, use_cache))
+        return join_sections(sections, [text for text, _ in results])
+
+    def _complete(self, prompt: str, usage: Dict[str, Optional[int]]) -> str:
+        """Run the chat completion for an assembled prompt within the provider's rate limits, filling in `usage`."""
         try:
-            if self.provider == 'openai':
-                response = openai.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": "You are a professional resume optimization assistant."},
-                        {"role": "user", "content": base_prompt}
-                    ],
-                    temperature=0.7
-                )
-                return response.choices[0].message.content
-
-            elif self.provider == 'anthropic':
-                messages = [{
-                    "role": "user",
-                    "content": base_prompt
-                }]
-                response = self.client.messages.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=0.7
-                )
-                return response.content[0].text
-
-            elif self.provider == 'mistral':
-                messages = [
-                    ChatMessage(role="system", content="You are a professional resume optimization assistant."),
-                    ChatMessage(role="user", content=base_prompt)
-                ]
-                response = self.client.chat(
-                    model=self.model,
-                    messages=messages,
-                    temperature=0.7
-                )
-                return response.choices[0].message.content
+            return self._limiter.call(lambda: self._request_completion(prompt, usage),
+                                      self._reserved_tokens(prompt), usage)
+        except RateLimitedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error optimizing resume with {self.provider} ({self.model}): {str(e)}")
+            raise ProviderError(f"Error optimizing resume with {self.provider} ({self.model}): {str(e)}")
+
+    def _request_completion(self, prompt: str, usage: Dict[str, Optional[int]]) -> str:
+        """Send one chat completion request to the provider."""
+        return self.backend.complete(self.client, self.model, prompt, self.temperature, usage)
+
+    def _reserved_tokens(self, prompt: str) -> int:
+        """Tokens to reserve against the provider's token quota: the prompt plus the output allowance."""
+        return estimate_tokens(prompt, self.provider, self.model) + Config.MAX_OUTPUT_TOKENS
+
+    async def _acomplete(self, prompt: str, usage: Dict[str, Optional[int]]) -> str:
+        """Run the chat completion for an assembled prompt with the async client, filling in `usage`."""
+        try:
+            return await self._limiter.acall(lambda: self._arequest_completion(prompt, usage),
+                                             self._reserved_tokens(prompt), usage)
+        except RateLimitedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error optimizing resume with {self.provider} ({self.model}): {str(e)}")
+            raise ProviderError(f"Error optimizing resume with {self.provider} ({self.model}): {str(e)}")
+
+    async def _arequest_completion(self, prompt: str, usage: Dict[str, Optional[int]]) -> str:
+        """Send one chat completion request with the async client."""
+        if self._async_client is None:
+            self._async_client = self._setup_async_client()
+        client = self._async_client
+
+        return await self.backend.acomplete(client, self.model, prompt, self.temperature, usage)
+
+    def stream_optimize(
+        self,
+        resume_content: str,
+        guidelines: Optional[str] = None,
+        job_description: Optional[str] = None,
+        custom_prompt: Optional[str] = None,
+        base_prompt_path: str = "inputs/base_prompt.md",
+        template: Optional[str] = None,
+        use_cache: bool = True,
+        incremental: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """Optimize a resume, yielding `token` events as the provider emits them.
+
+        The last event is a `done` event with the model, token usage and timings.
+        With `incremental`, each optimized block is one `token` event, in order.
+        """
+        started = time.perf_counter()
+        if incremental:
+            yield from self._stream_sections(started, resume_content, guidelines, job_description,
+                                             custom_prompt, base_prompt_path, template, use_cache)
+            return
+
+        with stage("prompt", self.provider, self.model):
+            base_prompt = self.build_prompt(
+                resume_content,
+                guidelines=guidelines,
+                job_description=job_description,
+                custom_prompt=custom_prompt,
+                base_prompt_path=base_prompt_path,
+                template=template
+            )
+
+        cache_key = make_key(base_prompt, self.provider, self.model, self.temperature)
+        cached = response_cache.get(cache_key) if use_cache else None
+        usage = _empty_usage()
+        first_token_at = None
 
+        if cached is not None:
+            cache_status = 'hit'
+            first_token_at = time.perf_counter()
+            yield {"event": "token", "text": cached}
+        else:
+            cache_status = 'miss' if use_cache else 'bypass'
+            chunks = []
+            for text in self._stream(base_prompt, usage):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    first_token_seconds.observe(first_token_at - started, provider=self.provider, model=self.model)
+                chunks.append(text)
+                yield {"event": "token", "text": text}
+            response_cache.put(cache_key, ''.join(chunks))
+
+        finished = time.perf_counter()
+        record_stage("stream", finished - started, self.provider, self.model)
+        _publish_completion(CompletionInfo(self.provider, self.model, cache_status, usage))
+        yield {
+            "event": "done",
+            "provider": self.provider,
+            "model": self.model,
+            "cache": cache_status,
+            "usage": usage,
+            "timing": {
+                "first_token_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+                "total_ms": round((finished - started) * 1000, 1)
+            }
+        }
+
+    def _stream_sections(self, started: float, resume_content: str, guidelines: Optional[str],
+                         job_description: Optional[str], custom_prompt: Optional[str], base_prompt_path: str,
+                         template: Optional[str], use_cache: bool) -> Iterator[Dict[str, Any]]:
+        sections, prompts = self._section_prompts(resume_content, guidelines, job_description,
+                                                  custom_prompt, base_prompt_path, template)
+        infos = []
+        first_token_at = None
+        for section, text, info in self._iter_sections(sections, prompts, use_cache, Config.SECTION_MAX_CONCURRENCY):
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                first_token_seconds.observe(first_token_at - started, provider=self.provider, model=self.model)
+            infos.append(info)
+            yield {"event": "token", "text": text + section.separator}
+
+        finished = time.perf_counter()
+        record_stage("stream", finished - started, self.provider, self.model)
+        completion = _merge_sections(sections, infos, self.provider, self.model, use_cache)
+        last_completion.set(completion)
+        yield {
+            "event": "done",
+            "provider": self.provider,
+            "model": self.model,
+            "cache": completion.cache_status,
+            "usage": completion.usage or _empty_usage(),
+            "sections": completion.sections,
+            "timing": {
+                "first_token_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+                "total_ms": round((finished - started) * 1000, 1)
+            }
+        }
+
+    def _stream(self, prompt: str, usage: Dict[str, Optional[int]]) -> Iterator[str]:
+        """Stream the chat completion for an assembled prompt within the provider's rate limits."""
+        try:
+            yield from self._limiter.stream(lambda: self._stream_chunks(prompt, usage),
+                                            self._reserved_tokens(prompt), usage)
+        except RateLimitedError:
+            raise
         except Exception as e:
             logger.error(f"Error optimizing resume with {self.provider} ({self.model}): {str(e)}")
-            raise Exception(f"Error optimizing resume with {self.provider} ({self.model}): {str(e)}")
+            raise ProviderError(f"Error optimizing resume with {self.provider} ({self.model}): {str(e)}")
+
+    def _stream_chunks(self, prompt: str, usage: Dict[str, Optional[int]]) -> Iterator[str]:
+        """Stream the chat completion for an assembled prompt, filling in `usage` when reported."""
+        return self.backend.stream(self.client, self.model, prompt, self.temperature, usage)
 
     def get_available_models(self) -> List[str]:
         """Get list of available models for the current provider."""
+        self.available_models = self._fetch_available_models()
         return self.available_models
 
     def get_current_model(self) -> str:
         """Get the currently selected model."""
         return self.model
 
+    def close(self):
+        """Close the provider's HTTP client and its pooled connections."""
+        self.backend.close(self.client)
+
+    async def aclose(self):
+        """Close the async client, if one was created."""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
     def __call__(
         self,
         resume_content: str,
         guidelines: Optional[str] = None,
         job_description: Optional[str] = None,
         custom_prompt: Optional[str] = None,
-        base_prompt_path: str = "inputs/base_prompt.md"
+        base_prompt_path: str = "inputs/base_prompt.md",
+        template: Optional[str] = None,
+        use_cache: bool = True,
+        incremental: bool = False
     ) -> str:
         return self.optimize_resume(
             resume_content,
             guidelines=guidelines,
             job_description=job_description,
             custom_prompt=custom_prompt,
-            base_prompt_path=base_prompt_path
+            base_prompt_path=base_prompt_path,
+            template=template,
+            use_cache=use_cache,
+            incremental=incremental
         )
\ No newline at end of file
@@ -1,15 +1,86 @@
-from flask import Flask, request, jsonify
+import atexit
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from config import Config
-from ai_utils import AIProvider
-from werkzeug.exceptions import BadRequest
+from provider_pool import provider_pool
+from provider_router import provider_router
+from rate_limits import provider_limits, RateLimitedError
+import metrics
+from metrics import stage
+from response_cache import response_cache
+from ai_utils import last_completion
+from jobs import job_queue
+from prompt_templates import template_registry
+from input_compaction import compact_inputs
+from document_extraction import document_extractor
+from uploads import receive_upload
+from match_scoring import MatchScorer
+from near_duplicates import near_duplicate_index
+from resume_diff import GRANULARITIES, cached_diff
+from json_backends import FastJSONProvider
+from compression import compress_response, RequestDecompressionMiddleware
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
 
 app = Flask(__name__)
 app.config.from_object(Config)
+app.json = FastJSONProvider(app)
+# Request bodies sent with a Content-Encoding are decompressed while they are read
+app.wsgi_app = RequestDecompressionMiddleware(app.wsgi_app)
+
+# Create long-lived provider clients up front and close them on shutdown
+provider_pool.warm_up(Config.WARM_UP_PROVIDERS)
+atexit.register(provider_pool.shutdown)
+atexit.register(job_queue.stop, timeout=5)
+atexit.register(document_extractor.shutdown)
+
+# Shared threads for fanning out per-provider model lookups
+models_executor = ThreadPoolExecutor(max_workers=len(Config.supported_providers()) * 4,
+                                     thread_name_prefix="models-fanout")
+atexit.register(models_executor.shutdown, wait=False)
+# The lookup in flight per provider: requests share it, so a hung provider holds one
+# thread however many requests time out on it
+models_futures: dict = {}
+models_futures_lock = threading.Lock()
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    metrics.start_request()
+
+@app.after_request
+def record_request_timing(response):
+    """Record the request's duration and report its stage timings in a Server-Timing header."""
+    started = g.get("request_started")
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.request_seconds.observe(elapsed, endpoint=endpoint, method=request.method,
+                                        status=str(response.status_code))
+        response.headers["Server-Timing"] = metrics.server_timing(elapsed)
+    return response
+
+# Registered after the timing hook so it runs first and its time is included
+@app.after_request
+def compress(response):
+    """Compress buffered JSON and text responses for the client's Accept-Encoding."""
+    with stage("compress"):
+        return compress_response(response, request.headers.get("Accept-Encoding"))
 
 @app.errorhandler(Exception)
 def handle_error(error):
     if isinstance(error, BadRequest):
         return jsonify({"error": str(error)}), 400
+    if isinstance(error, RequestEntityTooLarge):
+        return jsonify({"error": error.description}), 413
+    if isinstance(error, RateLimitedError):
+        response = jsonify({"error": str(error)})
+        response.status_code = 429
+        if error.retry_after is not None:
+            response.headers["Retry-After"] = str(math.ceil(error.retry_after))
+        return response
     
     app.logger.error(f"Unexpected error: {str(error)}")
     return jsonify({"error": "Internal server error"}), 500
@@ -20,7 +91,7 @@ def list_models():
     try:
         provider = request.args.get("provider")
         if provider:
-            if provider not in Config.SUPPORTED_PROVIDERS:
+            if provider not in Config.supported_providers():
                 raise BadRequest(f"Unsupported AI provider: {provider}")
             return jsonify({
                 "provider": provider,
@@ -28,59 +99,457 @@ def list_models():
                 "default_model": Config.get_default_model(provider)
             })
         
-        return jsonify({
-            "providers": {
-                provider: {
-                    "models": Config.get_available_models(provider),
-                    "default_model": Config.get_default_model(provider)
-                }
-                for provider in Config.SUPPORTED_PROVIDERS
-            }
-        })
+        return jsonify({"providers": _list_all_provider_models()})
 
     except Exception as e:
         raise BadRequest(str(e))
 
+def _provider_models(provider):
+    with stage("models", provider):
+        return {
+            "status": "available",
+            "models": Config.get_available_models(provider),
+            "default_model": Config.get_default_model(provider)
+        }
+
+def _models_future(provider) -> Future:
+    with models_futures_lock:
+        future = models_futures.get(provider)
+        if future is None or future.done():
+            future = models_executor.submit(_provider_models, provider)
+            models_futures[provider] = future
+        return future
+
+def _list_all_provider_models():
+    """Query every provider concurrently, marking slow or failing ones unavailable."""
+    futures = {provider: _models_future(provider) for provider in Config.supported_providers()}
+    wait(futures.values(), timeout=Config.MODELS_PROVIDER_TIMEOUT)
+
+    providers = {}
+    for provider, future in futures.items():
+        if not future.done():
+            app.logger.warning(f"Timed out listing models for {provider}")
+            providers[provider] = {"status": "unavailable", "error": "Timed out"}
+        elif future.exception():
+            app.logger.error(f"Error listing models for {provider}: {str(future.exception())}")
+            providers[provider] = {"status": "unavailable", "error": str(future.exception())}
+        else:
+            providers[provider] = future.result()
+    return providers
+
 @app.route("/api/v1/optimize", methods=["POST"])
 def optimize_resume():
     try:
         data = request.get_json()
-        
-        if not data or "resume_content" not in data:
-            raise BadRequest("Resume content is required")
+        _, optimizer, options, reports = _parse_optimize_request(data)
+        return _optimize_response(optimizer, options, reports, data["resume_content"], _diff_granularity(data))
 
-        resume_content = data["resume_content"]
-        if not resume_content or len(resume_content) > Config.MAX_INPUT_LENGTH:
-            raise BadRequest(f"Resume content must be between 1 and {Config.MAX_INPUT_LENGTH} characters")
+    except (RateLimitedError, RequestEntityTooLarge):
+        raise
+    except Exception as e:
+        raise BadRequest(str(e))
 
-        # Optional parameters
-        guidelines = data.get("guidelines")
-        custom_prompt = data.get("custom_prompt")
-        ai_provider = data.get("ai_provider", Config.DEFAULT_AI_PROVIDER)
-        model = data.get("model")
+@app.route("/api/v1/optimize/file", methods=["POST"])
+def optimize_resume_file():
+    """Optimize an uploaded PDF, DOCX or text resume; other fields are sent as form fields."""
+    # Streamed to a spooled temporary file; RequestEntityTooLarge is raised while the bytes arrive
+    with stage("upload"):
+        data, upload = receive_upload(request.environ, max_bytes=Config.MAX_UPLOAD_BYTES)
+    try:
+        if upload is None:
+            raise BadRequest("A resume file is required")
+        try:
+            with stage("extract"):
+                extraction = document_extractor.extract(upload.stream, upload.filename)
+        finally:
+            upload.close()
+
+        for flag in ("cache", "compact", "incremental", "diff"):
+            value = data.get(flag, "").lower()
+            if value in ("false", "0"):
+                data[flag] = False
+            elif value in ("true", "1"):
+                data[flag] = True
+        data["resume_content"] = extraction.text
+        _, optimizer, options, reports = _parse_optimize_request(data)
+        return _optimize_response(optimizer, options, reports, extraction.text, _diff_granularity(data),
+                                  extraction=extraction.report())
+
+    except RateLimitedError:
+        raise
+    except Exception as e:
+        raise BadRequest(str(e))
+
+def _optimize_response(optimizer, options, reports, original=None, diff=None, **extra):
+    """Run a parsed optimization through the router and build its JSON response.
 
-        # Initialize AI provider and optimize resume
+    With a `diff` granularity, the response includes the diff from the `original` resume.
+    """
+    last_completion.set(None)
+    # The router may fail over or hedge to another provider
+    optimized_content, optimizer = provider_router.optimize(optimizer, options)
+
+    completion = last_completion.get()
+    if diff:
+        with stage("diff", optimizer.provider, optimizer.model):
+            extra["diff"] = _diff_report(original, optimized_content, diff)
+    with stage("serialize", optimizer.provider, optimizer.model):
+        response = jsonify({
+            "status": "success",
+            "optimized_content": optimized_content,
+            "provider": optimizer.provider,
+            "model": optimizer.get_current_model(),
+            "usage": completion.usage if completion else None,
+            **reports,
+            **({"sections": completion.sections} if completion and completion.sections else {}),
+            **extra
+        })
+    if completion:
+        response.headers["X-Cache"] = completion.cache_status.upper()
+    return response
+
+@app.route("/api/v1/optimize/stream", methods=["POST"])
+def optimize_resume_stream():
+    """Stream the optimized resume as server-sent events, or NDJSON with ?format=ndjson."""
+    try:
+        _, optimizer, options, _ = _parse_optimize_request(request.get_json())
+    except Exception as e:
+        raise BadRequest(str(e))
+
+    ndjson = request.args.get("format") == "ndjson"
+
+    def generate():
+        try:
+            for event in optimizer.stream_optimize(**options):
+                yield _format_stream_event(event, ndjson)
+        except Exception as e:
+            app.logger.error(f"Error streaming optimization: {str(e)}")
+            yield _format_stream_event({"event": "error", "error": str(e)}, ndjson)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson" if ndjson else "text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/api/v1/optimize/batch", methods=["POST"])
+def optimize_resume_batch():
+    """Optimize a list of items with one provider; NDJSON results stream back with ?stream=1."""
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get("items"), list) or not data["items"]:
+            raise BadRequest("A non-empty list of items is required")
+        if len(data["items"]) > Config.BATCH_MAX_ITEMS:
+            raise BadRequest(f"A batch can contain at most {Config.BATCH_MAX_ITEMS} items")
+
+        ai_provider = data.get("ai_provider", Config.DEFAULT_AI_PROVIDER)
         try:
-            optimizer = AIProvider(provider=ai_provider, model=model)
+            optimizer = provider_pool.get(ai_provider, data.get("model"))
         except ValueError as e:
             raise BadRequest(str(e))
 
-        optimized_content = optimizer(
-            resume_content=resume_content,
-            guidelines=guidelines,
-            custom_prompt=custom_prompt
+        max_concurrency = min(int(data.get("max_concurrency", Config.BATCH_MAX_CONCURRENCY)),
+                              Config.BATCH_MAX_CONCURRENCY)
+        use_cache = _use_response_cache(data, request.headers)
+        items, invalid = _parse_batch_items(data, optimizer)
+    except RequestEntityTooLarge:
+        raise
+    except Exception as e:
+        raise BadRequest(str(e))
+
+    # Map positions in the list sent to the provider back to the request's item indices
+    positions = sorted(items)
+
+    def results():
+        yield from invalid
+        for result in optimizer.iter_batch([items[i] for i in positions],
+                                           max_concurrency=max(1, max_concurrency),
+                                           use_cache=use_cache):
+            yield {**result, "index": positions[result["index"]]}
+
+    if request.args.get("stream") in ("1", "true"):
+        return Response(
+            stream_with_context(app.json.dumps(result) + "\n" for result in results()),
+            mimetype="application/x-ndjson",
+            headers={"X-Accel-Buffering": "no"}
         )
 
-        return jsonify({
-            "status": "success",
-            "optimized_content": optimized_content,
-            "provider": ai_provider,
-            "model": optimizer.get_current_model()
-        })
+    return jsonify({
+        "status": "success",
+        "provider": ai_provider,
+        "model": optimizer.get_current_model(),
+        "results": sorted(results(), key=lambda result: result["index"])
+    })
 
+def _parse_batch_items(data, optimizer):
+    """Merge batch-level defaults into each item, compact it and split off invalid items as error results."""
+    fields = ("resume_content", "guidelines", "job_description", "custom_prompt", "template")
+    items, invalid = {}, []
+    for index, raw in enumerate(data["items"]):
+        if not isinstance(raw, dict):
+            invalid.append({"index": index, "status": "error", "error": "Item must be an object"})
+            continue
+        item = {field: raw.get(field, data.get(field)) for field in fields}
+        resume_content = item["resume_content"]
+        if not resume_content or len(resume_content) > Config.MAX_INPUT_LENGTH:
+            invalid.append({
+                "index": index,
+                "status": "error",
+                "error": f"Resume content must be between 1 and {Config.MAX_INPUT_LENGTH} characters"
+            })
+            continue
+        if data.get("compact") is not False:
+            try:
+                compact_inputs(optimizer, item)
+            except ValueError as e:
+                invalid.append({"index": index, "status": "error", "error": str(e)})
+                continue
+        items[index] = item
+    return items, invalid
+
+@app.route("/api/v1/score", methods=["POST"])
+def score_matches():
+    """Rank job descriptions for each resume by local keyword match, without calling a provider."""
+    data = request.get_json(silent=True) or {}
+    try:
+        resumes = _documents(data, "resumes", "resume_content")
+        job_descriptions = _documents(data, "job_descriptions", "job_description")
+        for resume in resumes:
+            if len(resume) > Config.MAX_INPUT_LENGTH:
+                raise BadRequest(f"Resume content must be between 1 and {Config.MAX_INPUT_LENGTH} characters")
+        top_k = data.get("top_k")
+        keywords = data.get("keywords", 10)
+        if top_k is not None and (not isinstance(top_k, int) or top_k < 1):
+            raise BadRequest("top_k must be a positive integer")
+        if not isinstance(keywords, int) or keywords < 0:
+            raise BadRequest("keywords must be a non-negative integer")
+
+        scorer = MatchScorer(data.get("method", "bm25"))
+        with stage("score"):
+            rankings = scorer.rank(resumes, job_descriptions, top_k=top_k, keywords=keywords)
+    except BadRequest:
+        raise
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+    return jsonify({
+        "status": "success",
+        "method": scorer.method,
+        "pairs": len(resumes) * len(job_descriptions),
+        "results": [{"resume": index, "matches": matches} for index, matches in enumerate(rankings)]
+    })
+
+def _documents(data, plural: str, singular: str):
+    """A list of texts sent either as `plural` or as a single `singular` string."""
+    documents = data.get(plural, [data[singular]] if data.get(singular) else None)
+    if not isinstance(documents, list) or not documents:
+        raise BadRequest(f"{plural} must be a non-empty list of strings")
+    if len(documents) > Config.SCORE_MAX_DOCUMENTS:
+        raise BadRequest(f"At most {Config.SCORE_MAX_DOCUMENTS} {plural} can be scored at once")
+    if not all(isinstance(document, str) and document.strip() for document in documents):
+        raise BadRequest(f"{plural} must be a non-empty list of strings")
+    return documents
+
+@app.route("/api/v1/jobs", methods=["POST"])
+def submit_job():
+    """Queue an optimization and return its job id immediately."""
+    try:
+        data = request.get_json()
+        ai_provider, optimizer, options, _ = _parse_optimize_request(data)
+        priority = int(data.get("priority", 0))
     except Exception as e:
         raise BadRequest(str(e))
 
+    job_id = job_queue.submit({
+        "provider": ai_provider,
+        "model": optimizer.get_current_model(),
+        "options": options
+    }, priority=priority)
+
+    response = jsonify({"job_id": job_id, "status": "queued"})
+    response.status_code = 202
+    response.headers["Location"] = f"/api/v1/jobs/{job_id}"
+    return response
+
+@app.route("/api/v1/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Return a job's status and progress, and its result once finished."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+
+    return jsonify({
+        "job_id": job["id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "priority": job["priority"],
+        "provider": job["payload"]["provider"],
+        "model": job["payload"]["model"],
+        "optimized_content": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"]
+    })
+
+@app.route("/api/v1/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    """Cancel a queued or running job."""
+    if job_queue.get(job_id) is None:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+    if not job_queue.cancel(job_id):
+        return jsonify({"error": "Job has already finished"}), 409
+    return jsonify({"job_id": job_id, "status": "cancelled"})
+
+@app.route("/api/v1/diff", methods=["POST"])
+def diff_resume():
+    """Diff an original and an optimized resume; ?stream=1 sends one NDJSON line per operation."""
+    data = request.get_json(silent=True) or {}
+    original, optimized = data.get("original_content"), data.get("optimized_content")
+    if not isinstance(original, str) or not isinstance(optimized, str):
+        raise BadRequest("original_content and optimized_content are required")
+    limit = 2 * Config.MAX_INPUT_LENGTH
+    if len(original) > limit or len(optimized) > limit:
+        raise BadRequest(f"Texts to diff can be at most {limit} characters")
+    try:
+        with stage("diff"):
+            diff, cached = cached_diff(original, optimized, data.get("granularity", "word"))
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+    headers = {"X-Cache": "HIT" if cached else "MISS"}
+    if request.args.get("stream") in ("1", "true"):
+        summary = {"granularity": diff["granularity"], "stats": diff["stats"]}
+        lines = (app.json.dumps(line) + "\n" for line in diff["ops"] + [summary])
+        return Response(stream_with_context(lines), mimetype="application/x-ndjson", headers=headers)
+
+    response = jsonify({"status": "success", **diff})
+    response.headers.update(headers)
+    return response
+
+def _diff_granularity(data):
+    """The `diff` requested with an optimization: None, 'line' or 'word' (also for `true`)."""
+    value = data.get("diff")
+    if value is None or value is False:
+        return None
+    if value is True:
+        return "word"
+    if value not in GRANULARITIES:
+        raise BadRequest(f"diff must be one of {', '.join(GRANULARITIES)}")
+    return value
+
+def _diff_report(original, optimized_content, granularity):
+    """The diff of an optimization; diffs of repeated (e.g. cached) results come from the diff cache."""
+    diff, cached = cached_diff(original, optimized_content, granularity)
+    return {**diff, "cached": cached}
+
+def _format_stream_event(event, ndjson: bool) -> str:
+    if ndjson:
+        return app.json.dumps(event) + "\n"
+    payload = {key: value for key, value in event.items() if key != "event"}
+    return f"event: {event['event']}\ndata: {app.json.dumps(payload)}\n\n"
+
+def _parse_optimize_request(data, headers=None):
+    """Validate and compact an optimize request body.
+
+    Returns (provider name, optimizer, optimize kwargs, reports for the response: the
+    `compaction` report or None and, when requested, the `near_duplicate` match).
+    """
+    if not data or "resume_content" not in data:
+        raise BadRequest("Resume content is required")
+
+    resume_content = data["resume_content"]
+    if not resume_content or len(resume_content) > Config.MAX_INPUT_LENGTH:
+        raise BadRequest(f"Resume content must be between 1 and {Config.MAX_INPUT_LENGTH} characters")
+
+    ai_provider = data.get("ai_provider", Config.DEFAULT_AI_PROVIDER)
+    model = data.get("model")
+
+    # Reuse the pooled AI provider client. The stage is labelled with the resolved provider
+    # and model, and only once they are valid, so clients cannot create metric series
+    started = time.perf_counter()
+    try:
+        optimizer = provider_pool.get(ai_provider, model)
+    except ValueError as e:
+        raise BadRequest(str(e))
+    metrics.record_stage("models", time.perf_counter() - started, optimizer.provider,
+                         optimizer.get_current_model())
+
+    options = {
+        "resume_content": resume_content,
+        "guidelines": data.get("guidelines"),
+        "job_description": data.get("job_description"),
+        "custom_prompt": data.get("custom_prompt"),
+        "template": data.get("template"),
+        "use_cache": _use_response_cache(data, request.headers if headers is None else headers)
+    }
+    # Section by section, so only the sections that changed since a previous request are sent
+    if data.get("incremental", Config.INCREMENTAL_OPTIMIZATION) is True:
+        options["incremental"] = True
+
+    # Clients that send pre-cleaned inputs can skip compaction with `"compact": false`
+    compaction = None
+    if data.get("compact") is not False:
+        try:
+            with stage("compact", optimizer.provider, optimizer.model):
+                compaction = compact_inputs(optimizer, options)
+        except ValueError as e:
+            raise BadRequest(str(e))
+    reports = {"compaction": compaction}
+
+    mode = data.get("near_duplicates", Config.NEAR_DUPLICATE_MODE)
+    if mode not in ("off", "reuse", "flag"):
+        raise BadRequest("near_duplicates must be one of off, reuse, flag")
+    if mode != "off" and options["job_description"]:
+        with stage("near_duplicates", optimizer.provider, optimizer.model):
+            reports["near_duplicate"] = _match_near_duplicate(options, mode == "reuse")
+    return ai_provider, optimizer, options, reports
+
+def _match_near_duplicate(options, reuse: bool):
+    """Match the job description against earlier postings; with `reuse`, optimize for the canonical one.
+
+    The canonical posting's text then yields the same prompt as its earlier request,
+    so that request's cached optimization is returned.
+    """
+    match, duplicate = near_duplicate_index.match_or_add(options["job_description"])
+    reused = duplicate and reuse
+    if reused:
+        options["job_description"] = match.text
+    return {"duplicate": duplicate, "canonical": match.canonical,
+            "similarity": match.similarity, "reused": reused}
+
+def _use_response_cache(data, headers) -> bool:
+    """Requests can bypass the response cache with `"cache": false` or `Cache-Control: no-cache`."""
+    if data.get("cache") is False:
+        return False
+    return "no-cache" not in headers.get("Cache-Control", "")
+
+@app.route("/api/v1/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Latency histograms, token usage and cache counters in the Prometheus text format."""
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/v1/cache/stats", methods=["GET"])
+def cache_stats():
+    """Report response cache hit/miss and eviction statistics, and the near-duplicate index size."""
+    return jsonify({**response_cache.stats(), "near_duplicates": near_duplicate_index.stats()})
+
+@app.route("/api/v1/templates", methods=["GET"])
+def list_templates():
+    """List the prompt templates that can be selected with `template`."""
+    return jsonify({"templates": template_registry.names()})
+
+@app.route("/api/v1/templates/reload", methods=["POST"])
+def reload_templates():
+    """Drop cached prompt templates so edited files are picked up immediately."""
+    template_registry.reload()
+    return jsonify({"status": "success"})
+
+@app.route("/api/v1/providers/health", methods=["GET"])
+def provider_health():
+    """Report recent error rates, latencies and health scores used for routing."""
+    return jsonify({"providers": provider_router.stats(), "limits": provider_limits.stats()})
+
 @app.route("/api/v1/health", methods=["GET"])
 def health_check():
     return jsonify({
@@ -0,0 +1,150 @@
+"""ASGI entry point.
+
+POST /api/v1/optimize is served natively with the providers' async clients,
+so one worker can hold many optimizations that are waiting on the network.
+Every other route is delegated to the Flask app.
+
+Run with an ASGI server, e.g. `uvicorn asgi:app`.
+"""
+import asyncio
+import math
+import time
+import logging
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge, UnsupportedMediaType
+from config import Config
+from app import app as flask_app, _parse_optimize_request, _diff_granularity, _diff_report
+from ai_utils import last_completion
+from provider_pool import provider_pool
+from provider_router import provider_router
+from rate_limits import RateLimitedError
+from compression import compress_body, decompress
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class AsyncOptimizerApp:
+    def __init__(self, wsgi_app, max_concurrency: int = Config.ASYNC_MAX_CONCURRENCY,
+                 max_body_bytes: int = Config.MAX_DECOMPRESSED_BYTES):
+        self.wsgi = WsgiToAsgi(wsgi_app)
+        self.max_concurrency = max_concurrency
+        # Same limit as request bodies decoded by the Flask app's decompression middleware
+        self.max_body_bytes = max_body_bytes
+        self._semaphore = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it belongs to the server's running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http" and scope["path"] == "/api/v1/optimize" and scope["method"] == "POST":
+            await self._optimize(scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await provider_pool.ashutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _optimize(self, scope, receive, send):
+        started = time.perf_counter()
+        metrics.start_request()
+        accept_encoding = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        try:
+            headers = Headers([(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"]])
+            body = await self._read_body(receive, headers.get("Content-Length", type=int))
+            try:
+                body = decompress(body, headers.get("Content-Encoding"))
+                data = flask_app.json.loads(body) if body else None
+            except ValueError:
+                raise BadRequest("Request body must be valid JSON")
+
+            # Parsing may create a pooled provider (and fetch its models) on first use
+            _, optimizer, options, reports = await asyncio.to_thread(_parse_optimize_request, data, headers)
+            diff = _diff_granularity(data)
+
+            # Requests beyond the cap wait here instead of occupying a thread
+            async with self.semaphore:
+                last_completion.set(None)
+                optimized_content, optimizer = await provider_router.aoptimize(optimizer, options)
+
+            extra = {}
+            if diff:
+                # Off the event loop: large rewrites take a while to diff
+                extra["diff"] = await asyncio.to_thread(_diff_report, data["resume_content"], optimized_content, diff)
+
+            response_headers = []
+            completion = last_completion.get()
+            if completion:
+                response_headers.append((b"x-cache", completion.cache_status.upper().encode()))
+            await self._send_json(send, 200, {
+                "status": "success",
+                "optimized_content": optimized_content,
+                "provider": optimizer.provider,
+                "model": optimizer.get_current_model(),
+                "usage": completion.usage if completion else None,
+                **reports,
+                **({"sections": completion.sections} if completion and completion.sections else {}),
+                **extra
+            }, response_headers, started, accept_encoding)
+
+        except RateLimitedError as e:
+            headers = [] if e.retry_after is None else [(b"retry-after", str(math.ceil(e.retry_after)).encode())]
+            await self._send_json(send, 429, {"error": str(e)}, headers, started)
+        except (RequestEntityTooLarge, UnsupportedMediaType) as e:
+            await self._send_json(send, e.code, {"error": e.description}, started=started)
+        except Exception as e:
+            # Same error shape as the Flask view
+            error = e if isinstance(e, BadRequest) else BadRequest(str(e))
+            await self._send_json(send, 400, {"error": str(error)}, started=started)
+
+    async def _read_body(self, receive, content_length=None) -> bytes:
+        """The request body, rejected with 413 as soon as it exceeds `max_body_bytes`."""
+        too_large = RequestEntityTooLarge(f"Request body exceeds {self.max_body_bytes} bytes")
+        if content_length is not None and content_length > self.max_body_bytes:
+            raise too_large
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                raise too_large
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+        return b"".join(chunks)
+
+    async def _send_json(self, send, status: int, payload, extra_headers=None, started=None, accept_encoding=None):
+        with metrics.stage("serialize"):
+            body = flask_app.json.dump_bytes(payload)
+        headers = [(b"content-type", b"application/json")]
+        if status == 200:
+            with metrics.stage("compress"):
+                body, encoding = compress_body(body, accept_encoding)
+            headers.append((b"vary", b"Accept-Encoding"))
+            if encoding is not None:
+                headers.append((b"content-encoding", encoding.encode()))
+        headers += [(b"content-length", str(len(body)).encode())] + (extra_headers or [])
+        if started is not None:
+            # Same request metrics and Server-Timing header as the Flask app
+            elapsed = time.perf_counter() - started
+            metrics.request_seconds.observe(elapsed, endpoint="/api/v1/optimize", method="POST", status=str(status))
+            headers.append((b"server-timing", metrics.server_timing(elapsed).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+app = AsyncOptimizerApp(flask_app)
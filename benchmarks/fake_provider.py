@@ -0,0 +1,307 @@
+"""Local stand-in for the OpenAI, Anthropic and Mistral APIs.
+
+Serves the chat and models endpoints each SDK uses, under a per-provider path
+prefix, with configurable latency, throughput, errors and rate limiting:
+
+    python -m benchmarks.fake_provider --port 8900 --first-token-latency 0.3 --tokens-per-second 80
+
+    OPENAI_BASE_URL=http://127.0.0.1:8900/openai/v1/
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8900/anthropic
+    MISTRAL_BASE_URL=http://127.0.0.1:8900/mistral
+"""
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODELS = {
+    'openai': ['gpt-4-turbo-preview', 'gpt-4', 'gpt-3.5-turbo'],
+    'anthropic': ['claude-3-opus-20240229', 'claude-3-sonnet-20240229', 'claude-2.1'],
+    'mistral': ['mistral-large-latest', 'mistral-medium-latest', 'mistral-small-latest'],
+}
+
+class FakeProviderSettings:
+    """Behaviour of the fake provider; shared by all request handlers."""
+
+    def __init__(
+        self,
+        first_token_latency: float = 0.2,
+        tokens_per_second: float = 100.0,
+        max_output_tokens: int = 400,
+        error_rate: float = 0.0,
+        rate_limit: float = 0.0,
+        retry_after: Optional[float] = None,
+        seed: Optional[int] = None
+    ):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.max_output_tokens = max_output_tokens
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit  # chat requests per second before answering 429 (0 disables)
+        self.retry_after = retry_after  # fixed Retry-After seconds; computed from the bucket when None
+        self.random = random.Random(seed)
+        self._tokens = rate_limit
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+    def admit(self) -> Tuple[Optional[int], Optional[float]]:
+        """Decide how to answer a chat request: (error status or None, Retry-After seconds)."""
+        with self._lock:
+            self.requests += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._updated_at) * self.rate_limit)
+                self._updated_at = now
+                if self._tokens < 1:
+                    self.rate_limited += 1
+                    wait = (1 - self._tokens) / self.rate_limit
+                    return 429, self.retry_after if self.retry_after is not None else wait
+                self._tokens -= 1
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.errors += 1
+                return 500, None
+        return None, None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"requests": self.requests, "rate_limited": self.rate_limited, "errors": self.errors}
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    parts = []
+    system = body.get("system")
+    if isinstance(system, list):
+        parts.extend(block.get("text", "") for block in system)
+    elif isinstance(system, str):
+        parts.append(system)
+    for message in body.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, list):
+            parts.extend(block.get("text", "") for block in content if isinstance(block, dict))
+        else:
+            parts.append(content)
+    return "\n".join(parts)
+
+def _completion_tokens(prompt: str, limit: int) -> List[str]:
+    """A reply roughly as long as the last section of the prompt (the resume), echoed back word by word."""
+    words = prompt.split()
+    tail = words[-limit:] if words else ["Optimized", "resume"]
+    return [word + " " for word in tail]
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings = FakeProviderSettings()
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def do_GET(self):
+        provider, path = self._route()
+        # Some clients send a JSON body with GET; drain it so the kept-alive connection stays in sync
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if provider and path in ("/v1/models", "/models"):
+            created = int(time.time())
+            self._send_json(200, {
+                "object": "list",
+                "data": [{"id": model, "object": "model", "type": "model", "created": created,
+                          "created_at": "2024-01-01T00:00:00Z", "display_name": model, "owned_by": "fake"}
+                         for model in MODELS[provider]]
+            })
+        elif self.path == "/stats":
+            self._send_json(200, self.settings.stats())
+        else:
+            self._send_json(404, {"error": {"type": "not_found", "message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        provider, path = self._route()
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"type": "invalid_request_error", "message": "Invalid JSON"}})
+            return
+
+        if provider in ("openai", "mistral") and path in ("/v1/chat/completions", "/chat/completions"):
+            handler = self._openai_chat
+        elif provider == "anthropic" and path == "/v1/messages":
+            handler = self._anthropic_messages
+        else:
+            self._send_json(404, {"error": {"type": "not_found", "message": f"Unknown path {self.path}"}})
+            return
+
+        status, retry_after = self.settings.admit()
+        if status == 429:
+            headers = {"Retry-After": str(math.ceil(retry_after)),
+                       "Retry-After-Ms": str(int(retry_after * 1000))}
+            self._send_json(429, {"error": {"type": "rate_limit_error", "message": "Rate limit exceeded"}}, headers)
+            return
+        if status is not None:
+            self._send_json(status, {"error": {"type": "api_error", "message": "Injected failure"}})
+            return
+
+        prompt = _prompt_text(body)
+        limit = min(int(body.get("max_tokens") or self.settings.max_output_tokens), self.settings.max_output_tokens)
+        tokens = _completion_tokens(prompt, limit)
+        usage = (max(1, len(prompt) // 4), len(tokens))
+        handler(provider, body, tokens, usage)
+
+    def _route(self) -> Tuple[Optional[str], str]:
+        path = self.path.split("?", 1)[0]
+        for provider in MODELS:
+            prefix = f"/{provider}"
+            if path.startswith(prefix + "/"):
+                return provider, path[len(prefix):]
+        return None, path
+
+    def _paced(self, tokens: List[str]) -> Iterator[str]:
+        """Yield tokens after the first-token latency, at the configured rate."""
+        time.sleep(self.settings.first_token_latency)
+        interval = 1 / self.settings.tokens_per_second if self.settings.tokens_per_second else 0
+        for index, token in enumerate(tokens):
+            if index and interval:
+                time.sleep(interval)
+            yield token
+
+    def _openai_chat(self, provider: str, body: Dict[str, Any], tokens: List[str], usage: Tuple[int, int]):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", MODELS[provider][0])
+        usage_info = {"prompt_tokens": usage[0], "completion_tokens": usage[1], "total_tokens": sum(usage)}
+
+        if not body.get("stream"):
+            text = "".join(self._paced(tokens))
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage_info
+            })
+            return
+
+        self._start_stream()
+        for token in self._paced(tokens):
+            self._send_event({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": token}, "finish_reason": None}]
+            })
+        last = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        }
+        if provider == "mistral":
+            last["usage"] = usage_info
+        self._send_event(last)
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _anthropic_messages(self, provider: str, body: Dict[str, Any], tokens: List[str], usage: Tuple[int, int]):
+        message_id = f"msg_{uuid.uuid4().hex}"
+        model = body.get("model", MODELS[provider][0])
+
+        if not body.get("stream"):
+            text = "".join(self._paced(tokens))
+            self._send_json(200, {
+                "id": message_id, "type": "message", "role": "assistant", "model": model,
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": usage[0], "output_tokens": usage[1]}
+            })
+            return
+
+        self._start_stream()
+        self._send_event({"type": "message_start", "message": {
+            "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+            "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": usage[0], "output_tokens": 1}
+        }}, "message_start")
+        self._send_event({"type": "content_block_start", "index": 0,
+                          "content_block": {"type": "text", "text": ""}}, "content_block_start")
+        for token in self._paced(tokens):
+            self._send_event({"type": "content_block_delta", "index": 0,
+                              "delta": {"type": "text_delta", "text": token}}, "content_block_delta")
+        self._send_event({"type": "content_block_stop", "index": 0}, "content_block_stop")
+        self._send_event({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                          "usage": {"output_tokens": usage[1]}}, "message_delta")
+        self._send_event({"type": "message_stop"}, "message_stop")
+        self._send_chunk(b"")
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_event(self, payload: Dict[str, Any], event: Optional[str] = None):
+        prefix = f"event: {event}\n" if event else ""
+        self._send_chunk(f"{prefix}data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def _send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+def create_server(host: str = "127.0.0.1", port: int = 8900,
+                  settings: Optional[FakeProviderSettings] = None) -> ThreadingHTTPServer:
+    """Build (but do not start) a fake provider server; port 0 picks a free port."""
+    handler = type("ConfiguredFakeProviderHandler", (FakeProviderHandler,),
+                   {"settings": settings or FakeProviderSettings()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def base_urls(server: ThreadingHTTPServer) -> Dict[str, str]:
+    """Environment variables that point the app's provider clients at `server`."""
+    host, port = server.server_address[:2]
+    root = f"http://{host}:{port}"
+    return {
+        "OPENAI_BASE_URL": f"{root}/openai/v1/",
+        "ANTHROPIC_BASE_URL": f"{root}/anthropic",
+        "MISTRAL_BASE_URL": f"{root}/mistral",
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake OpenAI/Anthropic/Mistral API for offline benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--first-token-latency', type=float, default=0.2, help='Seconds before the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=100.0, help='Generation speed (0 for instant)')
+    parser.add_argument('--max-output-tokens', type=int, default=400, help='Longest reply in tokens')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of chat requests answered with 500')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Chat requests per second before 429s')
+    parser.add_argument('--retry-after', type=float, help='Fixed Retry-After seconds on 429 responses')
+    parser.add_argument('--seed', type=int, help='Random seed for injected errors')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    settings = FakeProviderSettings(args.first_token_latency, args.tokens_per_second, args.max_output_tokens,
+                                    args.error_rate, args.rate_limit, args.retry_after, args.seed)
+    server = create_server(args.host, args.port, settings)
+    for name, value in base_urls(server).items():
+        print(f"{name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Startup benchmark for the resume optimizer app.
+
+Starts fresh interpreters that import `app` and send one /api/v1/optimize request
+through the test client to the fake provider, and reports for each run:
+
+- the time to import `app`,
+- the time from the start of the import to the first response,
+- the wall time of the whole process, interpreter startup included,
+- which provider SDKs were imported.
+
+    python -m benchmarks.import_time --runs 10 --provider mistral
+    python -m benchmarks.import_time --top 15 --compare benchmarks/results/<earlier>.json
+
+--top lists the slowest imports below `app` from `python -X importtime`.
+"""
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from benchmarks.load_test import ROOT, load_payloads, git_commit, save_results
+
+SDK_MODULES = ('openai', 'anthropic', 'mistralai')
+
+# Runs in the child interpreter; the payload is passed in argv[1]
+BOOT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().post('/api/v1/optimize', json=json.loads(sys.argv[1]),
+                                      headers={'Cache-Control': 'no-cache'})
+answered = time.perf_counter()
+print(json.dumps({
+    "status": response.status_code,
+    "import_ms": round((imported - started) * 1000, 1),
+    "first_response_ms": round((answered - started) * 1000, 1),
+    "sdks": [name for name in %r if name in sys.modules]
+}))
+""" % (SDK_MODULES,)
+
+def _child_env(urls: Dict[str, str]) -> Dict[str, str]:
+    env = dict(os.environ, **urls)
+    for key in ('OPENAI_API_KEY', 'ANTHROPIC_API_KEY', 'MISTRAL_API_KEY'):
+        env.setdefault(key, 'benchmark')
+    return env
+
+def boot_once(payload: Dict[str, Any], env: Dict[str, str]) -> Dict[str, Any]:
+    """Time one cold start: a new interpreter importing the app and answering one request."""
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', BOOT_SCRIPT, json.dumps(payload)], cwd=ROOT, env=env,
+                               capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+def slowest_imports(env: Dict[str, str], top: int) -> List[Dict[str, Any]]:
+    """The `top` modules with the largest cumulative import time under `import app`."""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=env,
+                               capture_output=True, text=True, check=True)
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.append({"module": name.strip(), "cumulative_ms": round(int(cumulative) / 1000, 1)})
+    modules.sort(key=lambda module: module["cumulative_ms"], reverse=True)
+    return [module for module in modules if module["module"] != 'app'][:top]
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = {}
+    for metric in ("import_ms", "first_response_ms", "process_ms"):
+        values = [run[metric] for run in runs]
+        summary[metric] = {"median": round(statistics.median(values), 1),
+                           "min": min(values), "max": max(values)}
+    summary["sdks"] = sorted({name for run in runs for name in run["sdks"]})
+    summary["errors"] = sum(1 for run in runs if run["status"] != 200)
+    return summary
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """One line per metric median: baseline -> current and the relative change."""
+    lines = []
+    for metric, stats in current["summary"].items():
+        before = baseline.get("summary", {}).get(metric)
+        if not isinstance(stats, dict) or not isinstance(before, dict) or not before.get("median"):
+            continue
+        now, then = stats["median"], before["median"]
+        lines.append(f"{metric:18} {then:>10} -> {now:>10} ({(now - then) / then * 100:+.1f}%)")
+    return lines
+
+def run(args) -> Dict[str, Any]:
+    from benchmarks.fake_provider import FakeProviderSettings, create_server, base_urls
+
+    fake = create_server('127.0.0.1', 0, FakeProviderSettings(first_token_latency=0.0, tokens_per_second=0))
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+    try:
+        env = _child_env(base_urls(fake))
+        payload = load_payloads(args.model, args.provider)[0]
+        runs = [boot_once(payload, env) for _ in range(args.runs)]
+        results = {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "benchmark": "import_time",
+            "config": {"runs": args.runs, "provider": args.provider, "model": args.model},
+            "summary": summarize(runs),
+            "runs": runs
+        }
+        if args.top:
+            results["slowest_imports"] = slowest_imports(env, args.top)
+        return results
+    finally:
+        fake.shutdown()
+        fake.server_close()
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure app import and boot-to-first-response time")
+    parser.add_argument('--runs', type=int, default=5, help='Cold starts to time')
+    parser.add_argument('--provider', default='mistral', help='Provider for the first request')
+    parser.add_argument('--model', default='mistral-large-latest', help='Model for the first request')
+    parser.add_argument('--top', type=int, default=0, help='List the N slowest imports')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--no-save', action='store_true', help='Print results without saving them')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print(json.dumps({key: value for key, value in results.items() if key != "runs"}, indent=2))
+    if not args.no_save:
+        print(f"Saved results to {save_results(results)}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print("\n".join(compare(results, json.load(f))))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Load test for the resume optimizer API.
+
+Replays the resumes from the test fixtures with the job description and guidelines
+in inputs/ against /api/v1/optimize, /api/v1/optimize/stream and /api/v1/models, and
+reports throughput, latency percentiles, time to first byte and worker memory.
+
+Against an already running server:
+
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --requests 200 --concurrency 16
+
+Or start the fake provider and the app for the run, so no vendor is called:
+
+    python -m benchmarks.load_test --launch --requests 200 --concurrency 16
+    python -m benchmarks.load_test --launch --server-cmd "gunicorn -w 4 -b 127.0.0.1:{port} app:app"
+
+Results are saved to benchmarks/results/<timestamp>-<commit>.json; pass an earlier
+result with --compare to print the change in each number.
+"""
+from typing import Optional, List, Dict, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import argparse
+import ast
+import json
+import math
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+DEFAULT_SERVER_CMD = "{python} -m flask --app app run --port {port} --with-threads"
+
+def fixture_strings(path: str = os.path.join(ROOT, 'tests', 'conftest.py')) -> Dict[str, str]:
+    """String constants returned by the pytest fixtures in `path`, by fixture name."""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    strings = {}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            for statement in node.body:
+                if (isinstance(statement, ast.Return) and isinstance(statement.value, ast.Constant)
+                        and isinstance(statement.value.value, str)):
+                    strings[node.name] = statement.value.value
+    return strings
+
+def _read_input(name: str) -> Optional[str]:
+    path = os.path.join(ROOT, 'inputs', name)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def load_payloads(model: Optional[str] = None, provider: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Optimize request bodies built from the test fixtures and the inputs/ files."""
+    job_description = _read_input('job_description.txt')
+    guidelines = _read_input('RESUME_GUIDELINES.md')
+    resumes = [text for name, text in fixture_strings().items() if 'resume' in name]
+    payloads = []
+    for resume in resumes:
+        # A bare request and one carrying every input, to cover small and large prompts
+        payloads.append({"resume_content": resume})
+        payloads.append({"resume_content": resume, "job_description": job_description, "guidelines": guidelines})
+    for payload in payloads:
+        if provider:
+            payload["provider"] = provider
+        if model:
+            payload["model"] = model
+    return payloads
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of `values` (q between 0 and 100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+def summarize(samples: List[Tuple[float, Optional[float], bool]], elapsed: float) -> Dict[str, Any]:
+    """Throughput and latency summary of (latency, ttfb, ok) samples collected over `elapsed` seconds."""
+    latencies = [latency for latency, _, ok in samples if ok]
+    ttfbs = [ttfb for _, ttfb, ok in samples if ok and ttfb is not None]
+    errors = sum(1 for _, _, ok in samples if not ok)
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {f"p{q}": ms(percentile(latencies, q)) for q in (50, 95, 99)},
+        "ttfb_ms": {f"p{q}": ms(percentile(ttfbs, q)) for q in (50, 95, 99)},
+    }
+
+def _timed_request(session: requests.Session, method: str, url: str, **kwargs) -> Tuple[float, Optional[float], bool]:
+    started = time.perf_counter()
+    ttfb = None
+    try:
+        with session.request(method, url, stream=True, timeout=300, **kwargs) as response:
+            for chunk in response.iter_content(chunk_size=None):
+                if ttfb is None and chunk:
+                    ttfb = time.perf_counter() - started
+            return time.perf_counter() - started, ttfb, response.ok
+    except requests.RequestException:
+        return time.perf_counter() - started, ttfb, False
+
+def run_scenario(url: str, method: str, bodies: List[Optional[Dict[str, Any]]], total: int,
+                 concurrency: int, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Send `total` requests with `concurrency` workers, cycling through `bodies`."""
+    local = threading.local()
+
+    def one(index: int) -> Tuple[float, Optional[float], bool]:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        body = bodies[index % len(bodies)]
+        return _timed_request(local.session, method, url, json=body, headers=headers)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(one, range(total)))
+    return summarize(samples, time.perf_counter() - started)
+
+def process_tree(pid: int) -> List[int]:
+    """`pid` and all its descendants, read from /proc (empty where /proc is unavailable)."""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = [int(entry) for entry in os.listdir('/proc') if entry.isdigit()]
+    except OSError:
+        return []
+    for entry in entries:
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                # The command name may contain spaces; fields after it are space separated
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(entry)
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process in MB, or None if it cannot be read."""
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def worker_memory(pid: Optional[int]) -> Optional[Dict[str, float]]:
+    """RSS in MB of a launched server and each of its worker processes."""
+    if pid is None:
+        return None
+    memory = {str(current): rss_mb(current) for current in process_tree(pid)}
+    return {key: value for key, value in memory.items() if value is not None} or None
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            if requests.get(f"{url}/api/v1/health", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready within {timeout}s")
+
+def launch(args) -> Tuple[str, subprocess.Popen, Any]:
+    """Start the fake provider in this process and the app as a subprocess pointed at it."""
+    from benchmarks.fake_provider import FakeProviderSettings, create_server, base_urls
+
+    settings = FakeProviderSettings(
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        seed=0
+    )
+    fake = create_server('127.0.0.1', 0, settings)
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+
+    port = _free_port()
+    env = dict(os.environ, **base_urls(fake))
+    for key in ('OPENAI_API_KEY', 'ANTHROPIC_API_KEY', 'MISTRAL_API_KEY'):
+        env.setdefault(key, 'benchmark')
+    command = args.server_cmd.format(python=shlex.quote(sys.executable), port=port)
+    process = subprocess.Popen(shlex.split(command), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_up(url, process)
+    except Exception:
+        process.terminate()
+        fake.shutdown()
+        raise
+    return url, process, fake
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def save_results(results: Dict[str, Any], directory: str = RESULTS_DIR) -> str:
+    os.makedirs(directory, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json"
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """One line per scenario metric: baseline -> current and the relative change."""
+    lines = []
+    for scenario, stats in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if not before:
+            continue
+        pairs = [("rps", stats["rps"], before.get("rps"))]
+        for group in ("latency_ms", "ttfb_ms"):
+            for key, value in stats[group].items():
+                pairs.append((f"{group}.{key}", value, before.get(group, {}).get(key)))
+        for metric, now, then in pairs:
+            if now is None or not then:
+                continue
+            lines.append(f"{scenario:16} {metric:18} {then:>10} -> {now:>10} ({(now - then) / then * 100:+.1f}%)")
+    return lines
+
+def run(args) -> Dict[str, Any]:
+    process = fake = None
+    url = args.url.rstrip('/')
+    if args.launch:
+        url, process, fake = launch(args)
+    try:
+        headers = None if args.cache else {"Cache-Control": "no-cache"}
+        payloads = load_payloads(args.model, args.provider)
+        scenarios = {
+            "optimize": (f"{url}/api/v1/optimize", "POST", payloads),
+            "optimize_stream": (f"{url}/api/v1/optimize/stream", "POST", payloads),
+            "models": (f"{url}/api/v1/models", "GET", [None]),
+        }
+        results = {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "config": {"requests": args.requests, "concurrency": args.concurrency, "launched": bool(args.launch),
+                       "server_cmd": args.server_cmd if args.launch else None, "url": url},
+            "scenarios": {}
+        }
+        for name in args.scenarios:
+            endpoint, method, bodies = scenarios[name]
+            results["scenarios"][name] = run_scenario(endpoint, method, bodies, args.requests,
+                                                      args.concurrency, headers)
+        results["worker_memory_mb"] = worker_memory(process.pid if process else None)
+        if fake is not None:
+            results["fake_provider"] = fake.RequestHandlerClass.settings.stats()
+        return results
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if fake is not None:
+            fake.shutdown()
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load test the resume optimizer API")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Base URL of a running server')
+    parser.add_argument('--launch', action='store_true', help='Start the fake provider and the app for this run')
+    parser.add_argument('--server-cmd', default=DEFAULT_SERVER_CMD,
+                        help='Command that serves the app with --launch; {python} and {port} are substituted')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--scenarios', nargs='+', default=['optimize', 'optimize_stream', 'models'],
+                        choices=['optimize', 'optimize_stream', 'models'])
+    parser.add_argument('--provider', help='Provider to request (server default when omitted)')
+    parser.add_argument('--model', help='Model to request')
+    parser.add_argument('--cache', action='store_true', help='Allow response cache hits (bypassed by default)')
+    parser.add_argument('--first-token-latency', type=float, default=0.2, help='Fake provider first-token delay')
+    parser.add_argument('--tokens-per-second', type=float, default=100.0, help='Fake provider output rate')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fake provider share of 500 responses')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Fake provider requests/s before 429s')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--no-save', action='store_true', help='Print results without saving them')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if not args.no_save:
+        print(f"Saved results to {save_results(results)}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print("\n".join(compare(results, json.load(f))))
+
+if __name__ == "__main__":
+    main()
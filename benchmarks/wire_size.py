@@ -0,0 +1,132 @@
+"""Wire size and serialization benchmark for API responses.
+
+Builds representative bodies from the test fixtures and the inputs/ files (an
+optimization, the same with a word diff, a batch of results, the models listing
+and a batch request) and reports for each:
+
+- the bytes on the wire unencoded and with every available content coding,
+- the CPU time to compress with each coding,
+- the CPU time to serialize with Flask's default provider and with FastJSONProvider.
+
+    python -m benchmarks.wire_size --repeat 200
+    python -m benchmarks.wire_size --compare benchmarks/results/<earlier>.json
+"""
+from typing import Optional, List, Dict, Any, Callable
+from datetime import datetime
+import argparse
+import json
+import re
+import time
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from benchmarks.load_test import load_payloads, git_commit, save_results
+
+# Rewrites applied to every other line, standing in for an optimized resume
+REWRITES = ((r"\bDeveloped\b", "Built"), (r"\bManaged\b", "Led"), (r"\bWorked on\b", "Delivered"),
+            (r"\bresponsible for\b", "owning"), (r"\busing\b", "with"))
+
+# Results of a batch are all the same optimization, so its compressed size is a lower bound
+BATCH_SIZE = 100
+
+def _optimized(resume: str) -> str:
+    lines = resume.splitlines(keepends=True)
+    for index in range(0, len(lines), 2):
+        for pattern, replacement in REWRITES:
+            lines[index] = re.sub(pattern, replacement, lines[index])
+    return "".join(lines) + "\nKey achievements: reduced costs by 20% and shipped weekly releases.\n"
+
+def build_bodies() -> Dict[str, Any]:
+    """Response (and request) objects the size and shape the API sends."""
+    from resume_diff import diff_texts
+    from provider_backends import OpenAIBackend, AnthropicBackend, MistralBackend
+
+    payload = max(load_payloads(), key=lambda body: len(json.dumps(body)))
+    original = payload["resume_content"]
+    optimized = _optimized(original)
+    optimization = {"optimized_content": optimized, "provider": "mistral", "model": "mistral-large-latest",
+                    "cache": "miss", "compaction": {"original_chars": len(original), "compacted_chars": len(original)}}
+    results = [{"index": index, "status": "ok", "cache": "hit", "optimized_content": optimized}
+               for index in range(BATCH_SIZE)]
+    return {
+        "optimize": optimization,
+        "optimize_diff": dict(optimization, diff=diff_texts(original, optimized, 'word')),
+        "batch": {"results": results, "summary": {"ok": BATCH_SIZE, "failed": 0}},
+        "models": {"providers": {backend.name: {"status": "available", "models": backend.fallback_models,
+                                                "default_model": backend.fallback_models[0]}
+                                 for backend in (OpenAIBackend, AnthropicBackend, MistralBackend)}},
+        "batch_request": {"items": [payload] * 10}
+    }
+
+def _cpu_us(function: Callable[[], Any], repeat: int) -> float:
+    """Median CPU microseconds of one call, over `repeat` calls in five rounds."""
+    rounds = []
+    for _ in range(5):
+        started = time.process_time()
+        for _ in range(repeat):
+            function()
+        rounds.append((time.process_time() - started) / repeat * 1e6)
+    return round(sorted(rounds)[len(rounds) // 2], 1)
+
+def measure(body: Any, repeat: int) -> Dict[str, Any]:
+    from compression import CODECS
+    from json_backends import FastJSONProvider
+
+    app = Flask(__name__)
+    default, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+    data = fast.dump_bytes(body)
+    result = {
+        "bytes": {"identity": len(data)},
+        "compress_us": {},
+        "serialize_us": {
+            "default": _cpu_us(lambda: default.dumps(body).encode("utf-8"), repeat),
+            fast.backend.name: _cpu_us(lambda: fast.dump_bytes(body), repeat)
+        }
+    }
+    for encoding in ("gzip", "br", "zstd"):
+        codec = CODECS[encoding]
+        if not codec.available():
+            continue
+        result["bytes"][encoding] = len(codec.compress(data))
+        result["compress_us"][encoding] = _cpu_us(lambda: codec.compress(data), max(1, repeat // 10))
+    return result
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """One line per body metric: baseline -> current and the relative change."""
+    lines = []
+    for body, stats in current["bodies"].items():
+        before = baseline.get("bodies", {}).get(body, {})
+        for group in ("bytes", "compress_us", "serialize_us"):
+            for key, now in stats[group].items():
+                then = before.get(group, {}).get(key)
+                if not then:
+                    continue
+                lines.append(f"{body:14} {group + '.' + key:22} {then:>10} -> {now:>10} "
+                             f"({(now - then) / then * 100:+.1f}%)")
+    return lines
+
+def run(args) -> Dict[str, Any]:
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "benchmark": "wire_size",
+        "config": {"repeat": args.repeat},
+        "bodies": {name: measure(body, args.repeat) for name, body in build_bodies().items()}
+    }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure response sizes per content coding and JSON encoding time")
+    parser.add_argument('--repeat', type=int, default=100, help='Serializations timed per round')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--no-save', action='store_true', help='Print results without saving them')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if not args.no_save:
+        print(f"Saved results to {save_results(results)}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print("\n".join(compare(results, json.load(f))))
+
+if __name__ == "__main__":
+    main()
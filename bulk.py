@@ -0,0 +1,218 @@
+"""Bulk optimization of many resumes against many job descriptions.
+
+Pairs come from the cross product of resume and job description files (directories,
+glob patterns or paths) or from a mapping file. They run in-process with bounded
+concurrency; every finished pair is written to the output directory and appended to a
+checkpoint, so a rerun with the same output directory skips the pairs already done.
+"""
+from typing import Optional, List, Dict, Any, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from pathlib import Path
+import csv
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESUME_EXTENSIONS = {'.pdf', '.docx', '.txt', '.md'}
+JOB_DESCRIPTION_EXTENSIONS = {'.txt', '.md'}
+CHECKPOINT_FILE = 'checkpoint.jsonl'
+
+class Pair:
+    """One resume to optimize for one (optional) job description."""
+
+    def __init__(self, resume: Path, job_description: Optional[Path] = None):
+        self.resume = resume
+        self.job_description = job_description
+
+    @property
+    def name(self) -> str:
+        """Output file stem, unique per pair of input paths."""
+        parts = [self.resume.stem] + ([self.job_description.stem] if self.job_description else [])
+        readable = "__".join(re.sub(r"[^\w.-]+", "_", part) for part in parts)
+        digest = hashlib.sha1(f"{self.resume}\0{self.job_description}".encode('utf-8')).hexdigest()[:8]
+        return f"{readable}-{digest}"
+
+    def key(self, settings: Dict[str, Any]) -> str:
+        """Checkpoint key: changes when either input file or the optimization settings change."""
+        digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        for path in (self.resume, self.job_description):
+            digest.update(b'\0')
+            # A missing file is reported when its pair runs
+            if path is not None and path.is_file():
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(chunk)
+        return digest.hexdigest()
+
+def expand_paths(patterns: Iterable[str], extensions: set) -> List[Path]:
+    """Files matched by paths, directories (their files with `extensions`) or glob patterns, sorted and unique."""
+    files = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            files.extend(child for child in path.iterdir() if child.is_file() and child.suffix.lower() in extensions)
+        elif path.is_file():
+            files.append(path)
+        else:
+            matches = [Path(match) for match in glob.glob(pattern, recursive=True)]
+            if not matches:
+                raise ValueError(f"No files match {pattern}")
+            files.extend(match for match in matches if match.is_file())
+    return sorted(dict.fromkeys(files))
+
+def cross_product(resumes: List[Path], job_descriptions: List[Path]) -> List[Pair]:
+    if not job_descriptions:
+        return [Pair(resume) for resume in resumes]
+    return [Pair(resume, job_description) for resume in resumes for job_description in job_descriptions]
+
+def read_mapping(path: str) -> List[Pair]:
+    """Pairs listed in a CSV (`resume,job_description` columns) or JSON (list of objects) file.
+
+    Relative paths are resolved against the mapping file's directory.
+    """
+    base = Path(path).parent
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        rows = json.load(f) if path.endswith('.json') else list(csv.DictReader(f))
+
+    pairs = []
+    for row in rows:
+        if not row.get('resume'):
+            raise ValueError(f"Mapping entry without a resume: {row}")
+        job_description = row.get('job_description')
+        pairs.append(Pair(base / row['resume'], base / job_description if job_description else None))
+    return pairs
+
+class Checkpoint:
+    """Append-only log of finished pairs in the output directory."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done = set()
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    if entry.get('status') == 'success':
+                        self.done.add(entry['key'])
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if entry['status'] == 'success':
+                self.done.add(entry['key'])
+
+    def close(self) -> None:
+        self._file.close()
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+def run_bulk(
+    pairs: List[Pair],
+    output_dir: str,
+    optimize,
+    load_resume,
+    settings: Optional[Dict[str, Any]] = None,
+    concurrency: int = 4,
+    progress=None
+) -> Dict[str, Any]:
+    """Optimize `pairs` with at most `concurrency` in flight and return a throughput summary.
+
+    - `optimize(resume_content, job_description)` returns the optimized text.
+    - `load_resume(path)` returns a resume's text.
+    - `progress(entry)`, if given, is called after each pair with its checkpoint entry.
+
+    Results are written to `output_dir/<pair>.txt` as they finish.
+    """
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    checkpoint = Checkpoint(output / CHECKPOINT_FILE)
+    settings = settings or {}
+    latencies: List[float] = []
+    counts = {"succeeded": 0, "failed": 0, "skipped": 0}
+
+    def run(pair: Pair, key: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        entry = {"key": key, "resume": str(pair.resume),
+                 "job_description": str(pair.job_description) if pair.job_description else None}
+        try:
+            job_description = pair.job_description.read_text(encoding='utf-8') if pair.job_description else None
+            optimized_content = optimize(load_resume(pair.resume), job_description)
+            target = output / f"{pair.name}.txt"
+            # Written under a temporary name so a crash never leaves a partial result
+            partial = target.with_suffix('.txt.part')
+            partial.write_text(optimized_content, encoding='utf-8')
+            partial.replace(target)
+            entry.update(status="success", output=str(target))
+        except Exception as e:
+            entry.update(status="error", error=str(e))
+        entry["seconds"] = round(time.perf_counter() - started, 3)
+        return entry
+
+    def finished(future) -> None:
+        entry = future.result()
+        checkpoint.record(entry)
+        if entry["status"] == "success":
+            counts["succeeded"] += 1
+            latencies.append(entry["seconds"])
+        else:
+            counts["failed"] += 1
+            logger.warning(f"Optimizing {entry['resume']} failed: {entry['error']}")
+        if progress:
+            progress(entry)
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="bulk") as executor:
+            pending = set()
+            for pair in pairs:
+                key = pair.key(settings)
+                if key in checkpoint.done:
+                    counts["skipped"] += 1
+                    continue
+                # Keep the queue short so a large run does not hold every input in memory
+                if len(pending) >= 2 * concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finished(future)
+                pending.add(executor.submit(run, pair, key))
+            for future in as_completed(pending):
+                finished(future)
+    finally:
+        checkpoint.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "pairs": len(pairs),
+        **counts,
+        "seconds": round(elapsed, 2),
+        "pairs_per_second": round(counts["succeeded"] / elapsed, 2) if elapsed else None,
+        "p50_seconds": _percentile(latencies, 50),
+        "p95_seconds": _percentile(latencies, 95),
+        "output_dir": str(output)
+    }
+
+def collect_pairs(resumes: List[str], job_descriptions: List[str], mapping: Optional[str]) -> List[Pair]:
+    """Pairs for the bulk CLI options: a mapping file or the cross product of the file patterns."""
+    if mapping:
+        return read_mapping(mapping)
+    return cross_product(expand_paths(resumes, RESUME_EXTENSIONS),
+                         expand_paths(job_descriptions or [], JOB_DESCRIPTION_EXTENSIONS))
@@ -0,0 +1,229 @@
+"""HTTP content codings for request and response bodies.
+
+Responses are compressed with the best encoding the client accepts, out of
+RESPONSE_COMPRESSION in order of preference; bodies under COMPRESSION_MIN_BYTES are
+sent as they are, where compression saves little and costs a round of CPU. Request
+bodies sent with a `Content-Encoding` are decompressed as they are read, and their
+decompressed size is capped so a small compressed body cannot expand without bound.
+
+gzip is always available; `br` needs the brotli package and `zstd` the zstandard
+package, both imported on first use.
+"""
+from typing import Optional, List, Dict, Tuple, Callable
+import gzip
+import importlib
+import io
+import json
+import threading
+import logging
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.http import parse_accept_header
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Types worth compressing; streamed responses (SSE, NDJSON) are left alone
+COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "application/javascript", "image/svg+xml"}
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # well below the maximum of 11, which is far slower for little gain on JSON
+ZSTD_LEVEL = 3
+
+# Compressed bytes read at a time when a decompressor has no bounded reader of its own
+READ_CHUNK = 16 * 1024
+
+class Codec:
+    """One content coding; `module` is imported on first use."""
+
+    name = ""
+    module_name: Optional[str] = None
+
+    def __init__(self):
+        self._module = None
+        self._available: Optional[bool] = None
+        self._lock = threading.Lock()
+
+    @property
+    def module(self):
+        with self._lock:
+            if self._module is None and self.module_name:
+                self._module = importlib.import_module(self.module_name)
+            return self._module
+
+    def available(self) -> bool:
+        if self._available is None:
+            try:
+                self.module
+                self._available = True
+            except ImportError:
+                self._available = False
+        return self._available
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def reader(self, stream) -> io.RawIOBase:
+        """A readable stream of the decompressed bytes of `stream`."""
+        raise NotImplementedError
+
+class GzipCodec(Codec):
+    name = "gzip"
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+    def reader(self, stream):
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+
+class BrotliCodec(Codec):
+    name = "br"
+    module_name = "brotli"
+
+    def compress(self, data: bytes) -> bytes:
+        return self.module.compress(data, quality=BROTLI_QUALITY)
+
+    def reader(self, stream):
+        return _ChunkedReader(stream, self.module.Decompressor().process)
+
+class ZstdCodec(Codec):
+    name = "zstd"
+    module_name = "zstandard"
+
+    def compress(self, data: bytes) -> bytes:
+        return self.module.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+    def reader(self, stream):
+        return self.module.ZstdDecompressor().stream_reader(stream)
+
+CODECS: Dict[str, Codec] = {codec.name: codec for codec in (GzipCodec(), BrotliCodec(), ZstdCodec())}
+CODECS["x-gzip"] = CODECS["gzip"]
+
+class _ChunkedReader(io.RawIOBase):
+    """Feeds a one-shot decompressor small chunks, so each read expands a bounded amount."""
+
+    def __init__(self, stream, process: Callable[[bytes], bytes]):
+        self._stream = stream
+        self._process = process
+        self._buffer = b""
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while not self._buffer and not self._eof:
+            chunk = self._stream.read(READ_CHUNK)
+            if not chunk:
+                self._eof = True
+            else:
+                self._buffer = self._process(chunk)
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+class _LimitedReader(io.RawIOBase):
+    """Raises RequestEntityTooLarge once more than `max_bytes` have been read."""
+
+    def __init__(self, stream, max_bytes: int):
+        self._stream = stream
+        self._remaining = max_bytes
+        self.max_bytes = max_bytes
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        data = self._stream.read(min(len(target), self._remaining + 1))
+        self._remaining -= len(data)
+        if self._remaining < 0:
+            raise RequestEntityTooLarge(f"Decompressed request body exceeds {self.max_bytes} bytes")
+        target[:len(data)] = data
+        return len(data)
+
+def _encodings(content_encoding: str) -> List[str]:
+    return [value.strip().lower() for value in content_encoding.split(",")
+            if value.strip() and value.strip().lower() != "identity"]
+
+def decompressing_stream(stream, content_encoding: str, max_bytes: int = Config.MAX_DECOMPRESSED_BYTES):
+    """Wrap `stream` to decode a `Content-Encoding` (codings applied in order), capped at `max_bytes`."""
+    for encoding in _encodings(content_encoding):
+        codec = CODECS.get(encoding)
+        if codec is None or not codec.available():
+            raise UnsupportedMediaType(f"Unsupported Content-Encoding: {encoding}")
+    # Codings are listed in the order they were applied, so they are undone from the last
+    for encoding in reversed(_encodings(content_encoding)):
+        stream = io.BufferedReader(CODECS[encoding].reader(stream))
+    return io.BufferedReader(_LimitedReader(stream, max_bytes))
+
+def decompress(data: bytes, content_encoding: Optional[str], max_bytes: int = Config.MAX_DECOMPRESSED_BYTES) -> bytes:
+    """Decode a whole request body."""
+    if not content_encoding or not _encodings(content_encoding):
+        return data
+    return decompressing_stream(io.BytesIO(data), content_encoding, max_bytes).read()
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """The available encoding in RESPONSE_COMPRESSION the client accepts with the highest quality."""
+    if not accept_encoding:
+        return None
+    qualities = {value.lower(): quality for value, quality in parse_accept_header(accept_encoding)}
+    best, best_quality = None, 0.0
+    for name in Config.RESPONSE_COMPRESSION:
+        codec = CODECS.get(name)
+        quality = qualities.get(name, qualities.get("*", 0.0))
+        if codec is not None and quality > best_quality and codec.available():
+            best, best_quality = name, quality
+    return best
+
+def compress_body(data: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """(body, Content-Encoding or None): `data` compressed if it is large enough and the client accepts it."""
+    if len(data) < Config.COMPRESSION_MIN_BYTES:
+        return data, None
+    encoding = negotiate(accept_encoding)
+    if encoding is None:
+        return data, None
+    return CODECS[encoding].compress(data), encoding
+
+def compressible(mimetype: str) -> bool:
+    return (mimetype.startswith("text/") and mimetype != "text/event-stream") or mimetype in COMPRESSIBLE_TYPES
+
+def compress_response(response, accept_encoding: Optional[str]):
+    """Compress a buffered Flask response in place for the client's `Accept-Encoding`."""
+    if (response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers
+            or not 200 <= response.status_code < 300 or response.status_code == 204
+            or not compressible(response.mimetype or "")
+            or "no-transform" in response.headers.get("Cache-Control", "")):
+        return response
+    response.vary.add("Accept-Encoding")
+    body, encoding = compress_body(response.get_data(), accept_encoding)
+    if encoding is not None:
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+class RequestDecompressionMiddleware:
+    """WSGI middleware decoding request bodies sent with a `Content-Encoding`.
+
+    The body is decompressed while the application reads it, so streamed uploads
+    stay streamed; unsupported encodings are answered with 415.
+    """
+
+    def __init__(self, app, max_bytes: int = Config.MAX_DECOMPRESSED_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def __call__(self, environ, start_response):
+        content_encoding = environ.get("HTTP_CONTENT_ENCODING", "")
+        if _encodings(content_encoding):
+            try:
+                stream = decompressing_stream(environ["wsgi.input"], content_encoding, self.max_bytes)
+            except UnsupportedMediaType as e:
+                body = json.dumps({"error": e.description}).encode("utf-8")
+                start_response("415 Unsupported Media Type", [("Content-Type", "application/json"),
+                                                              ("Content-Length", str(len(body)))])
+                return [body]
+            environ = dict(environ, **{"wsgi.input": stream, "wsgi.input_terminated": True})
+            # The decompressed length is unknown until the body has been read
+            environ.pop("CONTENT_LENGTH", None)
+            environ.pop("HTTP_CONTENT_ENCODING", None)
+        return self.app(environ, start_response)
@@ -14,39 +14,145 @@ class Config:
     MISTRAL_API_KEY = os.getenv('MISTRAL_API_KEY')
     DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY')
 
+    # Provider API endpoints; override to use a proxy or the local fake provider in benchmarks/
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # SDK default when unset
+    ANTHROPIC_BASE_URL = os.getenv('ANTHROPIC_BASE_URL')  # SDK default when unset
+    MISTRAL_BASE_URL = os.getenv('MISTRAL_BASE_URL', 'https://api.mistral.ai')
+
     # AI Settings
     DEFAULT_AI_PROVIDER = os.getenv('DEFAULT_AI_PROVIDER', 'mistral')
     MISTRAL_DEFAULT_MODEL = os.getenv('MISTRAL_DEFAULT_MODEL')  # Environment variable for default Mistral model
     MAX_INPUT_LENGTH = 15000  # Maximum characters for resume content
+    MAX_OUTPUT_TOKENS = int(os.getenv('MAX_OUTPUT_TOKENS', '4096'))  # Completion limit (required by Anthropic)
+    INPUT_TOKEN_BUDGET = int(os.getenv('INPUT_TOKEN_BUDGET', '0'))  # Prompt token cap; 0 uses the model's context window
+
+    # Prompt templates: the default base prompt and a directory of named alternatives
+    BASE_PROMPT_PATH = os.getenv('BASE_PROMPT_PATH', 'inputs/base_prompt.md')
+    PROMPT_TEMPLATES_DIR = os.getenv('PROMPT_TEMPLATES_DIR', 'inputs/prompts')
+    PROMPT_TEMPLATE_CHECK_INTERVAL = float(os.getenv('PROMPT_TEMPLATE_CHECK_INTERVAL', '2'))  # Seconds between mtime checks
+
+    # Seconds a provider's model list is cached before it is refreshed
+    MODEL_CATALOG_TTL = float(os.getenv('MODEL_CATALOG_TTL', '3600'))
+
+    # Seconds each provider gets to answer when listing models for all providers
+    MODELS_PROVIDER_TIMEOUT = float(os.getenv('MODELS_PROVIDER_TIMEOUT', '5'))
+
+    # Optimized resume cache: memory tier size and optional disk tier ('sqlite' or 'directory')
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    RESPONSE_CACHE_DISK_BACKEND = os.getenv('RESPONSE_CACHE_DISK_BACKEND', '').lower()
+    RESPONSE_CACHE_DISK_PATH = os.getenv('RESPONSE_CACHE_DISK_PATH', '.cache/responses.sqlite3')
+    RESPONSE_CACHE_DISK_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_DISK_MAX_ENTRIES', '10000'))
+
+    # Size of the in-memory cache of diffs between original and optimized resumes
+    DIFF_CACHE_MAX_BYTES = int(os.getenv('DIFF_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+
+    # Batch optimization limits
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '100'))
+    BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '8'))
+
+    # Largest number of resumes, and of job descriptions, in one /api/v1/score request
+    SCORE_MAX_DOCUMENTS = int(os.getenv('SCORE_MAX_DOCUMENTS', '1000'))
+
+    # Near-duplicate job descriptions: requests with `near_duplicates` set to 'reuse' or 'flag' are
+    # matched against earlier postings at or above the estimated Jaccard similarity threshold
+    NEAR_DUPLICATE_MODE = os.getenv('NEAR_DUPLICATE_MODE', 'off').lower()  # Default for requests that omit it
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.85'))
+    NEAR_DUPLICATE_DB_PATH = os.getenv('NEAR_DUPLICATE_DB_PATH', '.cache/near_duplicates.sqlite3')
+    NEAR_DUPLICATE_MAX_ENTRIES = int(os.getenv('NEAR_DUPLICATE_MAX_ENTRIES', '100000'))
+
+    # Incremental optimization: resumes are optimized section by section, and only sections
+    # without a cached result are sent to the provider, at most SECTION_MAX_CONCURRENCY at once
+    INCREMENTAL_OPTIMIZATION = os.getenv('INCREMENTAL_OPTIMIZATION', 'False').lower() == 'true'
+    SECTION_MAX_CONCURRENCY = int(os.getenv('SECTION_MAX_CONCURRENCY', '4'))
+
+    # Background optimization jobs
+    JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', '.cache/jobs.sqlite3')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+    JOB_RESULT_TTL = float(os.getenv('JOB_RESULT_TTL', str(24 * 3600)))  # Seconds finished jobs are kept
+    # Seconds a worker holds a running job without renewing it; jobs of a worker that died are
+    # claimed again once their lease expires
+    JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))
+
+    # Document uploads: size limit, extraction processes, pages before a PDF is split across them,
+    # and the size of the cache of extracted texts keyed by file hash
+    MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+    UPLOAD_SPOOL_BYTES = int(os.getenv('UPLOAD_SPOOL_BYTES', str(1024 * 1024)))  # Larger uploads are spooled to disk
+    UPLOAD_TEMP_DIR = os.getenv('UPLOAD_TEMP_DIR')  # Directory of spooled uploads; the system default when unset
+    EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', str(min(4, os.cpu_count() or 1))))
+    EXTRACTION_PARALLEL_MIN_PAGES = int(os.getenv('EXTRACTION_PARALLEL_MIN_PAGES', '8'))
+    EXTRACTION_CACHE_MAX_BYTES = int(os.getenv('EXTRACTION_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+
+    # Response compression: encodings offered in order of preference ('br' needs the brotli package,
+    # 'zstd' the zstandard package; empty disables compression) and the smallest body compressed
+    RESPONSE_COMPRESSION = [e.strip().lower() for e in os.getenv('RESPONSE_COMPRESSION', 'zstd,br,gzip').split(',')
+                            if e.strip()]
+    COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+    # Largest request body after decoding its Content-Encoding
+    MAX_DECOMPRESSED_BYTES = int(os.getenv('MAX_DECOMPRESSED_BYTES', str(16 * 1024 * 1024)))
+
+    # JSON encoder/decoder: 'auto' (orjson when installed), 'orjson', 'json' or a registered backend
+    JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto').lower()
+
+    # Maximum optimize calls in flight per ASGI worker
+    ASYNC_MAX_CONCURRENCY = int(os.getenv('ASYNC_MAX_CONCURRENCY', '256'))
+
+    # Client-side provider quotas in requests and tokens per minute, shared by all worker processes
+    # through RATE_LIMIT_DB_PATH (e.g. OPENAI_RPM=500, OPENAI_TPM=30000; 0 disables a limit)
+    RATE_LIMITS = {
+        provider: {
+            'rpm': int(os.getenv(f'{provider.upper()}_RPM', '0')),
+            'tpm': int(os.getenv(f'{provider.upper()}_TPM', '0'))
+        }
+        for provider in ('openai', 'anthropic', 'mistral')
+    }
+    RATE_LIMIT_DB_PATH = os.getenv('RATE_LIMIT_DB_PATH', '.cache/rate_limits.sqlite3')
+    RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', '60'))  # Longest a request queues before a 429
+    PROVIDER_MAX_CONCURRENCY = int(os.getenv('PROVIDER_MAX_CONCURRENCY', '16'))  # Per-worker ceiling for AIMD
+    PROVIDER_MAX_RETRIES = int(os.getenv('PROVIDER_MAX_RETRIES', '3'))
+    PROVIDER_RETRY_BASE_DELAY = float(os.getenv('PROVIDER_RETRY_BASE_DELAY', '0.5'))
+    PROVIDER_RETRY_MAX_DELAY = float(os.getenv('PROVIDER_RETRY_MAX_DELAY', '30'))
+
+    # Routing: providers tried in order when the requested one fails, and hedging of slow requests
+    FAILOVER_PROVIDERS = [p.strip().lower() for p in os.getenv('FAILOVER_PROVIDERS', '').split(',') if p.strip()]
+    HEDGE_REQUESTS = os.getenv('HEDGE_REQUESTS', 'False').lower() == 'true'
+    HEDGE_DELAY = float(os.getenv('HEDGE_DELAY', '2'))  # Seconds before hedging until enough latencies are known
+    ROUTER_HEALTH_WINDOW = int(os.getenv('ROUTER_HEALTH_WINDOW', '100'))  # Recent calls used for health scores
+
+    # Providers whose clients are created when the app starts (comma separated)
+    WARM_UP_PROVIDERS = [p.strip() for p in os.getenv('WARM_UP_PROVIDERS', '').split(',') if p.strip()]
 
     # Supported AI Providers
     SUPPORTED_PROVIDERS = ['openai', 'anthropic', 'mistral']
 
+    @classmethod
+    def supported_providers(cls) -> list:
+        """Providers with a registered backend: the built-in ones and any plugins."""
+        from provider_backends import backend_registry
+        return backend_registry.names()
+
     @classmethod
     def get_available_models(cls, provider: str) -> list:
         """Get available models for a provider."""
-        from ai_utils import AIProvider
-        if provider not in cls.SUPPORTED_PROVIDERS:
+        from provider_pool import provider_pool
+        if provider not in cls.supported_providers():
             raise ValueError(f"Unsupported provider: {provider}")
-        ai_provider = AIProvider(provider=provider)
-        return ai_provider.get_available_models()
+        return provider_pool.get(provider).get_available_models()
 
     @classmethod
     def get_default_model(cls, provider: str) -> str:
         """Get default model for a provider."""
-        from ai_utils import AIProvider
-        if provider not in cls.SUPPORTED_PROVIDERS:
+        from provider_pool import provider_pool
+        if provider not in cls.supported_providers():
             raise ValueError(f"Unsupported provider: {provider}")
-            
+
         # Check for provider-specific default model
         if provider == 'mistral' and cls.MISTRAL_DEFAULT_MODEL:
             return cls.MISTRAL_DEFAULT_MODEL
             
-        ai_provider = AIProvider(provider=provider)
-        models = ai_provider.get_available_models()
+        models = provider_pool.get(provider).get_available_models()
         return models[0] if models else None
 
     @classmethod
     def validate_provider(cls, provider: str) -> bool:
         """Check if a provider is supported."""
-        return provider.lower() in cls.SUPPORTED_PROVIDERS
\ No newline at end of file
+        return provider.lower() in cls.supported_providers()
\ No newline at end of file
@@ -2,8 +2,9 @@ import argparse
 import json
 import subprocess
 import sys
-import time
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 import os
@@ -12,6 +13,7 @@ from datetime import datetime
 # Load environment variables
 load_dotenv()
 DEFAULT_MODEL = os.getenv('MISTRAL_DEFAULT_MODEL', 'mistral-large-latest')
+OUTPUT_DIR = Path('outputs')
 
 # Python interpreter paths for virtual environments
 RESUME_OPTIMIZER_VENV = Path(__file__).parent / ".venv" / "Scripts" / "python.exe"
@@ -22,18 +24,47 @@ def read_file_content(file_path):
     with open(file_path, 'r', encoding='utf-8') as f:
         return f.read()
 
-def wait_for_server(port=5000, timeout=10):
-    """Wait for server to start."""
-    url = f"http://localhost:{port}/api/v1/health"
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                return True
-        except requests.ConnectionError:
-            time.sleep(0.5)
-    return False
+def read_optional_file(file_path):
+    """Read a file if a path is given."""
+    return read_file_content(file_path) if file_path else None
+
+def extract_resume_text(file_path):
+    """Extract the text of a PDF, DOCX or text resume in this process."""
+    from document_extraction import document_extractor
+    with open(file_path, 'rb') as f:
+        return document_extractor.extract(f, str(file_path)).text
+
+def load_app():
+    """Import the Flask app; slow enough (provider SDKs) to overlap with loading the inputs."""
+    from app import app
+    return app
+
+def start_server(command, cwd=None, debug=False, timeout=10):
+    """Start a Flask development server and wait until it reports that it is listening.
+
+    Readiness is signalled by the server's "Running on" log line, read from its stderr,
+    instead of polling the health endpoint. Returns the process, or None if it failed to start.
+    """
+    process = subprocess.Popen(command, cwd=cwd, stdout=None if debug else subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, text=True)
+    ready = threading.Event()
+    listening = []
+
+    def watch_output():
+        # Keep draining stderr so the server never blocks on a full pipe
+        for line in process.stderr:
+            if debug:
+                sys.stderr.write(line)
+            if "Running on" in line and not listening:
+                listening.append(True)
+                ready.set()
+        ready.set()  # the server exited
+
+    threading.Thread(target=watch_output, daemon=True).start()
+    if not ready.wait(timeout) or not listening:
+        process.terminate()
+        return None
+    return process
 
 def convert_document_to_text(file_path, port=5001):
     """Convert document to text using doc2text API."""
@@ -44,10 +75,10 @@ def convert_document_to_text(file_path, port=5001):
     return response.json()['data']['text']
 
 def optimize_resume(resume_content, guidelines=None, job_description=None, custom_prompt=None,
-                     provider="mistral", model=None, debug=False, base_prompt_path=None):
-    """Send optimization request to API."""
+                     provider="mistral", model=None, debug=False, base_prompt_path=None, client=None):
+    """Send optimization request to API, or to the in-process app through its test `client`."""
     url = "http://localhost:5000/api/v1/optimize"
-    
+
     payload = {
         "resume_content": resume_content,
         "ai_provider": provider,
@@ -67,12 +98,14 @@ def optimize_resume(resume_content, guidelines=None, job_description=None, custo
         print("\nRequest Payload:")
         print(json.dumps(payload, indent=2))
         
-    response = requests.post(url, json=payload)
-    response_json = response.json()
+    if client is not None:
+        response_json = client.post("/api/v1/optimize", json=payload).get_json()
+    else:
+        response_json = requests.post(url, json=payload).json()
     
     # Save output to file with timestamp
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = Path('outputs') / f"output_{timestamp}.txt"
+    output_file = OUTPUT_DIR / f"output_{timestamp}.txt"
     
     with output_file.open("w", encoding="utf-8") as f:
         f.write(response_json["optimized_content"])
@@ -84,11 +117,111 @@ def optimize_resume(resume_content, guidelines=None, job_description=None, custo
         print("\nOptimized Resume:")
         print(response_json["optimized_content"])
         
-    print(f"\nOutput saved to: {output_file.relative_to(Path.cwd())}")
+    print(f"\nOutput saved to: {output_file}")
+
+def run_in_process(args):
+    """Optimize without starting any server: the app runs in this process through its test client.
+
+    Importing the app, extracting the resume and reading the other inputs run concurrently.
+    """
+    # Modules shared by the app and the extraction are imported once, before the threads start
+    import document_extraction  # noqa: F401
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        app_future = executor.submit(load_app)
+        resume_future = executor.submit(extract_resume_text, args.resume)
+        guidelines_future = executor.submit(read_optional_file, args.guidelines)
+        job_description_future = executor.submit(read_optional_file, args.job_description)
+
+        optimize_resume(
+            resume_content=resume_future.result(),
+            guidelines=guidelines_future.result(),
+            job_description=job_description_future.result(),
+            custom_prompt=args.custom_prompt,
+            model=args.model,
+            debug=args.debug,
+            base_prompt_path=args.base_prompt,
+            client=app_future.result().test_client()
+        )
+
+def run_bulk(args):
+    """Optimize every resume/job description pair in-process, resuming from the output directory's checkpoint."""
+    import bulk
+
+    pairs = bulk.collect_pairs(args.resumes or ([args.resume] if args.resume else []), args.job_descriptions or
+                               ([args.job_description] if args.job_description else []), args.pairs)
+    guidelines = read_optional_file(args.guidelines)
+    client = load_app().test_client()  # Flask's test client is safe to share between threads
+
+    def optimize(resume_content, job_description):
+        payload = {"resume_content": resume_content, "ai_provider": args.provider,
+                   "guidelines": guidelines, "job_description": job_description, "custom_prompt": args.custom_prompt}
+        if args.model:
+            payload["model"] = args.model  # otherwise the server uses the provider's default model
+        response = client.post("/api/v1/optimize", json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(response.get_json().get("error", f"HTTP {response.status_code}"))
+        return response.get_json()["optimized_content"]
+
+    def progress(entry):
+        status = "ok" if entry["status"] == "success" else f"error: {entry['error']}"
+        print(f"[{entry['seconds']:.2f}s] {entry['resume']} x {entry['job_description']}: {status}")
+
+    settings = {"provider": args.provider, "model": args.model, "guidelines": guidelines,
+                "custom_prompt": args.custom_prompt}
+    print(f"Optimizing {len(pairs)} pairs with {args.concurrency} concurrent requests")
+    summary = bulk.run_bulk(pairs, args.output_dir, optimize, extract_resume_text, settings,
+                            concurrency=args.concurrency, progress=progress)
+    print(json.dumps(summary, indent=2))
+
+def run_with_servers(args):
+    """Optimize through the resume optimizer and doc2text servers started as subprocesses."""
+    # Verify Python interpreter paths exist
+    if not RESUME_OPTIMIZER_VENV.exists():
+        print(f"Error: Resume optimizer venv not found at {RESUME_OPTIMIZER_VENV}")
+        sys.exit(1)
+    if not DOC2TEXT_VENV.exists():
+        print(f"Error: Doc2text venv not found at {DOC2TEXT_VENV}")
+        sys.exit(1)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        # Both servers start at once, while the text inputs are read
+        doc2text_future = executor.submit(
+            start_server,
+            [str(DOC2TEXT_VENV), "-m", "flask", "--app", "app.api.document_converter", "run", "--port", "5001"],
+            "../doc2text", args.debug
+        )
+        optimizer_future = executor.submit(start_server, [str(RESUME_OPTIMIZER_VENV), "app.py"], None, args.debug)
+        guidelines_future = executor.submit(read_optional_file, args.guidelines)
+        job_description_future = executor.submit(read_optional_file, args.job_description)
+        doc2text_server, optimizer_server = doc2text_future.result(), optimizer_future.result()
+
+        if doc2text_server is None or optimizer_server is None:
+            print("Error: One or both servers failed to start")
+            for server in (doc2text_server, optimizer_server):
+                if server is not None:
+                    server.terminate()
+            sys.exit(1)
+
+        try:
+            # Conversion overlaps with reading the remaining inputs
+            resume_text = convert_document_to_text(args.resume, port=5001)
+            optimize_resume(
+                resume_content=resume_text,
+                guidelines=guidelines_future.result(),
+                job_description=job_description_future.result(),
+                custom_prompt=args.custom_prompt,
+                model=args.model,
+                debug=args.debug,
+                base_prompt_path=args.base_prompt
+            )
+        finally:
+            doc2text_server.terminate()
+            optimizer_server.terminate()
 
 def main():
     parser = argparse.ArgumentParser(description="Resume Optimization Demo")
-    parser.add_argument("--resume", required=True, help="Path to resume content file")
+    parser.add_argument("--resume", help="Path to resume content file")
     parser.add_argument("--guidelines", default="inputs/RESUME_GUIDELINES.md",
                         help="Path to guidelines file")
     parser.add_argument("--model", help="Specific Mistral model to use")
@@ -97,69 +230,32 @@ def main():
     parser.add_argument("--debug", action="store_true", help="Show debug information")
     parser.add_argument("--base-prompt", default="inputs/base_prompt.md",
                         help="Path to base prompt template")
+    parser.add_argument("--servers", action="store_true",
+                        help="Run through the optimizer and doc2text servers instead of in-process")
+
+    bulk_options = parser.add_argument_group("bulk mode")
+    bulk_options.add_argument("--resumes", nargs="+", help="Resume files, directories or glob patterns")
+    bulk_options.add_argument("--job-descriptions", nargs="+",
+                              help="Job description files, directories or glob patterns (cross product with --resumes)")
+    bulk_options.add_argument("--pairs", help="CSV or JSON file mapping resumes to job descriptions")
+    bulk_options.add_argument("--output-dir", default="outputs/bulk",
+                              help="Results and checkpoint; rerun with the same directory to resume")
+    bulk_options.add_argument("--concurrency", type=int, default=4, help="Optimizations in flight")
+    bulk_options.add_argument("--provider", default="mistral", help="AI provider for bulk runs")
     
     args = parser.parse_args()
-    
-    # Verify Python interpreter paths exist
-    if not RESUME_OPTIMIZER_VENV.exists():
-        print(f"Error: Resume optimizer venv not found at {RESUME_OPTIMIZER_VENV}")
-        sys.exit(1)
-    if not DOC2TEXT_VENV.exists():
-        print(f"Error: Doc2text venv not found at {DOC2TEXT_VENV}")
-        sys.exit(1)
+    bulk_mode = bool(args.resumes or args.job_descriptions or args.pairs)
+    if not bulk_mode and not args.resume:
+        parser.error("--resume is required unless --resumes, --job-descriptions or --pairs is given")
+    if bulk_mode and not args.pairs and not (args.resumes or args.resume):
+        parser.error("--job-descriptions needs resumes: pass --resumes or --resume")
 
-    # Start doc2text server on port 5001
-    doc2text_server = subprocess.Popen([
-        str(DOC2TEXT_VENV),
-        "-m", "flask",
-        "--app", "app.api.document_converter",
-        "run",
-        "--port", "5001"
-    ],
-        cwd="../doc2text",
-        stdout=subprocess.PIPE if not args.debug else None,
-        stderr=subprocess.PIPE if not args.debug else None
-    )
-
-    # Start resume optimizer server on port 5000
-    optimizer_server = subprocess.Popen([
-        str(RESUME_OPTIMIZER_VENV),
-        "app.py"
-    ],
-        stdout=subprocess.PIPE if not args.debug else None,
-        stderr=subprocess.PIPE if not args.debug else None
-    )
-    
-    # Wait for both servers to start
-    servers_ready = wait_for_server(port=5001, timeout=10) and wait_for_server(port=5000, timeout=10)
-    
-    if not servers_ready:
-        print("Error: One or both servers failed to start")
-        doc2text_server.terminate()
-        optimizer_server.terminate()
-        sys.exit(1)
-        
-    try:
-        # First convert document to text
-        resume_text = convert_document_to_text(args.resume, port=5001)
-        
-        # Read guidelines and job description if provided
-        guidelines = read_file_content(args.guidelines) if args.guidelines else None
-        job_description = read_file_content(args.job_description) if args.job_description else None
-        
-        # Make optimization request
-        optimize_resume(
-            resume_content=resume_text,
-            guidelines=guidelines,
-            job_description=job_description,
-            custom_prompt=args.custom_prompt,
-            model=args.model,
-            debug=args.debug,
-            base_prompt_path=args.base_prompt
-        )
-    finally:
-        doc2text_server.terminate()
-        optimizer_server.terminate()
+    if bulk_mode:
+        run_bulk(args)
+    elif args.servers:
+        run_with_servers(args)
+    else:
+        run_in_process(args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,188 @@
+from typing import Optional, List, Dict, Any, Union, BinaryIO
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import io
+import json
+import os
+import threading
+import zipfile
+import logging
+from xml.etree import ElementTree
+from config import Config
+from response_cache import MemoryTier
+from uploads import file_path
+
+logger = logging.getLogger(__name__)
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Bytes read at a time when hashing an uploaded file
+HASH_CHUNK_BYTES = 1024 * 1024
+
+class Extraction:
+    """Text extracted from an uploaded document."""
+
+    def __init__(self, text: str, document_type: str, pages: int, digest: str, cached: bool = False):
+        self.text = text
+        self.document_type = document_type  # 'pdf', 'docx' or 'text'
+        self.pages = pages
+        self.digest = digest  # sha256 of the document bytes
+        self.cached = cached
+
+    def report(self) -> Dict[str, Any]:
+        return {"type": self.document_type, "pages": self.pages, "sha256": self.digest, "cached": self.cached}
+
+def detect_type(data: bytes, filename: Optional[str] = None) -> str:
+    """Identify a document by its leading bytes, falling back to the file extension."""
+    if data[:5] == b"%PDF-":
+        return "pdf"
+    if data[:4] == b"PK\x03\x04":
+        return "docx"
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in (".pdf", ".docx"):
+        raise ValueError(f"File is not a valid {extension[1:].upper()} document")
+    if extension in ("", ".txt", ".md", ".text"):
+        return "text"
+    raise ValueError(f"Unsupported document type: {extension}")
+
+def _pdf_reader(source: Union[bytes, str, BinaryIO]):
+    # Optional, and imported on the first PDF so it does not slow down app startup
+    try:
+        import pypdf
+    except ImportError:
+        raise ValueError("PDF support requires the pypdf package")
+    try:
+        return pypdf.PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+    except Exception as e:
+        raise ValueError(f"Could not read PDF: {str(e)}")
+
+def _extract_pdf_pages(source: Union[bytes, str], start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop) of a PDF given as bytes or a path; runs in the extraction worker processes."""
+    reader = _pdf_reader(source)
+    return [reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+def _extract_docx(stream: BinaryIO) -> str:
+    """Paragraph text of a DOCX body, including tables, one paragraph per line."""
+    paragraphs = []
+    try:
+        with zipfile.ZipFile(stream) as archive, archive.open("word/document.xml") as document:
+            # Parsed incrementally; finished paragraphs are cleared to keep memory flat
+            for _, element in ElementTree.iterparse(document):
+                if element.tag != f"{WORD_NAMESPACE}p":
+                    continue
+                parts = []
+                for node in element.iter():
+                    if node.tag == f"{WORD_NAMESPACE}t":
+                        parts.append(node.text or "")
+                    elif node.tag == f"{WORD_NAMESPACE}tab":
+                        parts.append("\t")
+                    elif node.tag in (f"{WORD_NAMESPACE}br", f"{WORD_NAMESPACE}cr"):
+                        parts.append("\n")
+                paragraphs.append("".join(parts))
+                element.clear()
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+        raise ValueError("File is not a valid DOCX document")
+    return "\n".join(paragraphs).strip()
+
+def _hash_stream(stream: BinaryIO) -> str:
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_BYTES), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+class DocumentExtractor:
+    """Converts PDF, DOCX and plain-text uploads to text.
+
+    - Results are cached by the SHA-256 of the document, so a re-upload skips extraction.
+    - PDFs with at least `parallel_min_pages` pages are split into one contiguous page
+      range per worker and extracted in a process pool; shorter ones are extracted inline.
+    """
+
+    def __init__(
+        self,
+        workers: int = Config.EXTRACTION_WORKERS,
+        parallel_min_pages: int = Config.EXTRACTION_PARALLEL_MIN_PAGES,
+        cache_max_bytes: int = Config.EXTRACTION_CACHE_MAX_BYTES
+    ):
+        self.workers = workers
+        self.parallel_min_pages = parallel_min_pages
+        self._cache = MemoryTier(cache_max_bytes)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def extract(self, source: Union[bytes, BinaryIO], filename: Optional[str] = None) -> Extraction:
+        """Extract the text of a document given as bytes or a seekable binary file.
+
+        Files are read in place (spooled uploads from disk), never copied whole into memory.
+        """
+        stream = io.BytesIO(source) if isinstance(source, bytes) else source
+        size = stream.seek(0, io.SEEK_END)
+        if not size:
+            raise ValueError("Uploaded file is empty")
+        digest = _hash_stream(stream)
+        cached = self._cache.get(digest)
+        if cached is not None:
+            document_type, pages, text = json.loads(cached)
+            return Extraction(text, document_type, pages, digest, cached=True)
+
+        document_type = detect_type(stream.read(8), filename)
+        stream.seek(0)
+        if document_type == "pdf":
+            text, pages = self._extract_pdf(stream)
+        elif document_type == "docx":
+            text, pages = _extract_docx(stream), 1
+        else:
+            if size > Config.MAX_INPUT_LENGTH * 4:  # at most 4 UTF-8 bytes per character
+                raise ValueError(f"Resume content must be between 1 and {Config.MAX_INPUT_LENGTH} characters")
+            try:
+                text, pages = stream.read().decode("utf-8-sig"), 1
+            except UnicodeDecodeError:
+                raise ValueError("Text files must be UTF-8 encoded")
+
+        if not text.strip():
+            raise ValueError("No text could be extracted from the document")
+        self._cache.put(digest, json.dumps([document_type, pages, text]))
+        return Extraction(text, document_type, pages, digest)
+
+    def _extract_pdf(self, stream: BinaryIO):
+        reader = _pdf_reader(stream)
+        pages = len(reader.pages)
+        if self.workers <= 1 or pages < self.parallel_min_pages:
+            texts = [page.extract_text() or "" for page in reader.pages]
+        else:
+            # Workers open files on disk by path; only in-memory documents are sent to them
+            source = file_path(stream)
+            if source is None:
+                stream.seek(0)
+                source = stream.read()
+            else:
+                stream.flush()
+            chunks = min(self.workers, pages)
+            bounds = [pages * index // chunks for index in range(chunks + 1)]
+            logger.info(f"Extracting {pages} PDF pages in {chunks} processes")
+            futures = [self._pool().submit(_extract_pdf_pages, source, start, stop)
+                       for start, stop in zip(bounds, bounds[1:])]
+            texts = [text for future in futures for text in future.result()]
+        return "\n\n".join(text.strip() for text in texts if text.strip()), pages
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+document_extractor = DocumentExtractor()
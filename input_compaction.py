@@ -0,0 +1,177 @@
+from typing import Optional, Dict, Any
+from functools import lru_cache
+import math
+import re
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # Optional: exact counts for OpenAI models
+    tiktoken = None
+
+# Average characters per token for English prose, used when no local tokenizer is available
+CHARS_PER_TOKEN = {
+    'openai': 4.0,
+    'anthropic': 3.5,
+    'mistral': 3.6
+}
+
+# Context windows in tokens, matched by model name prefix (longest prefix wins)
+MODEL_CONTEXT_WINDOWS = {
+    'gpt-3.5-turbo': 16385,
+    'gpt-4': 8192,
+    'gpt-4-32k': 32768,
+    'gpt-4-turbo': 128000,
+    'gpt-4-1106': 128000,
+    'gpt-4-0125': 128000,
+    'gpt-4o': 128000,
+    'claude-2': 100000,
+    'claude-2.1': 200000,
+    'claude-3': 200000,
+    'mistral-tiny': 32000,
+    'mistral-small': 32000,
+    'mistral-medium': 32000,
+    'mistral-large': 32000,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Characters left behind by PDF-to-text extraction that carry no content. Bullets,
+# indentation and every other character of the text are kept as they are.
+PDF_NOISE_PATTERNS = [
+    (re.compile(r"\(cid:\d+\)"), ""),                                       # unmapped glyphs
+    (re.compile("[\u200b\u200c\u200d\u2060\ufeff\u00ad]"), ""),      # zero-width and soft hyphens
+    (re.compile("[\u00a0\u2009\u202f]"), " "),                            # odd spaces
+    (re.compile(r"\f"), "\n"),                                              # page breaks
+    (re.compile(r"^[ \t]*page[ \t]+\d+([ \t]+of[ \t]+\d+)?[ \t]*$", re.IGNORECASE | re.MULTILINE), ""),  # "Page N of M"
+]
+
+# Whole heading lines that start job-description sections with nothing to optimize a resume for
+BOILERPLATE_HEADING = re.compile(
+    r"^(#{1,6}\s+)?(your |our |the )?("
+    r"benefits( (and|&) perks)?|perks( (and|&) benefits)?|what we offer|we offer|"
+    r"why (join|work (with|for|at)) [\w ]{1,30}|compensation( (and|&) benefits)?|salary( range)?|pay range|"
+    r"equal (employment )?opportunit(y|ies)( employer| statement)?|eeo( statement)?|"
+    r"diversity( (and|&) inclusion)?|how to apply|application process|about the company|"
+    r"meet the hiring team|see how you compare to \d+ applicants|applicants for this job|"
+    r"exclusive job seeker insights|the latest hiring trends?"
+    r")\s*[:.?!]?$",
+    re.IGNORECASE
+)
+
+# Sentences that are boilerplate wherever they appear. Matches may only start where a sentence
+# starts, otherwise a long line without full stops is rescanned from every position.
+BOILERPLATE_SENTENCE = re.compile(
+    r"(?<![^.\n])[^.\n]*(equal opportunity employer|without regard to (race|age|gender)|"
+    r"reasonable accommodation|e-verify)[^.\n]*\.?",
+    re.IGNORECASE
+)
+
+# A short line that looks like a section heading ("Your qualifications:", "Requirements"),
+# not a bullet or a sentence
+HEADING = re.compile(r"^(#{1,6}\s+)?[A-Z][^\n.!?:]{1,58}:?$")
+HEADING_MAX_WORDS = 6
+
+# Characters cut beyond the proportional share when truncating the job description.
+# Estimates round up and a cut can split a word into extra tokens, so the exact share
+# can still land a few tokens over budget.
+TRUNCATION_MARGIN_CHARS = 16
+
+def estimate_tokens(text: Optional[str], provider: str = 'openai', model: Optional[str] = None) -> int:
+    """Fast local estimate of how many tokens `text` uses with the given provider and model."""
+    if not text:
+        return 0
+    if tiktoken is not None and provider == 'openai':
+        encoding = _tiktoken_encoding(model)
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN.get(provider, 4.0))
+
+@lru_cache(maxsize=16)
+def _tiktoken_encoding(model: Optional[str]):
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return tiktoken.get_encoding("cl100k_base")
+
+def token_budget(model: str) -> int:
+    """Input-token budget for a model: the configured cap, or its context window minus the output allowance."""
+    if Config.INPUT_TOKEN_BUDGET:
+        return Config.INPUT_TOKEN_BUDGET
+    matches = [prefix for prefix in MODEL_CONTEXT_WINDOWS if model and model.startswith(prefix)]
+    window = MODEL_CONTEXT_WINDOWS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_WINDOW
+    return window - Config.MAX_OUTPUT_TOKENS
+
+def normalize_text(text: Optional[str]) -> Optional[str]:
+    """Strip PDF-extraction noise and redundant whitespace, keeping line structure and indentation."""
+    if not text:
+        return text
+    for pattern, replacement in PDF_NOISE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    text = re.sub(r"(?<=\S) {2,}", " ", text)
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+def _is_heading(line: str) -> bool:
+    return bool(HEADING.match(line)) and len(line.split()) <= HEADING_MAX_WORDS
+
+def trim_job_description(text: Optional[str]) -> Optional[str]:
+    """Drop boilerplate sections (benefits, EEO statements, job board widgets) from a job description."""
+    if not text:
+        return text
+    kept = []
+    skipping = False
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if BOILERPLATE_HEADING.match(stripped):
+            skipping = True
+            continue
+        if skipping and _is_heading(stripped):
+            # A new, non-boilerplate section starts
+            skipping = False
+        if not skipping:
+            kept.append(line)
+    return normalize_text(BOILERPLATE_SENTENCE.sub("", "\n".join(kept)))
+
+def compact_inputs(optimizer, options: Dict[str, Any]) -> Dict[str, int]:
+    """Normalize and trim optimize_resume inputs in place and enforce the model's token budget.
+
+    Returns a report of the estimated prompt size before and after compaction.
+    Raises ValueError if the prompt cannot be brought within budget.
+    """
+    provider, model = optimizer.provider, optimizer.get_current_model()
+    budget = token_budget(model)
+    tokens_before = estimate_tokens(optimizer.build_prompt(**_prompt_fields(options)), provider, model)
+
+    options["resume_content"] = normalize_text(options["resume_content"])
+    options["job_description"] = trim_job_description(options.get("job_description"))
+    options["guidelines"] = normalize_text(options.get("guidelines"))
+    options["custom_prompt"] = normalize_text(options.get("custom_prompt"))
+
+    tokens_after = estimate_tokens(optimizer.build_prompt(**_prompt_fields(options)), provider, model)
+    if tokens_after > budget and options["job_description"]:
+        # The job description is the only input we can shorten without losing resume content
+        excess = tokens_after - budget
+        job_tokens = estimate_tokens(options["job_description"], provider, model)
+        if excess < job_tokens:
+            keep = len(options["job_description"]) * (job_tokens - excess) // job_tokens - TRUNCATION_MARGIN_CHARS
+            options["job_description"] = options["job_description"][:max(keep, 0)].rstrip()
+            logger.warning(f"Truncated job description to fit the {budget} token budget of {model}")
+            tokens_after = estimate_tokens(optimizer.build_prompt(**_prompt_fields(options)), provider, model)
+
+    if tokens_after > budget:
+        raise ValueError(f"Prompt needs about {tokens_after} tokens but {model} allows {budget}")
+
+    return {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "token_budget": budget
+    }
+
+def _prompt_fields(options: Dict[str, Any]) -> Dict[str, Any]:
+    fields = ("resume_content", "guidelines", "job_description", "custom_prompt", "template")
+    return {field: options.get(field) for field in fields}
@@ -0,0 +1,322 @@
+from typing import Optional, List, Dict, Any
+from pathlib import Path
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from config import Config
+from provider_pool import provider_pool
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# Attempts to claim a queued job another process may be claiming at the same time
+CLAIM_ATTEMPTS = 5
+
+class JobStore:
+    """SQLite-backed store of optimization jobs; survives restarts.
+
+    Several processes can share the database. A running job is leased to the store
+    that claimed it (its `owner`) until `lease_expires_at`; the owner renews the
+    lease while it works, and a job whose lease expired, because its process died,
+    is queued again.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = Config.JOB_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "progress REAL NOT NULL DEFAULT 0, payload TEXT NOT NULL, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL, expires_at REAL, "
+            "owner TEXT, lease_expires_at REAL)"
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("lease_expires_at", "REAL")):
+            if column not in columns:  # databases created before leases
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def create(self, payload: Dict[str, Any], priority: int = 0) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, priority, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, priority, json.dumps(payload), time.time())
+            )
+            self._conn.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or (row["expires_at"] is not None and row["expires_at"] <= time.time()):
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def requeue_expired(self) -> int:
+        """Queue again the running jobs whose lease expired, e.g. because their worker died."""
+        with self._lock:
+            requeued = self._conn.execute(
+                "UPDATE jobs SET status = ?, progress = 0, owner = NULL, lease_expires_at = NULL "
+                "WHERE status = ? AND (lease_expires_at IS NULL OR lease_expires_at <= ?)",
+                (QUEUED, RUNNING, time.time())
+            ).rowcount
+            self._conn.commit()
+        if requeued:
+            logger.warning(f"Requeued {requeued} job(s) whose worker lease expired")
+        return requeued
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """Lease the highest priority, oldest queued job to this store, mark it running and return it."""
+        self.requeue_expired()
+        for _ in range(CLAIM_ATTEMPTS):
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1",
+                    (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                # Only one process can move the row out of `queued`
+                claimed = self._conn.execute(
+                    "UPDATE jobs SET status = ?, owner = ?, lease_expires_at = ?, started_at = ? "
+                    "WHERE id = ? AND status = ?",
+                    (RUNNING, self.owner, now + self.lease_seconds, now, row["id"], QUEUED)
+                ).rowcount
+                self._conn.commit()
+            if claimed:
+                return self.get(row["id"])
+        return None
+
+    def renew(self, job_ids: List[str]) -> None:
+        """Extend the leases of jobs this store is running."""
+        if not job_ids:
+            return
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET lease_expires_at = ? WHERE owner = ? AND status = ? "
+                f"AND id IN ({', '.join('?' * len(job_ids))})",
+                (time.time() + self.lease_seconds, self.owner, RUNNING, *job_ids)
+            )
+            self._conn.commit()
+
+    def set_progress(self, job_id: str, progress: float) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET progress = ? WHERE id = ? AND status = ? AND owner = ?",
+                               (progress, job_id, RUNNING, self.owner))
+            self._conn.commit()
+
+    def finish(self, job_id: str, status: str, result: Optional[str] = None,
+               error: Optional[str] = None, ttl: float = Config.JOB_RESULT_TTL) -> None:
+        """Record the outcome of a job this store is running.
+
+        Jobs cancelled meanwhile stay cancelled, and jobs whose lease passed to another
+        store are left to it.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, result = ?, error = ?, finished_at = ?, expires_at = ?, "
+                "lease_expires_at = NULL WHERE id = ? AND status = ? AND owner = ?",
+                (status, 1.0 if status == SUCCEEDED else 0.0, result, error, now, now + ttl,
+                 job_id, RUNNING, self.owner)
+            )
+            self._conn.commit()
+
+    def cancel(self, job_id: str, ttl: float = Config.JOB_RESULT_TTL) -> bool:
+        """Cancel a queued or running job. Returns False if it had already finished."""
+        now = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, expires_at = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, now, now + ttl, job_id, QUEUED, RUNNING)
+            ).rowcount
+            self._conn.commit()
+        return updated > 0
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class JobQueue:
+    """Runs queued optimization jobs on a pool of worker threads.
+
+    Workers stream the completion so progress can be reported and running jobs
+    can be cancelled between tokens.
+    """
+
+    def __init__(self, store_path: str = Config.JOBS_DB_PATH, workers: int = Config.JOB_WORKERS,
+                 purge_interval: float = 60.0):
+        self.store_path = store_path
+        self.workers = workers
+        self.purge_interval = purge_interval
+        self._store: Optional[JobStore] = None
+        self._threads: List[threading.Thread] = []
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._active: set = set()  # ids of the jobs the workers are running, whose leases are renewed
+        self._stopped = threading.Event()
+
+    @property
+    def store(self) -> JobStore:
+        # Opened on first use so importing the app never touches the database
+        with self._lock:
+            if self._store is None:
+                self._store = JobStore(self.store_path)
+            return self._store
+
+    def start(self) -> None:
+        """Start the worker threads if they are not running yet."""
+        store = self.store
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            self._stopped.clear()
+            self._threads = [
+                threading.Thread(target=self._work, args=(store,), name=f"job-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            self._threads.append(threading.Thread(target=self._renew_leases, args=(store,),
+                                                  name="job-lease-renewal", daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the workers once their current jobs finish.
+
+        The store is closed only when every worker stopped within `timeout`; workers still
+        running at exit leave their jobs to be claimed again when the leases expire.
+        """
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        self._stopped.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            running = [thread for thread in self._threads if thread.is_alive()]
+            self._threads = []
+            if running:
+                logger.warning(f"{len(running)} job worker(s) still running; leaving the job store open")
+            elif self._store is not None:
+                self._store.close()
+                self._store = None
+
+    def submit(self, payload: Dict[str, Any], priority: int = 0) -> str:
+        """Queue an optimization and return its job id.
+
+        `payload` holds `provider`, `model` and the optimize_resume `options`.
+        """
+        self.start()
+        job_id = self.store.create(payload, priority)
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self.start()
+        return self.store.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        return self.store.cancel(job_id)
+
+    def _work(self, store: JobStore) -> None:
+        last_purge = 0.0
+        while not self._stopping:
+            if time.monotonic() - last_purge > self.purge_interval:
+                store.purge_expired()
+                last_purge = time.monotonic()
+
+            job = store.claim_next()
+            if job is None:
+                with self._wakeup:
+                    if not self._stopping:
+                        self._wakeup.wait(timeout=1.0)
+                continue
+
+            with self._lock:
+                self._active.add(job["id"])
+            try:
+                self._run(store, job)
+            except Exception as e:
+                logger.error(f"Job {job['id']} failed: {str(e)}")
+                store.finish(job["id"], FAILED, error=str(e))
+            finally:
+                with self._lock:
+                    self._active.discard(job["id"])
+
+    def _renew_leases(self, store: JobStore) -> None:
+        """Renew the leases of running jobs well before they expire."""
+        while not self._stopped.wait(store.lease_seconds / 3):
+            with self._lock:
+                active = list(self._active)
+            try:
+                store.renew(active)
+            except sqlite3.Error as e:
+                logger.error(f"Renewing job leases failed: {str(e)}")
+
+    def _run(self, store: JobStore, job: Dict[str, Any]) -> None:
+        payload = job["payload"]
+        options = payload["options"]
+        optimizer = provider_pool.get(payload["provider"], payload.get("model"))
+
+        # The optimized resume is roughly as long as the original, which gives a usable progress estimate
+        expected_length = max(len(options["resume_content"]), 1)
+        chunks = []
+        generated = 0
+        last_reported = 0.0
+        events = optimizer.stream_optimize(**options)
+        try:
+            for event in events:
+                if event["event"] != "token":
+                    continue
+                chunks.append(event["text"])
+                generated += len(event["text"])
+                progress = min(0.99, generated / expected_length)
+                if progress - last_reported >= 0.05:
+                    current = store.get(job["id"])
+                    if current is None or current["status"] == CANCELLED:
+                        logger.info(f"Job {job['id']} cancelled while running")
+                        return
+                    if current["owner"] != store.owner:
+                        logger.warning(f"Job {job['id']} lease expired and was claimed again; stopping")
+                        return
+                    store.set_progress(job["id"], progress)
+                    last_reported = progress
+        finally:
+            # Closing the generator closes the provider stream when the job is cancelled
+            events.close()
+
+        store.finish(job["id"], SUCCEEDED, result=''.join(chunks))
+
+job_queue = JobQueue()
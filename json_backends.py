@@ -0,0 +1,122 @@
+"""JSON encoding for the API, with a pluggable backend.
+
+`FastJSONProvider` replaces Flask's JSON provider: `jsonify`, `request.get_json` and
+the streaming endpoints encode and decode through the backend named by JSON_BACKEND.
+`auto` uses orjson when it is installed and the standard library otherwise. Other
+backends can be registered with `register_json_backend`.
+"""
+from typing import Any, Callable, Dict, Optional, Union
+import importlib
+import json
+import threading
+import logging
+from flask.json.provider import DefaultJSONProvider
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class JSONBackend:
+    """Encodes to and decodes from UTF-8 JSON.
+
+    `default` converts objects the backend cannot encode itself (dates, decimals, ...).
+    """
+
+    name = ""
+
+    def dumps(self, obj: Any, default: Callable[[Any], Any]) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        raise NotImplementedError
+
+class StdlibBackend(JSONBackend):
+    name = 'json'
+
+    def dumps(self, obj: Any, default: Callable[[Any], Any]) -> bytes:
+        return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+class OrjsonBackend(JSONBackend):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+        # Dates and dataclasses go through `default`, so they are encoded as Flask's provider does
+        self.options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                        | orjson.OPT_PASSTHROUGH_DATACLASS)
+        self._fallback = StdlibBackend()
+
+    def dumps(self, obj: Any, default: Callable[[Any], Any]) -> bytes:
+        try:
+            return self.orjson.dumps(obj, default=default, option=self.options)
+        except self.orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the standard library handles
+            return self._fallback.dumps(obj, default)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self.orjson.loads(data)
+
+_backend_specs: Dict[str, Union[type, str]] = {
+    'json': StdlibBackend,
+    'orjson': OrjsonBackend
+}
+_backends: Dict[str, JSONBackend] = {}
+_lock = threading.Lock()
+
+def register_json_backend(name: str, backend: Union[type, str]) -> None:
+    """Register a JSONBackend class, or a "module:Class" spec imported on first use."""
+    with _lock:
+        _backend_specs[name] = backend
+        _backends.pop(name, None)
+
+def get_json_backend(name: str = 'auto') -> JSONBackend:
+    """The backend registered as `name`; `auto` is orjson if installed, else the standard library."""
+    if name == 'auto':
+        try:
+            return get_json_backend('orjson')
+        except ImportError:
+            return get_json_backend('json')
+    with _lock:
+        if name not in _backends:
+            spec = _backend_specs.get(name)
+            if spec is None:
+                raise ValueError(f"Unknown JSON backend: {name}")
+            if isinstance(spec, str):
+                module, _, attribute = spec.partition(":")
+                spec = getattr(importlib.import_module(module), attribute)
+            _backends[name] = spec()
+        return _backends[name]
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider encoding with a JSONBackend.
+
+    Calls with extra arguments (e.g. `indent`) and pretty-printed debug responses
+    use Flask's default provider.
+    """
+
+    def __init__(self, app, backend: Optional[JSONBackend] = None):
+        super().__init__(app)
+        self.backend = backend or get_json_backend(Config.JSON_BACKEND)
+
+    def dump_bytes(self, obj: Any) -> bytes:
+        """Encode to UTF-8 JSON without a round trip through str."""
+        return self.backend.dumps(obj, self.default)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dump_bytes(obj).decode("utf-8")
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return self.backend.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dump_bytes(obj) + b"\n", mimetype=self.mimetype)
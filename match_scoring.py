@@ -0,0 +1,256 @@
+"""Local keyword match scoring of resumes against job descriptions.
+
+Ranks which postings a resume fits before any LLM call is spent. Documents are
+tokenized once; all resume/job pairs are then scored with matrix products:
+
+- `bm25` (default): the share of a job description's IDF-weighted terms that the
+  resume covers, with BM25 term-frequency saturation and resume length normalization.
+- `tfidf`: cosine similarity of log-scaled TF-IDF vectors.
+
+Both scores lie in [0, 1]. IDF is computed over the documents of the call.
+"""
+from typing import Optional, List, Dict, Any
+from collections import Counter
+import math
+import re
+import logging
+from input_compaction import normalize_text, trim_job_description
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('bm25', 'tfidf')
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Resumes and job descriptions scored per block. Job descriptions are kept as sparse
+# rows, and each block's dense matrices only span the terms of its job descriptions,
+# so memory stays bounded however many documents a call has.
+RESUME_CHUNK = 256
+JOB_CHUNK = 256
+
+# Words (with technology spellings such as c++, c#, node.js, ci/cd) and their plural forms
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[./-][a-z0-9+#]+)*")
+
+STOPWORDS = frozenset("""
+a about above across after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each either etc few for from further
+had has have having he her here hers him his how i if in into is it its itself just less may me more
+most must my no nor not now of off on once only or other our ours out over own per same she should so
+some such than that the their them then there these they this those through to too under until up upon
+us very via was we were what when where which while who whom why will with within without would yet you
+your yours
+ability able ideally including join looking plus preferred proven related required requirement role
+strong years year good great excellent etc e.g i.e
+""".split())
+
+def _numpy():
+    # Imported on first use so the app starts without it
+    try:
+        import numpy
+    except ImportError:
+        raise ValueError("Match scoring requires the numpy package")
+    return numpy
+
+def _stem(token: str) -> str:
+    """Fold plural forms together ("pipelines" -> "pipeline", "technologies" -> "technology")."""
+    if not token.isalpha():
+        return token  # node.js, ci/cd, c++
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercased terms of `text` without stopwords and bare numbers."""
+    if not text:
+        return []
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        token = token.rstrip(".")
+        if len(token) < 2 or token in STOPWORDS or token.isdigit():
+            continue
+        terms.append(_stem(token))
+    return terms
+
+class MatchScorer:
+    """Scores and ranks every resume against every job description."""
+
+    def __init__(self, method: str = 'bm25', k1: float = BM25_K1, b: float = BM25_B):
+        if method not in METHODS:
+            raise ValueError(f"Unknown scoring method: {method} (expected one of {', '.join(METHODS)})")
+        self.method = method
+        self.k1 = k1
+        self.b = b
+
+    def score(self, resumes: List[str], job_descriptions: List[str]):
+        """N x M array of match scores, one row per resume and one column per job description."""
+        np = _numpy()
+        index = _Index(self, resumes, job_descriptions)
+        if not resumes or not job_descriptions:
+            return np.zeros((len(resumes), len(job_descriptions)), dtype=np.float32)
+        return np.vstack([scores for _, _, scores in index.chunks()])
+
+    def rank(
+        self,
+        resumes: List[str],
+        job_descriptions: List[str],
+        top_k: Optional[int] = None,
+        keywords: int = 10
+    ) -> List[List[Dict[str, Any]]]:
+        """For each resume, its best `top_k` job descriptions (all if None), best first.
+
+        Each match holds the job description's `job` index, the `score`, and up to
+        `keywords` of the job description's most important terms that the resume
+        contains (`matched`) and lacks (`missing`).
+        """
+        np = _numpy()
+        index = _Index(self, resumes, job_descriptions)
+        count = len(job_descriptions) if top_k is None else max(0, min(top_k, len(job_descriptions)))
+        rankings: List[List[Dict[str, Any]]] = []
+        if not job_descriptions:
+            return [[] for _ in resumes]
+        for start, resume_columns, scores in index.chunks():
+            if count < scores.shape[1]:
+                # Partition first so only the kept columns are sorted
+                best = np.argpartition(-scores, count - 1, axis=1)[:, :count] if count else scores[:, :0]
+            else:
+                best = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            for row, columns in enumerate(best):
+                columns = columns[np.argsort(-scores[row, columns], kind="stable")]
+                rankings.append([
+                    {"job": int(job), "score": round(float(scores[row, job]), 4),
+                     **index.keywords(int(job), resume_columns[row], keywords)}
+                    for job in columns
+                ])
+        return rankings
+
+class _Index:
+    """Term statistics and sparse job description rows for one scoring call."""
+
+    def __init__(self, scorer: MatchScorer, resumes: List[str], job_descriptions: List[str]):
+        np = _numpy()
+        self.np = np
+        self.scorer = scorer
+        self.resume_counts = [Counter(tokenize(normalize_text(text))) for text in resumes]
+        self.job_counts = [Counter(tokenize(trim_job_description(text))) for text in job_descriptions]
+
+        # Only job description terms can contribute to a score; resume-only terms
+        # matter just for document frequencies, lengths and TF-IDF norms
+        self.terms: List[str] = sorted({term for counts in self.job_counts for term in counts})
+        self.columns = {term: column for column, term in enumerate(self.terms)}
+        document_frequency = Counter()
+        for counts in self.resume_counts + self.job_counts:
+            document_frequency.update(counts.keys())
+        self.document_count = len(resumes) + len(job_descriptions)
+        self.document_frequency = document_frequency
+        df = np.array([document_frequency[term] for term in self.terms], dtype=np.float64)
+        n = self.document_count
+        if scorer.method == 'bm25':
+            self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        else:
+            self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+
+        # Job descriptions in compressed sparse row form: the columns and counts of job j
+        # are job_columns[job_offsets[j]:job_offsets[j + 1]], sorted by column
+        self.job_offsets, self.job_columns, job_tf = self._sparse(self.job_counts)
+        job_rows = np.repeat(np.arange(len(self.job_counts)), np.diff(self.job_offsets))
+        self.job_weights = self._tfidf(job_tf) * self.idf[self.job_columns]
+        # Job description terms by importance, for the matched/missing keyword lists
+        self._job_order: Dict[int, Any] = {}
+
+        if scorer.method == 'bm25':
+            self.job_values = np.ones_like(job_tf)
+            self.job_totals = np.bincount(job_rows, weights=self.idf[self.job_columns] * (scorer.k1 + 1),
+                                          minlength=len(self.job_counts)).astype(np.float32)
+            lengths = [sum(counts.values()) for counts in self.resume_counts]
+            self.average_length = max(sum(lengths) / len(lengths), 1.0) if lengths else 1.0
+        else:
+            self.job_values = self.job_weights / self._norms(self.job_counts)[job_rows]
+
+    def _sparse(self, counts_list: List[Counter]):
+        """(row offsets, columns, counts) of documents over the job description vocabulary."""
+        np = self.np
+        offsets, columns, values = [0], [], []
+        for counts in counts_list:
+            row = sorted((self.columns[term], count) for term, count in counts.items() if term in self.columns)
+            columns.extend(column for column, _ in row)
+            values.extend(count for _, count in row)
+            offsets.append(len(columns))
+        return (np.array(offsets, dtype=np.int64), np.array(columns, dtype=np.int64),
+                np.array(values, dtype=np.float32))
+
+    def _tfidf(self, tf):
+        np = self.np
+        return np.where(tf > 0, 1 + np.log(np.maximum(tf, 1)), 0).astype(np.float32)
+
+    def _idf(self, term: str) -> float:
+        df = self.document_frequency[term]
+        return math.log((1 + self.document_count) / (1 + df)) + 1
+
+    def _norms(self, counts_list: List[Counter]):
+        """L2 norms of the documents' full TF-IDF vectors, including terms outside the vocabulary."""
+        np = self.np
+        norms = np.array([
+            math.sqrt(sum(((1 + math.log(count)) * self._idf(term)) ** 2 for term, count in counts.items()))
+            for counts in counts_list
+        ], dtype=np.float32)
+        return np.maximum(norms, 1e-9)
+
+    def _block(self, offsets, columns, values, first: int, last: int, block_terms):
+        """Dense matrix of rows first..last of a sparse matrix, restricted to `block_terms`."""
+        np = self.np
+        start, end = offsets[first], offsets[last]
+        rows = np.repeat(np.arange(last - first), np.diff(offsets[first:last + 1]))
+        local = np.searchsorted(block_terms, columns[start:end])
+        inside = (local < len(block_terms)) & (block_terms[np.minimum(local, len(block_terms) - 1)]
+                                               == columns[start:end])
+        matrix = np.zeros((last - first, len(block_terms)), dtype=np.float32)
+        matrix[rows[inside], local[inside]] = values[start:end][inside]
+        return matrix
+
+    def chunks(self):
+        """Yield (first resume index, resume columns, scores) for up to RESUME_CHUNK resumes at a time.
+
+        Resume columns are each resume's sorted vocabulary columns; scores have one row
+        per resume of the chunk and one column per job description.
+        """
+        np = self.np
+        job_count = len(self.job_counts)
+        for start in range(0, len(self.resume_counts), RESUME_CHUNK):
+            counts_list = self.resume_counts[start:start + RESUME_CHUNK]
+            offsets, columns, tf_values = self._sparse(counts_list)
+            resume_columns = [columns[offsets[row]:offsets[row + 1]] for row in range(len(counts_list))]
+            scores = np.zeros((len(counts_list), job_count), dtype=np.float32)
+            if self.scorer.method == 'bm25':
+                k1, b = self.scorer.k1, self.scorer.b
+                lengths = np.array([sum(counts.values()) for counts in counts_list], dtype=np.float32)
+                saturation = k1 * (1 - b + b * lengths / self.average_length)
+            else:
+                norms = self._norms(counts_list)
+            for first in range(0, job_count, JOB_CHUNK):
+                last = min(first + JOB_CHUNK, job_count)
+                block_terms = np.unique(self.job_columns[self.job_offsets[first]:self.job_offsets[last]])
+                jobs = self._block(self.job_offsets, self.job_columns, self.job_values, first, last, block_terms)
+                tf = self._block(offsets, columns, tf_values, 0, len(counts_list), block_terms)
+                idf = self.idf[block_terms]
+                if self.scorer.method == 'bm25':
+                    weights = idf * tf * (k1 + 1) / (tf + saturation[:, None])
+                    scores[:, first:last] = (weights @ jobs.T) / np.maximum(self.job_totals[first:last], 1e-9)
+                else:
+                    scores[:, first:last] = ((self._tfidf(tf) * idf) / norms[:, None]) @ jobs.T
+            yield start, resume_columns, np.clip(scores, 0, 1)
+
+    def keywords(self, job: int, resume_columns, limit: int) -> Dict[str, List[str]]:
+        """The job description's most important terms that a resume (its sorted columns) contains and lacks."""
+        np = self.np
+        order = self._job_order.get(job)
+        if order is None:
+            start, end = self.job_offsets[job], self.job_offsets[job + 1]
+            order = self.job_columns[start:end][np.argsort(-self.job_weights[start:end], kind="stable")]
+            self._job_order[job] = order
+        present = np.isin(order, resume_columns, assume_unique=True)
+        return {
+            "matched": [self.terms[term] for term in order[present][:limit]],
+            "missing": [self.terms[term] for term in order[~present][:limit]]
+        }
@@ -0,0 +1,184 @@
+from typing import Optional, List, Dict, Tuple, Iterator
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+import math
+import threading
+import time
+
+# Upper bounds in seconds; spans cache hits (sub-millisecond) to long completions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Stage timings of the request being handled, reported in its Server-Timing header
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_timings', default=None)
+
+def _labels(labels: Dict[str, Optional[str]]) -> Labels:
+    return tuple(sorted((key, "" if value is None else str(value)) for key, value in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Optional[str]) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Optional[str]) -> float:
+        with self._lock:
+            return self._values.get(_labels(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class Histogram:
+    """Cumulative histogram with labels, in the Prometheus bucket layout."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Optional[str]) -> None:
+        key = _labels(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, **labels: Optional[str]) -> int:
+        with self._lock:
+            entry = self._values.get(_labels(labels))
+            return sum(entry[0]) if entry else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self._values.items()}
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = (("le", _format_value(bound)),)
+                yield f"{self.name}_bucket{_format_labels(labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format.
+
+    Each worker process keeps its own values; scrape every worker.
+    """
+
+    def __init__(self, namespace: str = "resume_optimizer"):
+        self.namespace = namespace
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", documentation))
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", documentation, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+registry = MetricsRegistry()
+
+request_seconds = registry.histogram("request_duration_seconds", "Time to handle an API request.")
+stage_seconds = registry.histogram("stage_duration_seconds", "Time spent in each stage of an optimization.")
+first_token_seconds = registry.histogram("first_token_seconds", "Time from request to the first streamed token.")
+tokens_total = registry.counter("tokens_total", "Tokens reported by providers, by kind.")
+completions_total = registry.counter("completions_total", "Optimizations by response cache status.")
+
+def start_request() -> None:
+    """Begin collecting stage timings for the current request's Server-Timing header."""
+    _request_timings.set([])
+
+def server_timing(total: float) -> str:
+    """Server-Timing header value: the stages recorded during the current request and its `total` seconds."""
+    timings = (_request_timings.get() or []) + [("total", total)]
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings)
+
+def record_stage(name: str, seconds: float, provider: Optional[str] = None, model: Optional[str] = None) -> None:
+    stage_seconds.observe(seconds, stage=name, provider=provider, model=model)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+@contextmanager
+def stage(name: str, provider: Optional[str] = None, model: Optional[str] = None):
+    """Time a block as one stage of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started, provider, model)
+
+def record_completion(provider: str, model: str, cache_status: str,
+                      usage: Optional[Dict[str, Optional[int]]] = None) -> None:
+    """Count an optimization and the tokens it used."""
+    completions_total.inc(provider=provider, model=model, cache=cache_status)
+    for kind in ("input_tokens", "cached_input_tokens", "output_tokens"):
+        value = (usage or {}).get(kind)
+        if value:
+            tokens_total.inc(value, provider=provider, model=model, kind=kind[:-len("_tokens")])
@@ -0,0 +1,143 @@
+from typing import Optional, List, Dict, Callable
+import threading
+import time
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class CatalogEntry:
+    """Cached model list for one provider."""
+
+    def __init__(self, models: List[str], fetched_at: float, refresh_at: float,
+                 failures: int = 0, is_fallback: bool = False):
+        self.models = models
+        self.fetched_at = fetched_at
+        self.refresh_at = refresh_at
+        self.failures = failures
+        self.is_fallback = is_fallback
+
+class ModelCatalog:
+    """Shared TTL cache of provider model lists.
+
+    - Entries are refreshed in the background once they are `refresh_ahead`
+      through their TTL, so hot lookups never wait on the network.
+    - Stale entries keep being served while a refresh runs.
+    - Failed fetches are cached (negative caching) and retried with
+      exponential backoff; the last good list, or the fallback list, is
+      served in the meantime.
+    - Concurrent lookups for the same provider share a single fetch.
+    """
+
+    def __init__(
+        self,
+        ttl: float = Config.MODEL_CATALOG_TTL,
+        refresh_ahead: float = 0.8,
+        failure_backoff: float = 5.0,
+        max_failure_backoff: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.failure_backoff = failure_backoff
+        self.max_failure_backoff = max_failure_backoff
+        self._clock = clock
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        provider: str,
+        loader: Callable[[], List[str]],
+        fallback: Callable[[], List[str]]
+    ) -> List[str]:
+        """Return the cached models for `provider`, fetching with `loader` when needed."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(provider)
+
+        if entry is None:
+            return self._load(provider, loader, fallback)
+
+        if now >= entry.refresh_at:
+            # Serve what we have (even if expired) and refresh behind the caller
+            self._refresh_in_background(provider, loader, fallback)
+        return list(entry.models)
+
+    def peek(self, provider: str) -> Optional[List[str]]:
+        """Return the cached models for `provider` without fetching."""
+        with self._lock:
+            entry = self._entries.get(provider)
+        return list(entry.models) if entry else None
+
+    def clear(self, provider: Optional[str] = None) -> None:
+        """Drop cached entries for one provider, or all of them."""
+        with self._lock:
+            if provider is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(provider, None)
+
+    def wait(self, provider: str, timeout: Optional[float] = None) -> bool:
+        """Wait for an in-flight fetch of `provider` to finish."""
+        with self._lock:
+            event = self._inflight.get(provider)
+        return event.wait(timeout) if event else True
+
+    def _refresh_in_background(self, provider, loader, fallback) -> None:
+        with self._lock:
+            if provider in self._inflight:
+                return
+        threading.Thread(
+            target=self._load,
+            args=(provider, loader, fallback),
+            name=f"model-catalog-refresh-{provider}",
+            daemon=True
+        ).start()
+
+    def _load(self, provider, loader, fallback) -> List[str]:
+        with self._lock:
+            event = self._inflight.get(provider)
+            owner = event is None
+            if owner:
+                event = self._inflight[provider] = threading.Event()
+
+        if not owner:
+            # Another caller is already fetching this provider; share its result
+            event.wait()
+            with self._lock:
+                entry = self._entries.get(provider)
+            return list(entry.models) if entry else fallback()
+
+        try:
+            entry = self._fetch(provider, loader, fallback)
+            with self._lock:
+                self._entries[provider] = entry
+            return list(entry.models)
+        finally:
+            with self._lock:
+                self._inflight.pop(provider, None)
+            event.set()
+
+    def _fetch(self, provider, loader, fallback) -> CatalogEntry:
+        with self._lock:
+            previous = self._entries.get(provider)
+
+        try:
+            models = loader()
+        except Exception as e:
+            failures = (previous.failures if previous else 0) + 1
+            backoff = min(self.failure_backoff * 2 ** (failures - 1), self.max_failure_backoff)
+            logger.error(f"Error fetching models for {provider}: {str(e)} (retry in {backoff:.0f}s)")
+
+            now = self._clock()
+            # Keep serving the last good list if we have one
+            if previous and not previous.is_fallback:
+                return CatalogEntry(previous.models, previous.fetched_at, now + backoff, failures)
+            return CatalogEntry(fallback(), now, now + backoff, failures, is_fallback=True)
+
+        now = self._clock()
+        return CatalogEntry(models, now, now + self.ttl * self.refresh_ahead)
+
+model_catalog = ModelCatalog()
@@ -0,0 +1,289 @@
+"""Near-duplicate detection of job descriptions with MinHash and locality-sensitive hashing.
+
+Job boards repost the same role with small edits (a date, a location line, a tracking
+ID), which the exact-prompt response cache treats as a new input. Each posting gets a
+MinHash signature of its word shingles; signatures are cut into bands, and postings
+sharing a band are candidates whose estimated Jaccard similarity is then checked
+against the threshold. A lookup reads only the matching band buckets, not every posting.
+
+Postings that match no earlier one become canonical and are stored in SQLite with
+their text. In memory, the index keeps only the signatures in one flat array and one
+sorted array of band hashes per band.
+"""
+from typing import Optional, List, Dict, Any, Tuple
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Fixed, so signatures stay comparable across processes and restarts
+NUM_PERM = 64
+SEED = 1
+SHINGLE_SIZE = 5
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+_rng = random.Random(SEED)
+MIX_A, MIX_B = _rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)
+
+# Candidates are verified against the full signatures, so a missed near-duplicate
+# costs more than an extra candidate when choosing the band layout
+FALSE_POSITIVE_WEIGHT = 0.1
+FALSE_NEGATIVE_WEIGHT = 0.9
+
+WORD = re.compile(r"\w+")
+DIGIT = re.compile(r"\d")
+
+def shingles(text: str) -> set:
+    """Hashes of the text's overlapping word 5-grams.
+
+    Words are lowercased, and words containing digits (dates, salaries, job IDs)
+    all become one token, so reposts that only change those stay identical.
+    """
+    words = ["0" if DIGIT.search(word) else word for word in WORD.findall(text.lower())]
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode('utf-8'))} if words else set()
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode('utf-8'))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+def minhash(text: str) -> array:
+    """MinHash signature of the text's shingles: NUM_PERM unsigned 32-bit values.
+
+    Uses one-permutation hashing: each shingle is hashed once into one of NUM_PERM
+    bins that keep their minimum, and empty bins borrow the value of the next filled
+    one. That is one hash per shingle instead of NUM_PERM.
+    """
+    hashes = shingles(text)
+    if not hashes:
+        return array('I', [MAX_HASH] * NUM_PERM)
+    empty = MAX_HASH + 1
+    bins = [empty] * NUM_PERM
+    for value in hashes:
+        mixed = (MIX_A * value + MIX_B) % MERSENNE_PRIME
+        position, rest = mixed % NUM_PERM, (mixed // NUM_PERM) & MAX_HASH
+        if rest < bins[position]:
+            bins[position] = rest
+    filled = [position for position, value in enumerate(bins) if value != empty]
+    if len(filled) < NUM_PERM:
+        for position in range(NUM_PERM):
+            if bins[position] == empty:
+                donor = next((p for p in filled if p > position), filled[0])
+                bins[position] = bins[donor]
+    return array('I', bins)
+
+def similarity(first: array, second: array) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+def _probability(threshold: float, bands: int, rows: int, false_positive: bool) -> float:
+    """Integrated probability of a false positive (below the threshold) or a false negative (above it)."""
+    steps = 100
+    lower, upper = (0.0, threshold) if false_positive else (threshold, 1.0)
+    width = (upper - lower) / steps
+    total = 0.0
+    for step in range(steps):
+        s = lower + (step + 0.5) * width
+        candidate = 1 - (1 - s ** rows) ** bands
+        total += (candidate if false_positive else 1 - candidate) * width
+    return total
+
+def band_layout(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """(bands, rows per band) whose candidate curve best separates pairs around `threshold`."""
+    best, best_error = (1, num_perm), float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = (FALSE_POSITIVE_WEIGHT * _probability(threshold, bands, rows, True)
+                 + FALSE_NEGATIVE_WEIGHT * _probability(threshold, bands, rows, False))
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(" ".join(text.split()).encode('utf-8')).hexdigest()[:16]
+
+class NearDuplicateMatch:
+    """The canonical posting a job description was matched to."""
+
+    def __init__(self, canonical: str, similarity: float, text: str):
+        self.canonical = canonical  # id of the canonical posting
+        self.similarity = similarity
+        self.text = text  # the canonical posting's job description
+
+class NearDuplicateIndex:
+    """Persistent MinHash/LSH index of canonical job descriptions.
+
+    Several processes can share the database: each reads the postings the others
+    added before every lookup.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.85, max_entries: int = 100000):
+        if not 0 < threshold <= 1:
+            raise ValueError("The near-duplicate threshold must be between 0 and 1")
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands, self.rows = band_layout(threshold)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids = array('q')  # database row id of each slot
+        self._signatures = array('I')  # NUM_PERM values per slot
+        self._band_keys = [array('Q') for _ in range(self.bands)]  # sorted band hashes
+        self._band_slots = [array('I') for _ in range(self.bands)]  # slot of each band hash
+        self._last_id = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use so importing the app never touches the database
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, digest TEXT UNIQUE NOT NULL, "
+                "signature BLOB NOT NULL, text BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _band_hashes(self, signature: array) -> List[int]:
+        rows = self.rows
+        return [hash(tuple(signature[band * rows:(band + 1) * rows])) & 0xFFFFFFFFFFFFFFFF
+                for band in range(self.bands)]
+
+    def _insert(self, row_id: int, signature: array) -> None:
+        slot = len(self._ids)
+        self._ids.append(row_id)
+        self._signatures.extend(signature)
+        for band, key in enumerate(self._band_hashes(signature)):
+            keys, slots = self._band_keys[band], self._band_slots[band]
+            position = bisect_left(keys, key)
+            keys.insert(position, key)
+            slots.insert(position, slot)
+        self._last_id = max(self._last_id, row_id)
+
+    def _sync(self) -> None:
+        """Load postings added since the last lookup, by this or another process."""
+        rows = self._connection().execute(
+            "SELECT id, signature FROM postings WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        for row_id, blob in rows:
+            signature = array('I')
+            signature.frombytes(blob)
+            self._insert(row_id, signature)
+
+    def _candidates(self, signature: array) -> set:
+        slots = set()
+        for band, key in enumerate(self._band_hashes(signature)):
+            keys, band_slots = self._band_keys[band], self._band_slots[band]
+            position = bisect_left(keys, key)
+            while position < len(keys) and keys[position] == key:
+                slots.add(band_slots[position])
+                position += 1
+        return slots
+
+    def _best(self, signature: array) -> Optional[Tuple[int, float]]:
+        """(row id, similarity) of the most similar posting at or above the threshold."""
+        best = None
+        for slot in self._candidates(signature):
+            stored = self._signatures[slot * NUM_PERM:(slot + 1) * NUM_PERM]
+            score = similarity(signature, stored)
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (self._ids[slot], score)
+        return best
+
+    def _match(self, signature: array, digest: str) -> Optional[NearDuplicateMatch]:
+        conn = self._connection()
+        row = conn.execute("SELECT digest, text FROM postings WHERE digest = ?", (digest,)).fetchone()
+        if row is not None:
+            return NearDuplicateMatch(row[0], 1.0, zlib.decompress(row[1]).decode('utf-8'))
+        best = self._best(signature)
+        if best is None:
+            return None
+        row = conn.execute("SELECT digest, text FROM postings WHERE id = ?", (best[0],)).fetchone()
+        if row is None:  # pruned by another process
+            return None
+        return NearDuplicateMatch(row[0], round(best[1], 4), zlib.decompress(row[1]).decode('utf-8'))
+
+    def find(self, text: str) -> Optional[NearDuplicateMatch]:
+        """The canonical posting `text` is a near-duplicate of, if any."""
+        signature = minhash(text)
+        with self._lock:
+            self._sync()
+            return self._match(signature, _digest(text))
+
+    def match_or_add(self, text: str) -> Tuple[NearDuplicateMatch, bool]:
+        """(canonical posting, whether `text` is a near-duplicate of an earlier one).
+
+        A job description without a match is added as a new canonical posting.
+        """
+        signature = minhash(text)
+        digest = _digest(text)
+        with self._lock:
+            self._sync()
+            match = self._match(signature, digest)
+            if match is not None:
+                return match, True
+
+            conn = self._connection()
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO postings (digest, signature, text, created_at) VALUES (?, ?, ?, ?)",
+                (digest, signature.tobytes(), zlib.compress(text.encode('utf-8')), time.time())
+            )
+            conn.commit()
+            if cursor.rowcount:
+                self._insert(cursor.lastrowid, signature)
+                self._prune()
+            return NearDuplicateMatch(digest, 1.0, text), False
+
+    def _prune(self) -> None:
+        """Drop the oldest tenth of the postings once there are more than max_entries."""
+        if len(self._ids) <= self.max_entries:
+            return
+        conn = self._connection()
+        conn.execute(
+            "DELETE FROM postings WHERE id IN (SELECT id FROM postings ORDER BY id LIMIT ?)",
+            (max(1, len(self._ids) - self.max_entries * 9 // 10),)
+        )
+        conn.commit()
+        # Rebuilding is rare and keeps the arrays free of holes
+        self._reset()
+        self._sync()
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM postings")
+                self._conn.commit()
+            self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._ids)
+            memory = (self._ids.itemsize * entries + self._signatures.itemsize * len(self._signatures)
+                      + sum(keys.itemsize * len(keys) for keys in self._band_keys)
+                      + sum(slots.itemsize * len(slots) for slots in self._band_slots))
+        return {"entries": entries, "index_bytes": memory, "threshold": self.threshold,
+                "bands": self.bands, "rows": self.rows}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+near_duplicate_index = NearDuplicateIndex(Config.NEAR_DUPLICATE_DB_PATH, Config.NEAR_DUPLICATE_THRESHOLD,
+                                          Config.NEAR_DUPLICATE_MAX_ENTRIES)
@@ -0,0 +1,190 @@
+from typing import Optional, List, Dict, Tuple, Union, Callable, Any
+from pathlib import Path
+import os
+import re
+import threading
+import time
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SLOT_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+TEMPLATE_NAME_PATTERN = re.compile(r"^[\w-]+$")
+
+# (slot, text before the value, text after the value, rendered even when empty)
+Slot = Tuple[str, str, str, bool]
+
+# Slots whose values rarely change between requests; they stay in the cacheable prompt prefix
+STATIC_SLOTS = {"guidelines"}
+
+# Sections appended to templates that do not place the slots themselves. Static
+# sections come first so the prefix shared across requests is as long as possible.
+DEFAULT_SECTIONS: List[Slot] = [
+    ("guidelines", "Resume Guidelines:\n```\n",
+     "\n```\n\nFollow these guidelines strictly for formatting and structure.\n\n", False),
+    ("job_description", "Job Description to optimize for:\n```\n", "\n```\n\n", False),
+    ("custom_prompt", "Custom prompt:\n", "\n\n", False),
+    ("resume_content", "Resume content:\n```\n", "\n```\n\n", True),
+]
+
+class RenderedPrompt(str):
+    """A rendered prompt that remembers where its static prefix ends.
+
+    The prefix (template text and static slots) is identical across requests
+    that share a template and guidelines, which lets providers cache it.
+    """
+
+    def __new__(cls, prefix: str, suffix: str):
+        prompt = super().__new__(cls, prefix + suffix)
+        prompt.prefix_length = len(prefix)
+        return prompt
+
+    @property
+    def prefix(self) -> str:
+        return self[:self.prefix_length]
+
+    @property
+    def suffix(self) -> str:
+        return self[self.prefix_length:]
+
+class PromptTemplate:
+    """A base prompt compiled into literal text and named slots.
+
+    Templates may place `{{slot}}` markers themselves; otherwise the standard
+    job description, guidelines, custom prompt and resume sections are appended
+    after the template text.
+    """
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.source = source
+        self.parts = self._compile(source)
+        self.slots = [part[0] for part in self.parts if not isinstance(part, str)]
+
+    @staticmethod
+    def _compile(source: str) -> List[Union[str, Slot]]:
+        parts: List[Union[str, Slot]] = []
+        position = 0
+        for match in SLOT_PATTERN.finditer(source):
+            if match.start() > position:
+                parts.append(source[position:match.start()])
+            parts.append((match.group(1), "", "", True))
+            position = match.end()
+        if position < len(source):
+            parts.append(source[position:])
+
+        if all(isinstance(part, str) for part in parts):
+            parts.extend(DEFAULT_SECTIONS)
+        return parts
+
+    def render(self, **values: Optional[str]) -> RenderedPrompt:
+        """Fill the slots with `values` and return the prompt, assembled with joins rather than +=.
+
+        Everything before the first request-specific slot forms the prompt's prefix.
+        """
+        pieces = []
+        prefix_pieces = None
+        for part in self.parts:
+            if isinstance(part, str):
+                pieces.append(part)
+                continue
+            slot, before, after, required = part
+            value = values.get(slot)
+            if value or required:
+                if prefix_pieces is None and slot not in STATIC_SLOTS:
+                    prefix_pieces = len(pieces)
+                pieces.append(before)
+                pieces.append(value or "")
+                pieces.append(after)
+
+        if prefix_pieces is None:
+            prefix_pieces = len(pieces)
+        return RenderedPrompt("".join(pieces[:prefix_pieces]), "".join(pieces[prefix_pieces:]))
+
+class TemplateRegistry:
+    """Loads prompt templates and other prompt input files once and keeps them in memory.
+
+    Cached files are re-read only when their modification time or size changes,
+    and the file is checked at most every `check_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        templates_dir: str = Config.PROMPT_TEMPLATES_DIR,
+        default_path: str = Config.BASE_PROMPT_PATH,
+        check_interval: float = Config.PROMPT_TEMPLATE_CHECK_INTERVAL
+    ):
+        self.templates_dir = Path(templates_dir)
+        self.default_path = default_path
+        self.check_interval = check_interval
+        # (kind, path) -> (value, file signature, last checked)
+        self._cache: Dict[Tuple[str, str], Tuple[Any, Tuple[int, int], float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: Optional[str] = None) -> PromptTemplate:
+        """Return a named template; `default` (or None) is the base prompt."""
+        return self.load(self.path_for(name))
+
+    def path_for(self, name: Optional[str]) -> str:
+        if not name or name == "default":
+            return self.default_path
+        if not TEMPLATE_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid prompt template name: {name}")
+        path = self.templates_dir / f"{name}.md"
+        if not path.is_file():
+            raise ValueError(f"Unknown prompt template: {name}")
+        return str(path)
+
+    def names(self) -> List[str]:
+        """List the selectable template names."""
+        names = ["default"]
+        if self.templates_dir.is_dir():
+            names.extend(sorted(path.stem for path in self.templates_dir.glob("*.md")))
+        return names
+
+    def load(self, path: str) -> PromptTemplate:
+        """Return the compiled template stored at `path`."""
+        return self._cached("template", path, lambda source: PromptTemplate(Path(path).stem, source))
+
+    def read_text(self, path: str) -> str:
+        """Return the contents of a prompt input file such as the resume guidelines."""
+        return self._cached("text", path, lambda source: source)
+
+    def reload(self, path: Optional[str] = None) -> None:
+        """Forget cached files so they are read again on next use."""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                for key in [key for key in self._cache if key[1] == path]:
+                    del self._cache[key]
+
+    def _cached(self, kind: str, path: str, build: Callable[[str], Any]) -> Any:
+        key = (kind, path)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is not None:
+            value, signature, checked_at = entry
+            if now - checked_at < self.check_interval:
+                return value
+            if self._signature(path) == signature:
+                with self._lock:
+                    self._cache[key] = (value, signature, now)
+                return value
+            logger.info(f"Reloading changed prompt file: {path}")
+
+        signature = self._signature(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            value = build(f.read())
+        with self._lock:
+            self._cache[key] = (value, signature, now)
+        return value
+
+    @staticmethod
+    def _signature(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+template_registry = TemplateRegistry()
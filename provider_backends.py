@@ -0,0 +1,445 @@
+"""Provider backends: the SDK-specific half of AIProvider.
+
+Each backend wraps one provider's SDK. Backends are registered by name and only
+instantiated, and their SDK imported, the first time a provider with that name
+is used, so a worker that only talks to Mistral never
+imports `openai` or `anthropic`.
+
+Other backends can be plugged in with `register_backend`, given a ProviderBackend
+subclass or a "module:Class" spec that is imported on first use.
+"""
+from typing import Optional, List, Dict, Iterator, Any, Union, Type, Callable
+from contextvars import ContextVar
+import importlib
+import socket
+import threading
+import logging
+from config import Config
+from prompt_templates import RenderedPrompt
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "You are a professional resume optimization assistant."
+ANTHROPIC_PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+
+def _split_prompt(prompt: str):
+    """Return (static prefix, request-specific suffix) for an assembled prompt."""
+    if isinstance(prompt, RenderedPrompt):
+        return prompt.prefix, prompt.suffix
+    return "", prompt
+
+def _system_content(prefix: str) -> str:
+    return f"{SYSTEM_PROMPT}\n\n{prefix}" if prefix else SYSTEM_PROMPT
+
+def _usage_value(usage, name: str) -> Optional[int]:
+    # Newer API fields arrive as untyped extras on older SDK models
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get(name)
+    return getattr(usage, name, None)
+
+def _read_usage(provider: str, usage) -> Dict[str, Optional[int]]:
+    """Normalize a provider's usage report, splitting input tokens into cached and uncached.
+
+    Counts the provider did not report are None, not 0.
+    """
+    if usage is None:
+        return {"input_tokens": None, "cached_input_tokens": None, "uncached_input_tokens": None,
+                "output_tokens": None}
+    if provider == 'anthropic':
+        # Anthropic reports cache reads and writes separately from the uncached input
+        input_tokens = _usage_value(usage, 'input_tokens')
+        uncached = (input_tokens + (_usage_value(usage, 'cache_creation_input_tokens') or 0)
+                    if input_tokens is not None else None)
+        cached = _usage_value(usage, 'cache_read_input_tokens') or 0
+        output = _usage_value(usage, 'output_tokens')
+    else:
+        total = _usage_value(usage, 'prompt_tokens')
+        cached = _usage_value(_usage_value(usage, 'prompt_tokens_details'), 'cached_tokens') or 0
+        uncached = total - cached if total is not None else None
+        output = _usage_value(usage, 'completion_tokens')
+    return {
+        "input_tokens": uncached + cached if uncached is not None else None,
+        "cached_input_tokens": cached,
+        "uncached_input_tokens": uncached,
+        "output_tokens": output
+    }
+
+class StreamAborted(Exception):
+    """A provider stream was closed by StreamAbort.abort before it finished."""
+
+class StreamAbort:
+    """Lets another thread close the provider streams opened while this is the current `stream_abort`.
+
+    A blocked read on a closed stream fails at once, so an abandoned request (e.g. the
+    losing side of a hedged one) gives its connection and limiter slot back without
+    waiting for the provider's next chunk.
+    """
+
+    def __init__(self):
+        self.aborted = threading.Event()
+        self._closers: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def register(self, close: Callable[[], None]) -> None:
+        with self._lock:
+            self._closers.append(close)
+            aborted = self.aborted.is_set()
+        if aborted:
+            close()
+
+    def abort(self) -> None:
+        with self._lock:
+            self.aborted.set()
+            closers = list(self._closers)
+        for close in closers:
+            try:
+                close()
+            except Exception as e:
+                logger.debug(f"Closing an aborted stream failed: {str(e)}")
+
+stream_abort: ContextVar[Optional[StreamAbort]] = ContextVar('stream_abort', default=None)
+
+def _register_close(close: Callable[[], None]) -> None:
+    abort = stream_abort.get()
+    if abort is not None:
+        abort.register(close)
+
+def _response_closer(response) -> Callable[[], None]:
+    """Close an httpx response from another thread.
+
+    Shutting the socket down makes a read blocked on it return at once; the reading
+    thread then closes the response itself.
+    """
+    def close() -> None:
+        network_stream = response.extensions.get("network_stream")
+        sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+        if sock is None:
+            response.close()
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # already closed
+    return close
+
+def _abortable(chunks) -> Iterator[Any]:
+    """Iterate an SDK stream; raise StreamAborted if it ended because it was aborted.
+
+    A stream closed mid-read may fail or just stop, and a partial completion must not
+    pass for a whole one.
+    """
+    abort = stream_abort.get()
+    try:
+        yield from chunks
+    except Exception:
+        if abort is None or not abort.aborted.is_set():
+            raise
+    if abort is not None and abort.aborted.is_set():
+        raise StreamAborted("The stream was aborted")
+
+class ProviderBackend:
+    """Client setup and chat requests for one provider's SDK.
+
+    Subclasses import their SDK in `__init__`, which runs when the backend is first used.
+    The SDKs' own retries are turned off (Mistral counts the first attempt); the
+    provider limiter retries with backoff that honours Retry-After.
+    """
+
+    name: str = ''
+    # Served when the models endpoint is unavailable; these models are also accepted without a fetch
+    fallback_models: List[str] = []
+
+    def create_client(self):
+        """The sync client shared by an AIProvider, or None if the SDK has a module-level one."""
+        raise NotImplementedError
+
+    def create_async_client(self):
+        raise NotImplementedError
+
+    def list_models(self, client) -> List[str]:
+        """Fetch available models directly from the provider's API."""
+        raise NotImplementedError
+
+    def complete(self, client, model: str, prompt: str, temperature: float,
+                 usage: Dict[str, Optional[int]]) -> str:
+        """Send one chat completion request, filling in `usage`."""
+        raise NotImplementedError
+
+    async def acomplete(self, client, model: str, prompt: str, temperature: float,
+                        usage: Dict[str, Optional[int]]) -> str:
+        """Send one chat completion request with the async client, filling in `usage`."""
+        raise NotImplementedError
+
+    def stream(self, client, model: str, prompt: str, temperature: float,
+               usage: Dict[str, Optional[int]]) -> Iterator[str]:
+        """Stream a chat completion, filling in `usage` when reported."""
+        raise NotImplementedError
+
+    def close(self, client) -> None:
+        """Close a sync client and its pooled connections."""
+        if client is not None:
+            client.close()
+
+class OpenAIBackend(ProviderBackend):
+    name = 'openai'
+    fallback_models = ['gpt-4-turbo-preview', 'gpt-4', 'gpt-3.5-turbo']
+
+    def __init__(self):
+        import openai
+        self.openai = openai
+
+    def create_client(self):
+        # The SDK's module-level client lives for the whole process
+        self.openai.api_key = Config.OPENAI_API_KEY
+        if Config.OPENAI_BASE_URL:
+            # The module-level client joins paths onto base_url, so it must end with a slash
+            self.openai.base_url = Config.OPENAI_BASE_URL.rstrip('/') + '/'
+        self.openai.max_retries = 0
+        return None
+
+    def create_async_client(self):
+        return self.openai.AsyncOpenAI(api_key=Config.OPENAI_API_KEY, base_url=Config.OPENAI_BASE_URL, max_retries=0)
+
+    def list_models(self, client) -> List[str]:
+        response = self.openai.models.list()
+        models = [model.id for model in response.data
+                  if model.id.startswith(('gpt-4', 'gpt-3'))]
+        logger.info(f"Fetched OpenAI models: {models}")
+        return models
+
+    def messages(self, prompt: str) -> List[Dict[str, str]]:
+        """System message with the static prompt prefix, so OpenAI's automatic prefix caching applies."""
+        prefix, suffix = _split_prompt(prompt)
+        return [
+            {"role": "system", "content": _system_content(prefix)},
+            {"role": "user", "content": suffix}
+        ]
+
+    def complete(self, client, model, prompt, temperature, usage):
+        response = self.openai.chat.completions.create(
+            model=model,
+            messages=self.messages(prompt),
+            temperature=temperature
+        )
+        usage.update(_read_usage(self.name, response.usage))
+        return response.choices[0].message.content
+
+    async def acomplete(self, client, model, prompt, temperature, usage):
+        response = await client.chat.completions.create(
+            model=model,
+            messages=self.messages(prompt),
+            temperature=temperature
+        )
+        usage.update(_read_usage(self.name, response.usage))
+        return response.choices[0].message.content
+
+    def stream(self, client, model, prompt, temperature, usage):
+        stream = self.openai.chat.completions.create(
+            model=model,
+            messages=self.messages(prompt),
+            temperature=temperature,
+            stream=True,
+            # Ask for a final chunk carrying the usage; this SDK version has no stream_options argument
+            extra_body={"stream_options": {"include_usage": True}}
+        )
+        _register_close(_response_closer(stream.response))
+        for chunk in _abortable(stream):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            elif getattr(chunk, 'usage', None):
+                usage.update(_read_usage(self.name, chunk.usage))
+
+class AnthropicBackend(ProviderBackend):
+    name = 'anthropic'
+    fallback_models = ['claude-3-opus-20240229', 'claude-3-sonnet-20240229', 'claude-2.1']
+
+    def __init__(self):
+        import anthropic
+        self.anthropic = anthropic
+
+    def create_client(self):
+        return self.anthropic.Anthropic(api_key=Config.ANTHROPIC_API_KEY, base_url=Config.ANTHROPIC_BASE_URL,
+                                        max_retries=0)
+
+    def create_async_client(self):
+        return self.anthropic.AsyncAnthropic(api_key=Config.ANTHROPIC_API_KEY, base_url=Config.ANTHROPIC_BASE_URL,
+                                             max_retries=0)
+
+    def list_models(self, client) -> List[str]:
+        # For Anthropic, models are properties of the client
+        models = client.list_models()
+        available_models = [model.id for model in models
+                            if model.id.startswith('claude')]
+        logger.info(f"Fetched Anthropic models: {available_models}")
+        return available_models
+
+    def params(self, prompt: str) -> Dict[str, Any]:
+        """Request parameters marking the static prompt prefix as cacheable for Anthropic."""
+        prefix, suffix = _split_prompt(prompt)
+        params: Dict[str, Any] = {"messages": [{"role": "user", "content": suffix}]}
+        if prefix:
+            params["system"] = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+            params["extra_headers"] = {"anthropic-beta": ANTHROPIC_PROMPT_CACHING_BETA}
+        return params
+
+    def complete(self, client, model, prompt, temperature, usage):
+        response = client.messages.create(
+            model=model,
+            max_tokens=Config.MAX_OUTPUT_TOKENS,
+            temperature=temperature,
+            **self.params(prompt)
+        )
+        usage.update(_read_usage(self.name, response.usage))
+        return response.content[0].text
+
+    async def acomplete(self, client, model, prompt, temperature, usage):
+        response = await client.messages.create(
+            model=model,
+            max_tokens=Config.MAX_OUTPUT_TOKENS,
+            temperature=temperature,
+            **self.params(prompt)
+        )
+        usage.update(_read_usage(self.name, response.usage))
+        return response.content[0].text
+
+    def stream(self, client, model, prompt, temperature, usage):
+        stream = client.messages.create(
+            model=model,
+            max_tokens=Config.MAX_OUTPUT_TOKENS,
+            temperature=temperature,
+            stream=True,
+            **self.params(prompt)
+        )
+        _register_close(_response_closer(stream.response))
+        for event in _abortable(stream):
+            if event.type == 'message_start':
+                usage.update(_read_usage(self.name, event.message.usage))
+            elif event.type == 'content_block_delta' and event.delta.text:
+                yield event.delta.text
+            elif event.type == 'message_delta':
+                usage["output_tokens"] = event.usage.output_tokens
+
+class MistralBackend(ProviderBackend):
+    name = 'mistral'
+    fallback_models = ['mistral-large-latest', 'mistral-medium-latest', 'mistral-small-latest']
+
+    def __init__(self):
+        from mistralai.client import MistralClient
+        from mistralai.async_client import MistralAsyncClient
+        from mistralai.models.chat_completion import ChatMessage
+        self.client_class = MistralClient
+        self.async_client_class = MistralAsyncClient
+        self.message_class = ChatMessage
+
+    def create_client(self):
+        client = self.client_class(api_key=Config.MISTRAL_API_KEY, endpoint=Config.MISTRAL_BASE_URL, max_retries=1)
+        # The SDK does not expose its streamed responses, so they are registered as they arrive
+        hooks = client._client.event_hooks
+        hooks["response"] = hooks.get("response", []) + [lambda response: _register_close(_response_closer(response))]
+        client._client.event_hooks = hooks
+        return client
+
+    def create_async_client(self):
+        return self.async_client_class(api_key=Config.MISTRAL_API_KEY, endpoint=Config.MISTRAL_BASE_URL,
+                                       max_retries=1)
+
+    def list_models(self, client) -> List[str]:
+        response = client.list_models()
+        models = [model.id for model in response.data]
+        logger.info(f"Fetched Mistral models: {models}")
+        return models
+
+    def messages(self, prompt: str) -> list:
+        prefix, suffix = _split_prompt(prompt)
+        return [
+            self.message_class(role="system", content=_system_content(prefix)),
+            self.message_class(role="user", content=suffix)
+        ]
+
+    def complete(self, client, model, prompt, temperature, usage):
+        response = client.chat(
+            model=model,
+            messages=self.messages(prompt),
+            temperature=temperature
+        )
+        usage.update(_read_usage(self.name, response.usage))
+        return response.choices[0].message.content
+
+    async def acomplete(self, client, model, prompt, temperature, usage):
+        response = await client.chat(
+            model=model,
+            messages=self.messages(prompt),
+            temperature=temperature
+        )
+        usage.update(_read_usage(self.name, response.usage))
+        return response.choices[0].message.content
+
+    def stream(self, client, model, prompt, temperature, usage):
+        for chunk in _abortable(client.chat_stream(
+            model=model,
+            messages=self.messages(prompt),
+            temperature=temperature
+        )):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if chunk.usage:
+                usage.update(_read_usage(self.name, chunk.usage))
+
+    def close(self, client) -> None:
+        if client is not None:
+            client._client.close()
+
+class BackendRegistry:
+    """Provider name -> backend, instantiated (and its SDK imported) on first use."""
+
+    def __init__(self):
+        self._specs: Dict[str, Union[str, Type[ProviderBackend]]] = {}
+        self._backends: Dict[str, ProviderBackend] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, spec: Union[str, Type[ProviderBackend]]) -> None:
+        """Register a backend class, or a "module:Class" spec imported when the provider is first used."""
+        name = name.lower()
+        with self._lock:
+            self._specs[name] = spec
+            self._backends.pop(name, None)
+
+    def get(self, name: str) -> ProviderBackend:
+        name = name.lower()
+        with self._lock:
+            backend = self._backends.get(name)
+            if backend is not None:
+                return backend
+            spec = self._specs.get(name)
+            if spec is None:
+                raise ValueError(f"Unsupported AI provider: {name}")
+            # Importing under the lock keeps two threads from loading the same SDK at once
+            if isinstance(spec, str):
+                module_name, _, class_name = spec.partition(':')
+                spec = getattr(importlib.import_module(module_name), class_name)
+            backend = spec()
+            self._backends[name] = backend
+        logger.info(f"Loaded {name} provider backend")
+        return backend
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._specs)
+
+    def loaded(self) -> List[str]:
+        """Names of the backends whose SDK has been imported."""
+        with self._lock:
+            return list(self._backends)
+
+backend_registry = BackendRegistry()
+backend_registry.register('openai', OpenAIBackend)
+backend_registry.register('anthropic', AnthropicBackend)
+backend_registry.register('mistral', MistralBackend)
+
+def register_backend(name: str, spec: Union[str, Type[ProviderBackend]]) -> None:
+    backend_registry.register(name, spec)
+
+def get_backend(name: str) -> ProviderBackend:
+    return backend_registry.get(name)
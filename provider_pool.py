@@ -0,0 +1,92 @@
+from typing import Optional, Dict, Tuple, Iterable
+import threading
+import logging
+from ai_utils import AIProvider
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, Optional[str]]
+
+class ProviderPool:
+    """Process-wide registry of long-lived AIProvider instances.
+
+    Providers are keyed by (provider, model) and reused across requests, so the
+    SDK client and its pooled HTTP connections are only created once.
+    """
+
+    def __init__(self):
+        self._providers: Dict[PoolKey, AIProvider] = {}
+        self._creation_locks: Dict[PoolKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str = Config.DEFAULT_AI_PROVIDER, model: Optional[str] = None) -> AIProvider:
+        """Return the shared AIProvider for (provider, model), creating it on first use."""
+        key = (provider.lower(), model)
+        with self._lock:
+            instance = self._providers.get(key)
+            if instance is not None:
+                return instance
+            creation_lock = self._creation_locks.setdefault(key, threading.Lock())
+
+        # Only callers asking for the same key wait on each other while the
+        # client is being set up; other keys stay available.
+        with creation_lock:
+            with self._lock:
+                instance = self._providers.get(key)
+            if instance is not None:
+                return instance
+
+            try:
+                instance = AIProvider(provider=provider, model=model)
+                with self._lock:
+                    self._providers[key] = instance
+                    # Requests that name the resolved default model explicitly share the same client
+                    self._providers.setdefault((key[0], instance.get_current_model()), instance)
+            finally:
+                # Once stored the instance is found without the lock, and keys that failed
+                # (e.g. an invalid model from a request body) must not accumulate
+                with self._lock:
+                    if self._creation_locks.get(key) is creation_lock:
+                        del self._creation_locks[key]
+            logger.info(f"Created pooled provider client for {key[0]} ({instance.get_current_model()})")
+            return instance
+
+    def warm_up(self, providers: Iterable[str]) -> None:
+        """Create clients for the given providers ahead of the first request."""
+        for provider in providers:
+            try:
+                self.get(provider)
+            except Exception as e:
+                logger.error(f"Failed to warm up provider {provider}: {str(e)}")
+
+    def shutdown(self) -> None:
+        """Close all pooled clients and empty the registry."""
+        with self._lock:
+            instances = {id(instance): instance for instance in self._providers.values()}
+            self._providers.clear()
+            self._creation_locks.clear()
+
+        for instance in instances.values():
+            try:
+                instance.close()
+            except Exception as e:
+                logger.error(f"Error closing {instance.provider} client: {str(e)}")
+
+    async def ashutdown(self) -> None:
+        """Close async clients as well as sync ones; for use from an event loop."""
+        with self._lock:
+            instances = {id(instance): instance for instance in self._providers.values()}
+
+        for instance in instances.values():
+            try:
+                await instance.aclose()
+            except Exception as e:
+                logger.error(f"Error closing {instance.provider} async client: {str(e)}")
+        self.shutdown()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len({id(instance) for instance in self._providers.values()})
+
+provider_pool = ProviderPool()
@@ -0,0 +1,317 @@
+from typing import Optional, List, Dict, Tuple, Any
+from collections import deque
+import math
+import queue
+import threading
+import time
+import logging
+from config import Config
+from ai_utils import AIProvider, CompletionInfo, ProviderError, last_completion
+from provider_pool import provider_pool
+from provider_backends import StreamAbort, stream_abort
+from rate_limits import RateLimitedError
+
+logger = logging.getLogger(__name__)
+
+# Failures of the provider itself count against its health and fail over. Anything else
+# (an unknown template, invalid options) comes from the request and would fail on every
+# provider, so it is raised at once.
+PROVIDER_ERRORS = (ProviderError, RateLimitedError)
+
+def _lookup(provider: str, model: Optional[str]) -> AIProvider:
+    """Pooled optimizer for a failover candidate; a candidate that cannot be set up is a provider failure."""
+    try:
+        return provider_pool.get(provider, model)
+    except ValueError as e:
+        raise ProviderError(f"{provider} is unavailable: {str(e)}") from e
+
+class ProviderHealth:
+    """Sliding window of recent outcomes and latencies for one provider."""
+
+    def __init__(self, window: int = Config.ROUTER_HEALTH_WINDOW):
+        self._outcomes = deque(maxlen=window)  # True for success
+        self._latencies = deque(maxlen=window)  # seconds to complete a successful call
+        self._first_token = deque(maxlen=window)  # seconds to the first streamed token
+        self._lock = threading.Lock()
+
+    def record_success(self, latency: float, first_token: Optional[float] = None) -> None:
+        with self._lock:
+            self._outcomes.append(True)
+            self._latencies.append(latency)
+            if first_token is not None:
+                self._first_token.append(first_token)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._outcomes.append(False)
+
+    @property
+    def samples(self) -> int:
+        with self._lock:
+            return len(self._outcomes)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return self._outcomes.count(False) / len(self._outcomes)
+
+    def latency_quantile(self, q: float, first_token: bool = False) -> Optional[float]:
+        with self._lock:
+            values = sorted(self._first_token if first_token else self._latencies)
+        if not values:
+            return None
+        return values[min(len(values) - 1, math.ceil(q * len(values)) - 1)]
+
+    def score(self) -> float:
+        """Health between 0 and 1; higher is better. Errors and slow tails both lower it."""
+        p95 = self.latency_quantile(0.95) or 0.0
+        return (1.0 - self.error_rate()) / (1.0 + p95)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "error_rate": self.error_rate(),
+            "p95_latency": self.latency_quantile(0.95),
+            "p95_first_token": self.latency_quantile(0.95, first_token=True),
+            "score": self.score()
+        }
+
+def _cache_hit(info: Optional[CompletionInfo]) -> bool:
+    # Answers from the response cache say nothing about the provider's health or latency
+    return info is not None and info.cache_status == 'hit'
+
+class _Attempt:
+    """One streamed optimization racing in its own thread."""
+
+    def __init__(self, provider: str, model: Optional[str], options: Dict[str, Any],
+                 health: ProviderHealth, updates: "queue.Queue[_Attempt]"):
+        self.provider = provider
+        self.model = model
+        self.options = options
+        self.health = health
+        self.updates = updates
+        self.optimizer: Optional[AIProvider] = None
+        self.chunks: List[str] = []
+        self.info: Optional[CompletionInfo] = None
+        self.error: Optional[Exception] = None
+        self.cancelled = threading.Event()
+        self.abort = StreamAbort()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"hedge-{provider}", daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def cancel(self) -> None:
+        """Stop the attempt at once: its provider stream is closed even while it waits for data."""
+        self.cancelled.set()
+        self.abort.abort()
+
+    def _run(self) -> None:
+        started = time.monotonic()
+        first_token = None
+        stream_abort.set(self.abort)
+        try:
+            self.optimizer = _lookup(self.provider, self.model)
+            events = self.optimizer.stream_optimize(**self.options)
+            try:
+                for event in events:
+                    if self.cancelled.is_set():
+                        # Closing the generator closes the provider stream
+                        logger.info(f"Cancelled hedged request to {self.provider}")
+                        return
+                    if event["event"] == "token":
+                        self.chunks.append(event["text"])
+                        if first_token is None:
+                            first_token = time.monotonic() - started
+                            self.updates.put(self)
+                    elif event["event"] == "done":
+                        self.info = CompletionInfo(event["provider"], event["model"], event["cache"], event["usage"],
+                                                   event.get("sections"))
+            finally:
+                events.close()
+            if not _cache_hit(self.info):
+                self.health.record_success(time.monotonic() - started, first_token)
+        except Exception as e:
+            self.error = e
+            if not self.cancelled.is_set() and isinstance(e, PROVIDER_ERRORS):
+                self.health.record_failure()
+        finally:
+            self.done.set()
+            self.updates.put(self)
+
+class ProviderRouter:
+    """Routes optimizations across providers with failover and optional hedging.
+
+    - The requested provider is tried first, then the `failover` providers in order.
+      Providers whose recent error rate reaches `unhealthy_error_rate` are moved
+      to the end, ordered by health score.
+    - With `hedge`, a request whose primary has not streamed a first token within
+      that provider's p95 first-token latency is also sent to the next candidate.
+      The first to start answering wins and the other stream is cancelled.
+    """
+
+    def __init__(
+        self,
+        failover: Optional[List[str]] = None,
+        hedge: bool = Config.HEDGE_REQUESTS,
+        hedge_delay: float = Config.HEDGE_DELAY,
+        hedge_quantile: float = 0.95,
+        unhealthy_error_rate: float = 0.5,
+        min_samples: int = 5
+    ):
+        self.failover = list(Config.FAILOVER_PROVIDERS if failover is None else failover)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_quantile = hedge_quantile
+        self.unhealthy_error_rate = unhealthy_error_rate
+        self.min_samples = min_samples
+        self._health: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+
+    def health(self, provider: str) -> ProviderHealth:
+        with self._lock:
+            return self._health.setdefault(provider, ProviderHealth())
+
+    def is_healthy(self, provider: str) -> bool:
+        health = self.health(provider)
+        return health.samples < self.min_samples or health.error_rate() < self.unhealthy_error_rate
+
+    def candidates(self, provider: str, model: Optional[str] = None) -> List[Tuple[str, Optional[str]]]:
+        """Ordered (provider, model) pairs to try; only the requested provider keeps its model."""
+        backups = [(name, None) for name in dict.fromkeys(self.failover) if name != provider]
+        ordered = [(provider, model)] + backups
+        healthy = [candidate for candidate in ordered if self.is_healthy(candidate[0])]
+        unhealthy = [candidate for candidate in ordered if not self.is_healthy(candidate[0])]
+        # Unhealthy providers are still tried as a last resort, best health score first
+        unhealthy.sort(key=lambda candidate: self.health(candidate[0]).score(), reverse=True)
+        return healthy + unhealthy
+
+    def delay_for(self, provider: str) -> float:
+        """Seconds to wait for a first token before hedging."""
+        p95 = self.health(provider).latency_quantile(self.hedge_quantile, first_token=True)
+        if p95 is None or self.health(provider).samples < self.min_samples:
+            return self.hedge_delay
+        return p95
+
+    def optimize(self, optimizer: AIProvider, options: Dict[str, Any]) -> Tuple[str, AIProvider]:
+        """Optimize with `optimizer`, failing over or hedging as configured.
+
+        Returns the optimized content and the provider that produced it.
+        """
+        candidates = self.candidates(optimizer.provider, optimizer.model)
+        if self.hedge and len(candidates) > 1:
+            return self._hedged(candidates, options)
+        return self._sequential(optimizer, candidates, options)
+
+    def _sequential(self, optimizer: AIProvider, candidates: List[Tuple[str, Optional[str]]],
+                    options: Dict[str, Any]) -> Tuple[str, AIProvider]:
+        last_error = None
+        for provider, model in candidates:
+            health = self.health(provider)
+            started = time.monotonic()
+            last_completion.set(None)
+            try:
+                current = optimizer if provider == optimizer.provider else _lookup(provider, model)
+                optimized_content = current(**options)
+            except PROVIDER_ERRORS as e:
+                health.record_failure()
+                logger.warning(f"Optimization with {provider} failed: {str(e)}")
+                last_error = e
+                continue
+            if not _cache_hit(last_completion.get()):
+                health.record_success(time.monotonic() - started)
+            return optimized_content, current
+        raise last_error
+
+    async def aoptimize(self, optimizer: AIProvider, options: Dict[str, Any]) -> Tuple[str, AIProvider]:
+        """Async counterpart of `optimize` with failover; hedging needs streaming and is not applied."""
+        last_error = None
+        for provider, model in self.candidates(optimizer.provider, optimizer.model):
+            health = self.health(provider)
+            started = time.monotonic()
+            last_completion.set(None)
+            try:
+                current = optimizer if provider == optimizer.provider else _lookup(provider, model)
+                optimized_content = await current.aoptimize_resume(**options)
+            except PROVIDER_ERRORS as e:
+                health.record_failure()
+                logger.warning(f"Optimization with {provider} failed: {str(e)}")
+                last_error = e
+                continue
+            if not _cache_hit(last_completion.get()):
+                health.record_success(time.monotonic() - started)
+            return optimized_content, current
+        raise last_error
+
+    def _hedged(self, candidates: List[Tuple[str, Optional[str]]],
+                options: Dict[str, Any]) -> Tuple[str, AIProvider]:
+        pending = list(candidates)
+        running: List[_Attempt] = []
+        updates: "queue.Queue[_Attempt]" = queue.Queue()
+        last_error = None
+
+        def launch() -> None:
+            provider, model = pending.pop(0)
+            attempt = _Attempt(provider, model, options, self.health(provider), updates)
+            running.append(attempt)
+            attempt.start()
+
+        launch()
+        while True:
+            timeout = self.delay_for(running[-1].provider) if pending else None
+            try:
+                attempt = updates.get(timeout=timeout)
+            except queue.Empty:
+                logger.info(f"No first token from {running[-1].provider} after {timeout:.2f}s, hedging")
+                launch()
+                continue
+
+            if attempt not in running:
+                continue  # a late update from an attempt that already lost or failed
+            if attempt.error is not None:
+                if not isinstance(attempt.error, PROVIDER_ERRORS):
+                    for other in running:
+                        other.cancel()
+                    raise attempt.error
+                logger.warning(f"Optimization with {attempt.provider} failed: {str(attempt.error)}")
+                last_error = attempt.error
+                running.remove(attempt)
+                if not running:
+                    if not pending:
+                        raise last_error
+                    launch()
+                continue
+
+            # First to start answering wins; the others are cancelled
+            for other in running:
+                if other is not attempt:
+                    other.cancel()
+            running = [attempt]
+            attempt.done.wait()
+            if attempt.error is not None:
+                if not isinstance(attempt.error, PROVIDER_ERRORS):
+                    raise attempt.error
+                logger.warning(f"Optimization with {attempt.provider} failed: {str(attempt.error)}")
+                last_error = attempt.error
+                running = []
+                if not pending:
+                    raise last_error
+                launch()
+                continue
+
+            last_completion.set(attempt.info)
+            return ''.join(attempt.chunks), attempt.optimizer
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            providers = list(self._health)
+        return {provider: {**self.health(provider).snapshot(), "healthy": self.is_healthy(provider)}
+                for provider in providers}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._health.clear()
+
+provider_router = ProviderRouter()
@@ -0,0 +1,451 @@
+from typing import Optional, Dict, Callable, Iterator, Awaitable, TypeVar, Any
+from collections import deque
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+import logging
+from config import Config
+from input_compaction import CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Status codes worth retrying: rate limited, overloaded or temporarily unavailable
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+class RateLimitedError(Exception):
+    """A provider kept rejecting requests for exceeding its rate limits, or our own quota is exhausted."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def status_code(error: Exception) -> Optional[int]:
+    """HTTP status of an SDK error, if it has one."""
+    for attribute in ("status_code", "http_status"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, from the error's `Retry-After` header."""
+    headers = getattr(error, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    headers = {str(key).lower(): value for key, value in dict(headers).items()}
+
+    if "retry-after-ms" in headers:
+        try:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error: Exception) -> bool:
+    status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Connection errors and timeouts carry no status
+    name = type(error).__name__
+    return "Connection" in name or "Timeout" in name
+
+def reached_provider(error: Exception) -> bool:
+    """Whether a failed request may have been received, and counted against its limits, by the provider.
+
+    Errors with an HTTP status got a response, and a read timeout may follow a request
+    that was sent in full; failing to connect means the request never left.
+    """
+    if status_code(error) is not None:
+        return True
+    name = type(error).__name__
+    return "Timeout" in name and "Connect" not in name
+
+def backoff_delay(attempt: int, base: float = Config.PROVIDER_RETRY_BASE_DELAY,
+                  cap: float = Config.PROVIDER_RETRY_MAX_DELAY, hint: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than a server-provided Retry-After."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    return max(delay, hint) if hint is not None else delay
+
+class SharedTokenBucket:
+    """Token buckets stored in SQLite so every worker process draws from the same quota.
+
+    `reserve` takes tokens up front, letting the balance go negative, and returns
+    how long the caller must wait for its reservation to become due. Requests are
+    therefore served in the order they reserved, and none fail while within `max_wait`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use so unlimited providers never touch the database
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def reserve(self, name: str, amount: float, rate: float, capacity: float) -> float:
+        """Reserve `amount` tokens refilling at `rate` per second; returns seconds until they are available."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # BEGIN IMMEDIATE serializes reservations across processes
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                tokens -= amount
+                conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                             (name, tokens, now))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return max(0.0, -tokens / rate)
+
+    def refund(self, name: str, amount: float) -> None:
+        """Give back tokens that were reserved but not used (negative amounts take more)."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("UPDATE buckets SET tokens = tokens + ? WHERE name = ?", (amount, name))
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM buckets")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class _Waiter:
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.granted = False
+        self.event = threading.Event() if loop is None else asyncio.Event()
+
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight requests to one provider.
+
+    The limit grows by one per limit's worth of successful calls and is cut by
+    `backoff` on a 429 or a latency spike (at most once per `cooldown` seconds).
+    Waiting threads and coroutines are handed free slots first come, first served.
+    """
+
+    def __init__(
+        self,
+        max_limit: int = Config.PROVIDER_MAX_CONCURRENCY,
+        min_limit: int = 1,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+        cooldown: float = 1.0
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._latency: Optional[float] = None  # moving average of successful call latency
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._waiters: "deque[_Waiter]" = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        waiter = self._enqueue(_Waiter())
+        if not waiter.granted:
+            waiter.event.wait(timeout)
+        return self._settle(waiter)
+
+    async def aacquire(self, timeout: Optional[float] = None) -> bool:
+        waiter = self._enqueue(_Waiter(asyncio.get_running_loop()))
+        if not waiter.granted:
+            try:
+                await asyncio.wait_for(waiter.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                if self._settle(waiter):
+                    self.release()
+                raise
+        return self._settle(waiter)
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        """Free a slot and adjust the limit from the call's outcome."""
+        with self._lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            spike = (latency is not None and self._latency is not None and self._samples >= 10
+                     and latency > self._latency * self.latency_tolerance)
+            if overloaded or spike:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+                    logger.info(f"Reduced provider concurrency to {int(self.limit)} "
+                                f"({'rate limited' if overloaded else 'latency spike'})")
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if latency is not None and not overloaded:
+                self._latency = latency if self._latency is None else 0.9 * self._latency + 0.1 * latency
+                self._samples += 1
+            self._grant()
+
+    def _enqueue(self, waiter: _Waiter) -> _Waiter:
+        with self._lock:
+            self._waiters.append(waiter)
+            self._grant()
+        return waiter
+
+    def _grant(self) -> None:
+        while self._waiters and self.in_flight < max(self.min_limit, int(self.limit)):
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.in_flight += 1
+            waiter.wake()
+
+    def _settle(self, waiter: _Waiter) -> bool:
+        with self._lock:
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+            return waiter.granted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"limit": int(self.limit), "in_flight": self.in_flight, "waiting": len(self._waiters)}
+
+class ProviderLimiter:
+    """Client-side rate limiting, adaptive concurrency and retries for one provider."""
+
+    def __init__(
+        self,
+        provider: str,
+        bucket: SharedTokenBucket,
+        rpm: int = 0,
+        tpm: int = 0,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        max_retries: int = Config.PROVIDER_MAX_RETRIES,
+        max_wait: float = Config.RATE_LIMIT_MAX_WAIT
+    ):
+        self.provider = provider
+        self.bucket = bucket
+        self.rpm = rpm
+        self.tpm = tpm
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+
+    def _reserve(self, tokens: int) -> float:
+        """Reserve quota for one request and return how long to wait for it."""
+        wait = 0.0
+        if self.rpm:
+            wait = max(wait, self.bucket.reserve(f"{self.provider}:requests", 1, self.rpm / 60, self.rpm))
+        if self.tpm:
+            wait = max(wait, self.bucket.reserve(f"{self.provider}:tokens", tokens, self.tpm / 60, self.tpm))
+        if wait > self.max_wait:
+            self._refund(tokens)
+            raise RateLimitedError(f"Rate limit for {self.provider} exceeded; try again later", retry_after=wait)
+        return wait
+
+    def _refund(self, reserved: int) -> None:
+        """Return the quota reserved for a request that never reached the provider."""
+        if self.rpm:
+            self.bucket.refund(f"{self.provider}:requests", 1)
+        if self.tpm:
+            self.bucket.refund(f"{self.provider}:tokens", reserved)
+
+    def _reconcile(self, reserved: int, usage: Optional[Dict[str, Optional[int]]]) -> None:
+        """Correct the token reservation with the usage the provider reported."""
+        if self.tpm and usage and usage.get("input_tokens") is not None:
+            used = usage["input_tokens"] + (usage.get("output_tokens") or 0)
+            self.bucket.refund(f"{self.provider}:tokens", reserved - used)
+
+    def _reconcile_partial(self, reserved: int, usage: Optional[Dict[str, Optional[int]]], streamed: int) -> None:
+        """Give back the part of a reservation a stream that failed midway did not use.
+
+        Reservations are the prompt plus the MAX_OUTPUT_TOKENS output allowance; the
+        prompt and the `streamed` characters of output count as used unless the
+        provider already reported usage.
+        """
+        if not self.tpm:
+            return
+        usage = usage or {}
+        input_tokens = usage.get("input_tokens")
+        if input_tokens is None:
+            input_tokens = max(reserved - Config.MAX_OUTPUT_TOKENS, 0)
+        output_tokens = usage.get("output_tokens")
+        if output_tokens is None:
+            output_tokens = int(streamed / CHARS_PER_TOKEN.get(self.provider, 4.0)) + 1
+        self.bucket.refund(f"{self.provider}:tokens", max(reserved - input_tokens - output_tokens, 0))
+
+    def _acquire_slot(self) -> None:
+        if not self.concurrency.acquire(self.max_wait):
+            raise RateLimitedError(f"Too many requests in flight for {self.provider}; try again later",
+                                   retry_after=1.0)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying `error`, or None if it should be raised."""
+        if not is_retryable(error) or attempt >= self.max_retries:
+            return None
+        return backoff_delay(attempt, hint=retry_after(error))
+
+    def _give_up(self, error: Exception) -> Exception:
+        if status_code(error) == 429:
+            return RateLimitedError(f"{self.provider} rate limit exceeded: {str(error)}",
+                                    retry_after=retry_after(error))
+        return error
+
+    def call(self, request: Callable[[], T], tokens: int = 0,
+             usage: Optional[Dict[str, Optional[int]]] = None) -> T:
+        """Run `request` within the provider's quota and concurrency limit, retrying transient failures."""
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self._reserve(tokens))
+            self._acquire_slot()
+            started = time.monotonic()
+            try:
+                result = request()
+            except Exception as e:
+                self.concurrency.release(overloaded=status_code(e) == 429)
+                if not reached_provider(e):
+                    self._refund(tokens)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise self._give_up(e) from e
+                logger.warning(f"Retrying {self.provider} request in {delay:.2f}s: {str(e)}")
+                time.sleep(delay)
+                continue
+            self.concurrency.release(latency=time.monotonic() - started)
+            self._reconcile(tokens, usage)
+            return result
+
+    def stream(self, request: Callable[[], Iterator[T]], tokens: int = 0,
+               usage: Optional[Dict[str, Optional[int]]] = None) -> Iterator[T]:
+        """Like `call` for streamed responses; only failures before the first chunk are retried."""
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self._reserve(tokens))
+            self._acquire_slot()
+            started = False
+            streamed = 0
+            overloaded = False
+            settled = False
+            try:
+                for chunk in request():
+                    started = True
+                    if isinstance(chunk, str):
+                        streamed += len(chunk)
+                    yield chunk
+                self._reconcile(tokens, usage)
+                settled = True
+                return
+            except Exception as e:
+                overloaded = status_code(e) == 429
+                if started:
+                    # The request went through and part of the output was generated
+                    self._reconcile_partial(tokens, usage, streamed)
+                elif not reached_provider(e):
+                    self._refund(tokens)
+                settled = True
+                delay = None if started else self._retry_delay(e, attempt)
+                if delay is None:
+                    raise self._give_up(e) from e
+                logger.warning(f"Retrying {self.provider} stream in {delay:.2f}s: {str(e)}")
+            finally:
+                if not settled:
+                    # Closed by the consumer (GeneratorExit) before the end of the stream
+                    self._reconcile_partial(tokens, usage, streamed)
+                self.concurrency.release(overloaded=overloaded)
+            time.sleep(delay)
+
+    async def acall(self, request: Callable[[], Awaitable[T]], tokens: int = 0,
+                    usage: Optional[Dict[str, Optional[int]]] = None) -> T:
+        """Async counterpart of `call`; waiting never blocks the event loop."""
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(await asyncio.to_thread(self._reserve, tokens))
+            if not await self.concurrency.aacquire(self.max_wait):
+                raise RateLimitedError(f"Too many requests in flight for {self.provider}; try again later",
+                                       retry_after=1.0)
+            started = time.monotonic()
+            try:
+                result = await request()
+            except asyncio.CancelledError:
+                # The request may already have reached the provider, so its quota stays spent
+                self.concurrency.release()
+                raise
+            except Exception as e:
+                self.concurrency.release(overloaded=status_code(e) == 429)
+                if not reached_provider(e):
+                    await asyncio.to_thread(self._refund, tokens)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise self._give_up(e) from e
+                logger.warning(f"Retrying {self.provider} request in {delay:.2f}s: {str(e)}")
+                await asyncio.sleep(delay)
+                continue
+            self.concurrency.release(latency=time.monotonic() - started)
+            await asyncio.to_thread(self._reconcile, tokens, usage)
+            return result
+
+class ProviderLimits:
+    """Registry of per-provider limiters configured from Config.RATE_LIMITS."""
+
+    def __init__(self, path: str = Config.RATE_LIMIT_DB_PATH):
+        self.bucket = SharedTokenBucket(path)
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str) -> ProviderLimiter:
+        with self._lock:
+            limiter = self._limiters.get(provider)
+            if limiter is None:
+                limits = Config.RATE_LIMITS.get(provider, {})
+                limiter = ProviderLimiter(provider, self.bucket, rpm=limits.get('rpm', 0), tpm=limits.get('tpm', 0))
+                self._limiters[provider] = limiter
+            return limiter
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {provider: {"rpm": limiter.rpm, "tpm": limiter.tpm, **limiter.concurrency.stats()}
+                for provider, limiter in limiters.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._limiters.clear()
+        self.bucket.clear()
+
+provider_limits = ProviderLimits()
@@ -0,0 +1,265 @@
+from typing import Optional, Dict
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def make_key(prompt: str, provider: str, model: str, temperature: float) -> str:
+    """Content-address a completion by its fully assembled prompt and sampling settings."""
+    digest = hashlib.sha256()
+    for part in (provider, model, repr(temperature), prompt):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+class MemoryTier:
+    """In-process LRU tier bounded by the total size of the cached values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.encode('utf-8'))
+            self._entries[key] = value
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.encode('utf-8'))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions
+            }
+
+class SQLiteTier:
+    """On-disk tier stored in a single SQLite database; survives restarts."""
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, accessed_at) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+            # Drop least recently used rows beyond the limit
+            deleted = self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            self.evictions += max(deleted, 0)
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(value AS BLOB))), 0) FROM responses"
+            ).fetchone()
+        return {"entries": entries, "bytes": size, "evictions": self.evictions}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class DirectoryTier:
+    """On-disk tier storing one file per cached response; survives restarts."""
+
+    # Share of max_entries evicted at once, so the directory is scanned once per
+    # that many writes rather than on every write
+    PRUNE_FRACTION = 0.1
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.evictions = 0
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries = sum(1 for _ in self.path.glob("*/*.txt"))
+
+    def _file(self, key: str) -> Path:
+        return self.path / key[:2] / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[str]:
+        file = self._file(key)
+        try:
+            value = file.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+        file.touch()
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        file = self._file(key)
+        file.parent.mkdir(exist_ok=True)
+        # Write to a temporary file first so readers never see partial content; the name is
+        # unique per process and thread, as several workers may share the directory
+        tmp = file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(value, encoding='utf-8')
+        with self._lock:
+            if not file.exists():
+                self._entries += 1
+            tmp.replace(file)
+            if self._entries > self.max_entries:
+                self._prune()
+
+    def _prune(self) -> None:
+        """Evict the least recently used files down to below max_entries; holds the lock."""
+        files = list(self.path.glob("*/*.txt"))
+        keep = self.max_entries - int(self.max_entries * self.PRUNE_FRACTION)
+        if len(files) > keep:
+            files.sort(key=lambda f: f.stat().st_mtime)
+            for file in files[:len(files) - keep]:
+                file.unlink(missing_ok=True)
+                self.evictions += 1
+        self._entries = min(len(files), keep)
+
+    def clear(self) -> None:
+        with self._lock:
+            for file in self.path.glob("*/*.txt"):
+                file.unlink(missing_ok=True)
+            self._entries = 0
+
+    def stats(self) -> Dict[str, int]:
+        files = list(self.path.glob("*/*.txt"))
+        return {
+            "entries": len(files),
+            "bytes": sum(f.stat().st_size for f in files),
+            "evictions": self.evictions
+        }
+
+class ResponseCache:
+    """Two-tier cache of optimized resumes keyed by `make_key`.
+
+    Lookups check the memory tier first and then the optional disk tier,
+    promoting disk hits back into memory.
+    """
+
+    def __init__(self, memory: MemoryTier, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except Exception as e:
+                logger.error(f"Error reading response cache: {str(e)}")
+                value = None
+            if value is not None:
+                self.memory.put(key, value)
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key: str, value: Optional[str]) -> None:
+        # Empty completions are failures, not answers worth replaying
+        if not value:
+            return
+        self.memory.put(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, value)
+            except Exception as e:
+                logger.error(f"Error writing response cache: {str(e)}")
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None
+        }
+
+def create_response_cache() -> ResponseCache:
+    """Build the response cache described by Config."""
+    disk = None
+    if Config.RESPONSE_CACHE_DISK_BACKEND == 'sqlite':
+        disk = SQLiteTier(Config.RESPONSE_CACHE_DISK_PATH, Config.RESPONSE_CACHE_DISK_MAX_ENTRIES)
+    elif Config.RESPONSE_CACHE_DISK_BACKEND == 'directory':
+        disk = DirectoryTier(Config.RESPONSE_CACHE_DISK_PATH, Config.RESPONSE_CACHE_DISK_MAX_ENTRIES)
+    elif Config.RESPONSE_CACHE_DISK_BACKEND:
+        raise ValueError(f"Unsupported response cache backend: {Config.RESPONSE_CACHE_DISK_BACKEND}")
+    return ResponseCache(MemoryTier(Config.RESPONSE_CACHE_MAX_BYTES), disk)
+
+response_cache = create_response_cache()
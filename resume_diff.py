@@ -0,0 +1,194 @@
+"""Line- and word-level diffs between an original and an optimized resume.
+
+Diffs use Myers' algorithm in its linear-space form: the middle snake of the edit
+graph splits the problem in two, so memory stays proportional to the input while
+time is proportional to its size times the number of edits. Word diffs first diff
+the lines and only compare the words of changed lines.
+
+A diff is a list of operations in document order, each usable on its own so they
+can be streamed: `equal` runs carry only their `length` in characters (the client
+has the original), `delete` and `insert` runs carry their `text`.
+"""
+from typing import List, Dict, Any, Tuple
+import hashlib
+import json
+import re
+import logging
+from config import Config
+from response_cache import MemoryTier
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('line', 'word')
+
+# Words, single punctuation marks and whitespace runs
+WORD_TOKEN = re.compile(r"\s+|\w+|[^\w\s]")
+
+def tokenize(text: str, granularity: str) -> List[str]:
+    """Split text into lines (with their line endings) or into words, punctuation and whitespace.
+
+    Joining the tokens gives back the text.
+    """
+    if granularity == 'line':
+        return text.splitlines(keepends=True)
+    return WORD_TOKEN.findall(text)
+
+def _middle_snake(a: List[int], a0: int, n: int, b: List[int], b0: int, m: int) -> Tuple[int, int, int, int]:
+    """(x, y, u, v): the middle snake of a[a0:a0+n] against b[b0:b0+m], relative to a0 and b0."""
+    delta = n - m
+    odd = delta % 2 == 1
+    offset = n + m + 1
+    forward = [0] * (2 * offset + 1)
+    backward = [0] * (2 * offset + 1)
+    for d in range((n + m + 1) // 2 + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            start_x, start_y = x, y
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            # The reverse path on the same diagonal ran d - 1 steps
+            if odd and -(d - 1) <= delta - k <= d - 1 and x + backward[offset + delta - k] >= n:
+                return start_x, start_y, x, y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[offset + k - 1] < backward[offset + k + 1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            start_x, start_y = x, y
+            while x < n and y < m and a[a0 + n - x - 1] == b[b0 + m - y - 1]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+            if not odd and -d <= delta - k <= d and x + forward[offset + delta - k] >= n:
+                return n - x, m - y, n - start_x, m - start_y
+    raise AssertionError("no middle snake")  # unreachable: the paths always meet
+
+def _matches(a: List[int], a0: int, a1: int, b: List[int], b0: int, b1: int,
+             out: List[Tuple[int, int, int]]) -> None:
+    """Append the (i, j, size) runs of a[a0:a1] equal to b[b0:b1] to `out`, in order."""
+    prefix = 0
+    while a0 + prefix < a1 and b0 + prefix < b1 and a[a0 + prefix] == b[b0 + prefix]:
+        prefix += 1
+    if prefix:
+        out.append((a0, b0, prefix))
+        a0, b0 = a0 + prefix, b0 + prefix
+    suffix = 0
+    while a0 < a1 - suffix and b0 < b1 - suffix and a[a1 - suffix - 1] == b[b1 - suffix - 1]:
+        suffix += 1
+    a1, b1 = a1 - suffix, b1 - suffix
+
+    if a0 < a1 and b0 < b1:
+        x, y, u, v = _middle_snake(a, a0, a1 - a0, b, b0, b1 - b0)
+        _matches(a, a0, a0 + x, b, b0, b0 + y, out)
+        if u > x:
+            out.append((a0 + x, b0 + y, u - x))
+        _matches(a, a0 + u, a1, b, b0 + v, b1, out)
+    if suffix:
+        out.append((a1, b1, suffix))
+
+def opcodes(a: List[str], b: List[str]) -> List[Tuple[str, int, int, int, int]]:
+    """(tag, i1, i2, j1, j2) operations turning `a` into `b`, tags being equal, delete and insert.
+
+    A replaced run is a delete followed by an insert.
+    """
+    # Compare small integers instead of strings
+    codes: Dict[str, int] = {}
+    a_codes = [codes.setdefault(token, len(codes)) for token in a]
+    b_codes = [codes.setdefault(token, len(codes)) for token in b]
+    matches: List[Tuple[int, int, int]] = []
+    _matches(a_codes, 0, len(a), b_codes, 0, len(b), matches)
+
+    result = []
+    i = j = 0
+    for match_i, match_j, size in matches + [(len(a), len(b), 0)]:
+        if i < match_i:
+            result.append(('delete', i, match_i, j, j))
+        if j < match_j:
+            result.append(('insert', match_i, match_i, j, match_j))
+        if size:
+            result.append(('equal', match_i, match_i + size, match_j, match_j + size))
+        i, j = match_i + size, match_j + size
+    return result
+
+class _Builder:
+    """Collects operations, merging neighbours of the same kind, and line or word counts."""
+
+    def __init__(self, granularity: str):
+        self.granularity = granularity
+        self.ops: List[Dict[str, Any]] = []
+        self.stats = {"unchanged": 0, "deleted": 0, "inserted": 0}
+
+    def add(self, tag: str, tokens: List[str]) -> None:
+        if not tokens:
+            return
+        text = "".join(tokens)
+        count = len(tokens) if self.granularity == 'line' else sum(1 for token in tokens if not token.isspace())
+        self.stats[{"equal": "unchanged", "delete": "deleted", "insert": "inserted"}[tag]] += count
+        last = self.ops[-1] if self.ops else None
+        if last is not None and last["op"] == tag:
+            if tag == "equal":
+                last["length"] += len(text)
+            else:
+                last["text"] += text
+        else:
+            self.ops.append({"op": tag, "length": len(text)} if tag == "equal" else {"op": tag, "text": text})
+
+def diff_texts(original: str, revised: str, granularity: str = 'word') -> Dict[str, Any]:
+    """Diff two texts; `stats` counts the unchanged, deleted and inserted lines, or words and punctuation."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown diff granularity: {granularity} (expected one of {', '.join(GRANULARITIES)})")
+    a, b = tokenize(original, 'line'), tokenize(revised, 'line')
+    builder = _Builder(granularity)
+    operations = opcodes(a, b)
+    for index, (tag, i1, i2, j1, j2) in enumerate(operations):
+        if granularity == 'line' or tag == 'equal':
+            builder.add(tag, a[i1:i2] if tag != 'insert' else b[j1:j2])
+        elif tag == 'delete' and index + 1 < len(operations) and operations[index + 1][0] == 'insert':
+            # Replaced lines: compare their words
+            _, _, _, k1, k2 = operations[index + 1]
+            words_a, words_b = tokenize("".join(a[i1:i2]), 'word'), tokenize("".join(b[k1:k2]), 'word')
+            for word_tag, w1, w2, v1, v2 in opcodes(words_a, words_b):
+                builder.add(word_tag, words_a[w1:w2] if word_tag != 'insert' else words_b[v1:v2])
+        elif tag == 'insert' and index and operations[index - 1][0] == 'delete':
+            continue  # diffed word by word with the preceding delete
+        else:
+            lines = a[i1:i2] if tag == 'delete' else b[j1:j2]
+            builder.add(tag, tokenize("".join(lines), 'word'))
+    return {"granularity": granularity, "ops": builder.ops, "stats": builder.stats}
+
+def apply_diff(original: str, diff: Dict[str, Any]) -> str:
+    """Rebuild the revised text from the original and a diff."""
+    parts, position = [], 0
+    for op in diff["ops"]:
+        if op["op"] == "equal":
+            parts.append(original[position:position + op["length"]])
+            position += op["length"]
+        elif op["op"] == "delete":
+            position += len(op["text"])
+        else:
+            parts.append(op["text"])
+    return "".join(parts)
+
+# Diffs keyed by the hash of both texts, so repeated diffs of a cached optimization are free
+diff_cache = MemoryTier(Config.DIFF_CACHE_MAX_BYTES)
+
+def cached_diff(original: str, revised: str, granularity: str = 'word') -> Tuple[Dict[str, Any], bool]:
+    """(diff, whether it came from the cache)."""
+    digest = hashlib.sha256()
+    for part in (granularity, original, revised):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    key = digest.hexdigest()
+    cached = diff_cache.get(key)
+    if cached is not None:
+        return json.loads(cached), True
+    diff = diff_texts(original, revised, granularity)
+    diff_cache.put(key, json.dumps(diff))
+    return diff, False
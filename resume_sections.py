@@ -0,0 +1,154 @@
+"""Splits a resume into stable blocks that can be optimized and cached one at a time.
+
+A block is the text under a section heading (summary, skills, education, ...), or one
+entry of an experience or projects section. Editing one bullet changes only the block
+that holds it, so the other blocks' prompts, and their cached completions, stay the same.
+"""
+from typing import Optional, List, Dict
+import re
+
+# Known section headings, matched case-insensitively after markdown and a trailing colon are removed
+SECTION_HEADINGS: Dict[str, tuple] = {
+    'summary': ('summary', 'professional summary', 'career summary', 'profile', 'professional profile',
+                'objective', 'career objective', 'about', 'about me'),
+    'experience': ('experience', 'work experience', 'professional experience', 'relevant experience',
+                   'employment', 'employment history', 'work history', 'career history'),
+    'projects': ('projects', 'selected projects', 'personal projects', 'key projects'),
+    'skills': ('skills', 'technical skills', 'key skills', 'core skills', 'core competencies',
+               'competencies', 'technologies', 'tools', 'tools and technologies'),
+    'education': ('education', 'education and training', 'academic background'),
+    'certifications': ('certifications', 'certificates', 'licenses', 'licenses and certifications',
+                       'licenses & certifications'),
+    'awards': ('awards', 'honors', 'honors and awards', 'achievements'),
+    'publications': ('publications',),
+    'languages': ('languages',),
+    'volunteering': ('volunteering', 'volunteer experience', 'volunteer work'),
+    'interests': ('interests', 'hobbies'),
+}
+HEADING_KINDS = {name: kind for kind, names in SECTION_HEADINGS.items() for name in names}
+
+# Sections made of entries (one job, one project) that are optimized separately
+ENTRY_KINDS = {'experience', 'projects', 'volunteering'}
+
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+BULLET = re.compile(r"^([-*+•▪●]|\d+[.)])\s")
+
+class Section:
+    """One block of a resume.
+
+    `optimize` is False for blocks passed through unchanged: section headings and the
+    contact header above the first heading. `separator` is the whitespace that followed
+    the block in the original, so blocks join back into the original layout.
+    """
+
+    def __init__(self, kind: str, text: str, title: Optional[str] = None,
+                 optimize: bool = True, separator: str = "\n\n"):
+        self.kind = kind
+        self.text = text
+        self.title = title  # the heading of the section the block belongs to
+        self.optimize = optimize
+        self.separator = separator
+
+    def label(self) -> str:
+        """Human-readable description of the block for the prompt."""
+        if self.kind in ENTRY_KINDS:
+            return f"one entry of the {self.title or self.kind} section"
+        return f"the {self.title or self.kind} section"
+
+    def __repr__(self) -> str:
+        return f"Section({self.kind!r}, {self.text[:30]!r}...)"
+
+def _heading(line: str) -> Optional[tuple]:
+    """(kind, title) if `line` is a section heading, else None."""
+    stripped = line.strip()
+    match = MARKDOWN_HEADING.match(stripped)
+    level = len(match.group(1)) if match else None
+    title = (match.group(2) if match else stripped).strip().strip("*_").strip().rstrip(":").strip()
+    if not title or len(title) > 50:
+        return None
+    kind = HEADING_KINDS.get(re.sub(r"\s+", " ", title.lower()))
+    if kind:
+        return kind, title
+    if level is not None and level <= 2:
+        return 'other', title
+    # An all-caps line of a few words ("CONTACT", "KEY ACHIEVEMENTS") also starts a section
+    if title.isupper() and len(title.split()) <= 4 and not BULLET.match(stripped):
+        return 'other', title
+    return None
+
+def _entries(lines: List[str]) -> List[List[str]]:
+    """Group the lines of an entry section into entries.
+
+    An entry starts at a markdown sub-heading, or at a non-bullet line that follows
+    a blank line or a bullet (e.g. "Senior Engineer, Acme Corp (2019-2023)").
+    """
+    entries: List[List[str]] = []
+    previous = ""
+    for line in lines:
+        stripped = line.strip()
+        starts_entry = bool(stripped) and not BULLET.match(stripped) and (
+            MARKDOWN_HEADING.match(stripped) or not previous or BULLET.match(previous)
+        )
+        if starts_entry or not entries:
+            entries.append([])
+        entries[-1].append(line)
+        previous = stripped
+    return entries
+
+def split_sections(resume: str) -> List[Section]:
+    """Split a resume into blocks, in order. Joining every block's text and separator rebuilds it.
+
+    A resume without recognizable headings is a single block.
+    """
+    lines = resume.strip().split("\n")
+    groups: List[tuple] = []  # (kind, title, lines)
+    kind, title = 'header', None
+    current: List[str] = []
+    for line in lines:
+        heading = _heading(line)
+        if heading is None:
+            current.append(line)
+            continue
+        groups.append((kind, title, current))
+        kind, title = heading
+        groups.append(('heading', title, [line]))
+        current = []
+    groups.append((kind, title, current))
+
+    has_headings = any(group[0] == 'heading' for group in groups)
+    sections: List[Section] = []
+    for kind, title, group_lines in groups:
+        if kind == 'header' and not has_headings:
+            kind = 'resume'
+        for block in (_entries(group_lines) if kind in ENTRY_KINDS else [group_lines]):
+            if not block:
+                continue
+            text = "\n".join(block)
+            if not text.strip():
+                if sections:
+                    sections[-1].separator += text + "\n"
+                continue
+            # Blank lines around the block belong to the separators on either side of it
+            leading = re.match(r"(?:[ \t]*\n)*", text).group(0)
+            if sections:
+                sections[-1].separator += leading
+            body = text[len(leading):].rstrip()
+            sections.append(Section(
+                kind, body, title,
+                optimize=kind not in ('header', 'heading'),
+                separator=text[len(leading) + len(body):] + "\n"
+            ))
+    if sections:
+        sections[-1].separator = ""
+    return sections
+
+def join_sections(sections: List[Section], texts: Optional[List[str]] = None) -> str:
+    """Stitch blocks back together in order, with `texts` replacing the blocks' own text."""
+    texts = texts if texts is not None else [section.text for section in sections]
+    return "".join(text + section.separator for section, text in zip(sections, texts))
+
+def strip_fences(text: str) -> str:
+    """Remove a code fence wrapped around a whole completion."""
+    stripped = text.strip()
+    match = re.match(r"^```[\w-]*\n(.*)\n```$", stripped, re.DOTALL)
+    return match.group(1).strip() if match else stripped
@@ -1,7 +1,29 @@
 import pytest
 from flask import Flask
-from app import app as flask_app
+from app import app as flask_app, models_futures
 from ai_utils import AIProvider
+from provider_pool import provider_pool
+from model_catalog import model_catalog
+from response_cache import response_cache
+from provider_router import provider_router
+from rate_limits import provider_limits
+from metrics import registry as metrics_registry
+from document_extraction import document_extractor
+from resume_diff import diff_cache
+
+@pytest.fixture(autouse=True)
+def reset_provider_pool():
+    """Make sure pooled providers and cached results never leak between tests."""
+    yield
+    provider_pool.shutdown()
+    model_catalog.clear()
+    response_cache.clear()
+    provider_router.reset()
+    provider_limits.reset()
+    metrics_registry.clear()
+    document_extractor.clear()
+    diff_cache.clear()
+    models_futures.clear()
 
 @pytest.fixture
 def app():
@@ -1,7 +1,11 @@
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
-from ai_utils import AIProvider
+from unittest.mock import patch, MagicMock, AsyncMock
+from ai_utils import AIProvider, last_completion
+from provider_backends import _read_usage
+from provider_backends import get_backend
 from config import Config
+from mistralai.models.common import UsageInfo
 
 def test_ai_provider_init_default():
     """Test AIProvider initialization with default parameters."""
@@ -140,4 +144,177 @@ def test_real_mistral_integration():
     
     result = provider.optimize_resume(sample_resume)
     assert isinstance(result, str)
-    assert len(result) > 0
\ No newline at end of file
+    assert len(result) > 0
+
+@patch('mistralai.client.MistralClient.chat')
+def test_optimize_resume_cached(mock_chat, sample_resume):
+    """Test that identical requests are served from the response cache."""
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock(message=MagicMock(content="Optimized content"))]
+    mock_chat.return_value = mock_response
+
+    with patch('ai_utils.AIProvider._fetch_available_models') as mock_fetch:
+        mock_fetch.return_value = ['mistral-large-latest']
+        provider = AIProvider(provider='mistral')
+        assert provider.optimize_resume(sample_resume) == "Optimized content"
+        assert last_completion.get().cache_status == 'miss'
+        assert provider.optimize_resume(sample_resume) == "Optimized content"
+        assert last_completion.get().cache_status == 'hit'
+        assert provider.optimize_resume(sample_resume, use_cache=False) == "Optimized content"
+        assert last_completion.get().cache_status == 'bypass'
+
+    assert mock_chat.call_count == 2
+
+@patch('mistralai.client.MistralClient.chat_stream')
+def test_stream_optimize_mistral(mock_stream, sample_resume):
+    """Test streaming optimization yields tokens and a final summary event."""
+    mock_stream.return_value = iter([
+        MagicMock(choices=[MagicMock(delta=MagicMock(content="Optimized "))], usage=None),
+        MagicMock(choices=[MagicMock(delta=MagicMock(content="content"))],
+                  usage=UsageInfo(prompt_tokens=100, completion_tokens=2, total_tokens=102))
+    ])
+
+    with patch('ai_utils.AIProvider._fetch_available_models') as mock_fetch:
+        mock_fetch.return_value = ['mistral-large-latest']
+        provider = AIProvider(provider='mistral')
+        events = list(provider.stream_optimize(sample_resume))
+
+        assert [e["text"] for e in events if e["event"] == "token"] == ["Optimized ", "content"]
+        done = events[-1]
+        assert done["event"] == "done"
+        assert done["model"] == 'mistral-large-latest'
+        assert done["usage"] == {
+            "input_tokens": 100,
+            "cached_input_tokens": 0,
+            "uncached_input_tokens": 100,
+            "output_tokens": 2
+        }
+        assert done["timing"]["first_token_ms"] is not None
+
+        # The streamed result is cached for the regular endpoint
+        assert provider.optimize_resume(sample_resume) == "Optimized content"
+
+@patch('mistralai.async_client.MistralAsyncClient.chat', new_callable=AsyncMock)
+def test_aoptimize_resume_mistral(mock_chat, sample_resume):
+    """Test async resume optimization with Mistral's async client."""
+    mock_chat.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="Optimized content"))])
+
+    with patch('ai_utils.AIProvider._fetch_available_models') as mock_fetch:
+        mock_fetch.return_value = ['mistral-large-latest']
+        provider = AIProvider(provider='mistral')
+        result = asyncio.run(provider.aoptimize_resume(sample_resume, use_cache=False))
+
+    assert result == "Optimized content"
+    mock_chat.assert_awaited_once()
+
+def test_optimize_batch_dedupes_and_keeps_order():
+    """Test batch optimization returns ordered results and sends identical prompts once."""
+    with patch('ai_utils.AIProvider._fetch_available_models') as mock_fetch, \
+         patch('ai_utils.AIProvider._complete') as mock_complete:
+        mock_fetch.return_value = ['mistral-large-latest']
+        mock_complete.side_effect = lambda prompt, usage: "Optimized " + ("A" if "Resume A" in prompt else "B")
+        provider = AIProvider(provider='mistral')
+
+        results = provider.optimize_batch([
+            {"resume_content": "Resume A", "job_description": "Job 1"},
+            {"resume_content": "Resume B", "job_description": "Job 1"},
+            {"resume_content": "Resume A", "job_description": "Job 1"},
+            {"resume_content": "Resume A", "unknown": "field"}
+        ], max_concurrency=2)
+
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert [r["status"] for r in results] == ["success", "success", "success", "error"]
+    assert results[0]["optimized_content"] == "Optimized A"
+    assert results[1]["optimized_content"] == "Optimized B"
+    assert results[2]["optimized_content"] == "Optimized A"
+    assert mock_complete.call_count == 2
+
+
+def test_read_usage_reports_cached_tokens():
+    """Test cached and uncached input tokens are reported for each provider."""
+    openai_usage = MagicMock(spec=['prompt_tokens', 'completion_tokens', 'prompt_tokens_details'],
+                             prompt_tokens=1200, completion_tokens=300,
+                             prompt_tokens_details={'cached_tokens': 1024})
+    assert _read_usage('openai', openai_usage) == {
+        "input_tokens": 1200, "cached_input_tokens": 1024, "uncached_input_tokens": 176, "output_tokens": 300
+    }
+
+    anthropic_usage = MagicMock(spec=['input_tokens', 'output_tokens', 'cache_read_input_tokens'],
+                                input_tokens=50, output_tokens=300, cache_read_input_tokens=1100)
+    assert _read_usage('anthropic', anthropic_usage) == {
+        "input_tokens": 1150, "cached_input_tokens": 1100, "uncached_input_tokens": 50, "output_tokens": 300
+    }
+
+def test_prompt_prefix_sent_as_cacheable_block():
+    """Test the static prefix goes to the system prompt and is marked cacheable for Anthropic."""
+    with patch('ai_utils.AIProvider._fetch_available_models') as mock_fetch:
+        mock_fetch.return_value = ['claude-3-opus-20240229']
+        provider = AIProvider(provider='anthropic')
+        prompt = provider.build_prompt("Resume", guidelines="Guide", job_description="Job")
+
+        params = provider.backend.params(prompt)
+        assert params["system"][0]["cache_control"] == {"type": "ephemeral"}
+        assert params["system"][0]["text"].endswith("Follow these guidelines strictly for formatting and structure.\n\n")
+        assert params["messages"][0]["content"].startswith("Job Description to optimize for:")
+        assert "anthropic-beta" in params["extra_headers"]
+
+        messages = get_backend('openai').messages(prompt)
+        assert messages[0]["content"].startswith("You are a professional resume optimization assistant.\n\n")
+        assert messages[1]["content"] == prompt.suffix
+
+def test_incremental_optimization_sends_only_changed_sections():
+    """Test that sections are optimized separately and a one-bullet edit costs one completion."""
+    resume = ("Jane Doe\n\n## Summary\nData engineer.\n\n## Experience\nEngineer, Acme\n- Built pipelines\n\n"
+              "Analyst, Beta\n- Built reports\n\n## Skills\nPython, SQL")
+
+    def complete(prompt, usage):
+        usage.update(input_tokens=100, cached_input_tokens=0, uncached_input_tokens=100, output_tokens=10)
+        section = prompt.suffix.split("Resume content:\n```\n")[1].split("\n```")[0]
+        return f"```\n{section.upper()}\n```"
+
+    with patch('ai_utils.AIProvider._fetch_available_models') as mock_fetch, \
+         patch('ai_utils.AIProvider._complete') as mock_complete:
+        mock_fetch.return_value = ['mistral-large-latest']
+        mock_complete.side_effect = complete
+        provider = AIProvider(provider='mistral')
+
+        result = provider.optimize_resume(resume, job_description="Job", incremental=True)
+        assert result == ("Jane Doe\n\n## Summary\nDATA ENGINEER.\n\n## Experience\nENGINEER, ACME\n- BUILT PIPELINES\n\n"
+                          "ANALYST, BETA\n- BUILT REPORTS\n\n## Skills\nPYTHON, SQL")
+        assert mock_complete.call_count == 4
+        info = last_completion.get()
+        assert info.cache_status == 'miss'
+        assert info.usage["input_tokens"] == 400
+        assert info.sections == {"total": 8, "optimized": 4, "sent": 4, "reused": 0, "unchanged": 4}
+
+        edited = resume.replace("- Built reports", "- Built dashboards")
+        result = provider.optimize_resume(edited, job_description="Job", incremental=True)
+        assert "- BUILT DASHBOARDS" in result
+        assert mock_complete.call_count == 5
+        assert last_completion.get().sections["sent"] == 1
+        assert last_completion.get().usage["output_tokens"] == 10
+
+        provider.optimize_resume(edited, job_description="Job", incremental=True)
+        assert mock_complete.call_count == 5
+        assert last_completion.get().cache_status == 'hit'
+
+        events = list(provider.stream_optimize(edited, job_description="Job", incremental=True))
+        assert "".join(event["text"] for event in events[:-1]) == result
+        assert events[-1]["sections"]["reused"] == 4
+
+def test_incremental_optimization_async():
+    """Test that the async variant optimizes sections concurrently and stitches them in order."""
+    resume = "## Summary\nData engineer.\n\n## Skills\nPython"
+    with patch('ai_utils.AIProvider._fetch_available_models') as mock_fetch, \
+         patch('ai_utils.AIProvider._acomplete', new_callable=AsyncMock) as mock_acomplete:
+        mock_fetch.return_value = ['mistral-large-latest']
+        mock_acomplete.side_effect = lambda prompt, usage: "Python, Go" if "Python" in prompt.suffix else "Engineer."
+        provider = AIProvider(provider='mistral')
+
+        async def optimize():
+            return await provider.aoptimize_resume(resume, incremental=True), last_completion.get()
+
+        result, info = asyncio.run(optimize())
+        assert result == "## Summary\nEngineer.\n\n## Skills\nPython, Go"
+        assert mock_acomplete.await_count == 2
+        assert info.sections["sent"] == 2
@@ -1,3 +1,6 @@
+import io
+import threading
+import time
 import pytest
 from flask import json
 import app
@@ -145,4 +148,450 @@ def test_real_api_integration(client):
     assert data['status'] == 'success'
     assert isinstance(data['optimized_content'], str)
     assert data['provider'] == 'mistral'
-    assert 'model' in data
\ No newline at end of file
+    assert 'model' in data
+
+def test_list_models_all_providers_partial(client):
+    """Test that slow or failing providers are marked unavailable without failing the response."""
+    release = threading.Event()
+
+    def fake_models(provider):
+        if provider == 'openai':
+            release.wait(5)
+        if provider == 'anthropic':
+            raise Exception("API Error")
+        return [f'{provider}-model']
+
+    with patch('app.Config.get_available_models', side_effect=fake_models), \
+         patch('app.Config.get_default_model', side_effect=lambda p: f'{p}-model'), \
+         patch('app.Config.MODELS_PROVIDER_TIMEOUT', 0.2):
+        start = time.monotonic()
+        response = client.get('/api/v1/models')
+        elapsed = time.monotonic() - start
+        release.set()
+
+    assert response.status_code == 200
+    assert elapsed < 2
+    providers = json.loads(response.data)['providers']
+    assert providers['mistral'] == {
+        'status': 'available',
+        'models': ['mistral-model'],
+        'default_model': 'mistral-model'
+    }
+    assert providers['openai']['status'] == 'unavailable'
+    assert providers['anthropic']['status'] == 'unavailable'
+
+def test_list_models_shares_lookups_of_hung_provider(client):
+    """Test that repeated requests wait on the hung provider's lookup in flight instead of adding threads."""
+    release = threading.Event()
+    calls = []
+
+    def fake_models(provider):
+        calls.append(provider)
+        if provider == 'openai':
+            release.wait(5)
+        return [f'{provider}-model']
+
+    with patch('app.Config.get_available_models', side_effect=fake_models), \
+         patch('app.Config.get_default_model', side_effect=lambda p: f'{p}-model'), \
+         patch('app.Config.MODELS_PROVIDER_TIMEOUT', 0.1):
+        for _ in range(5):
+            providers = json.loads(client.get('/api/v1/models').data)['providers']
+            assert providers['openai']['status'] == 'unavailable'
+            assert providers['mistral']['status'] == 'available'
+        release.set()
+
+    assert calls.count('openai') == 1
+    assert calls.count('mistral') == 5
+
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._complete')
+def test_optimize_resume_cache_headers(mock_complete, mock_fetch, client, sample_resume):
+    """Test that repeated requests report cache hits and can bypass the cache."""
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_complete.return_value = "Optimized resume content"
+
+    first = client.post('/api/v1/optimize', json={'resume_content': sample_resume})
+    second = client.post('/api/v1/optimize', json={'resume_content': sample_resume})
+    bypass = client.post('/api/v1/optimize', json={'resume_content': sample_resume, 'cache': False})
+
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert bypass.headers['X-Cache'] == 'BYPASS'
+    assert json.loads(second.data)['optimized_content'] == "Optimized resume content"
+    assert mock_complete.call_count == 2
+
+    stats = json.loads(client.get('/api/v1/cache/stats').data)
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._complete')
+def test_optimize_resume_incremental(mock_complete, mock_fetch, client):
+    """Test that incremental requests only send the sections that changed."""
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_complete.side_effect = lambda prompt, usage: "Optimized section"
+    resume = "Jane Doe\n\nSummary:\nEngineer.\n\nExperience:\nAcme\n- Built pipelines\n\nSkills:\nPython"
+
+    first = client.post('/api/v1/optimize', json={'resume_content': resume, 'incremental': True})
+    assert first.status_code == 200
+    data = json.loads(first.data)
+    assert data['optimized_content'].startswith("Jane Doe\n\nSummary:\nOptimized section\n\nExperience:")
+    assert data['sections']['sent'] == 3
+    assert first.headers['X-Cache'] == 'MISS'
+
+    edited = resume.replace("Python", "Python, Go")
+    second = client.post('/api/v1/optimize', json={'resume_content': edited, 'incremental': True})
+    assert json.loads(second.data)['sections'] == {"total": 7, "optimized": 3, "sent": 1, "reused": 2, "unchanged": 4}
+    assert mock_complete.call_count == 4
+    assert 'sections' not in json.loads(client.post('/api/v1/optimize', json={'resume_content': resume}).data)
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._stream')
+def test_optimize_resume_stream(mock_stream, mock_fetch, client, sample_resume):
+    """Test the streaming endpoint emits token events and a final summary as SSE and NDJSON."""
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_stream.side_effect = lambda prompt, usage: iter(["Optimized ", "resume"])
+
+    response = client.post('/api/v1/optimize/stream', json={'resume_content': sample_resume})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert body.startswith('event: token\ndata: {"text":"Optimized "}\n\n')
+    assert 'event: done' in body
+
+    response = client.post('/api/v1/optimize/stream?format=ndjson',
+                           json={'resume_content': sample_resume, 'cache': False})
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [e['event'] for e in events] == ['token', 'token', 'done']
+    assert events[-1]['cache'] == 'bypass'
+
+@patch('app.Config', TestConfig)
+def test_optimize_resume_stream_missing_content(client):
+    """Test the streaming endpoint validates the request before streaming."""
+    response = client.post('/api/v1/optimize/stream', json={})
+    assert response.status_code == 400
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._complete')
+def test_optimize_batch(mock_complete, mock_fetch, client, sample_resume):
+    """Test batch optimization of one resume against several job descriptions."""
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_complete.side_effect = lambda prompt, usage: "Optimized for job 2" if "Job 2" in prompt else "Optimized"
+
+    response = client.post('/api/v1/optimize/batch', json={
+        'resume_content': sample_resume,
+        'items': [
+            {'job_description': 'Job 1'},
+            {'job_description': 'Job 2'},
+            {'resume_content': ''}
+        ]
+    })
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [r['index'] for r in data['results']] == [0, 1, 2]
+    assert data['results'][1]['optimized_content'] == "Optimized for job 2"
+    assert data['results'][2]['status'] == 'error'
+
+    response = client.post('/api/v1/optimize/batch?stream=1', json={
+        'resume_content': sample_resume,
+        'items': [{'job_description': 'Job 1'}, {'job_description': 'Job 3'}]
+    })
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(r['index'] for r in results) == [0, 1]
+    assert {r['index']: r['cache'] for r in results}[0] == 'hit'
+
+@patch('app.Config', TestConfig)
+def test_optimize_batch_requires_items(client):
+    """Test batch validation errors."""
+    response = client.post('/api/v1/optimize/batch', json={'items': []})
+    assert response.status_code == 400
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._stream')
+def test_jobs_submit_and_poll(mock_stream, mock_fetch, client, sample_resume, tmp_path):
+    """Test submitting a job, polling it to completion and cancelling a finished job."""
+    from jobs import JobQueue
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_stream.side_effect = lambda prompt, usage: iter(["Optimized resume"])
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1)
+
+    with patch('app.job_queue', queue):
+        response = client.post('/api/v1/jobs', json={'resume_content': sample_resume, 'priority': 3})
+        assert response.status_code == 202
+        job_id = json.loads(response.data)['job_id']
+        assert response.headers['Location'] == f'/api/v1/jobs/{job_id}'
+
+        for _ in range(500):
+            data = json.loads(client.get(f'/api/v1/jobs/{job_id}').data)
+            if data['status'] == 'succeeded':
+                break
+            time.sleep(0.01)
+
+        assert data['optimized_content'] == "Optimized resume"
+        assert data['priority'] == 3
+        assert client.delete(f'/api/v1/jobs/{job_id}').status_code == 409
+        assert client.get('/api/v1/jobs/unknown').status_code == 404
+    queue.stop(timeout=5)
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._complete')
+def test_optimize_resume_compaction(mock_complete, mock_fetch, client, sample_resume, monkeypatch):
+    """Test that inputs are compacted, savings are reported and the token budget is enforced."""
+    from config import Config
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_complete.return_value = "Optimized resume content"
+
+    response = client.post('/api/v1/optimize', json={'resume_content': sample_resume})
+    assert response.status_code == 200
+    compaction = json.loads(response.data)['compaction']
+    assert compaction['tokens_saved'] > 0
+    assert sample_resume.strip().split('\n')[0] in mock_complete.call_args[0][0]
+
+    skipped = client.post('/api/v1/optimize', json={'resume_content': sample_resume, 'compact': False})
+    assert json.loads(skipped.data)['compaction'] is None
+
+    monkeypatch.setattr(Config, 'INPUT_TOKEN_BUDGET', 10)
+    response = client.post('/api/v1/optimize', json={'resume_content': sample_resume})
+    assert response.status_code == 400
+    assert 'allows 10' in json.loads(response.data)['error']
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider.optimize_resume')
+def test_provider_health(mock_optimize, client, sample_resume):
+    """Test that optimize calls feed the routing health statistics."""
+    mock_optimize.return_value = "Optimized resume content"
+    client.post('/api/v1/optimize', json={'resume_content': sample_resume})
+
+    providers = json.loads(client.get('/api/v1/providers/health').data)['providers']
+    assert providers['mistral']['samples'] == 1
+    assert providers['mistral']['error_rate'] == 0.0
+    assert providers['mistral']['healthy'] is True
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._complete')
+def test_optimize_resume_rate_limited(mock_complete, mock_fetch, client, sample_resume):
+    """Test that provider rate limiting is reported as 429 with Retry-After."""
+    from rate_limits import RateLimitedError
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_complete.side_effect = RateLimitedError("mistral rate limit exceeded", retry_after=2.5)
+
+    response = client.post('/api/v1/optimize', json={'resume_content': sample_resume})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '3'
+    assert 'rate limit' in json.loads(response.data)['error']
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._complete')
+def test_metrics_and_server_timing(mock_complete, mock_fetch, client, sample_resume):
+    """Test per-stage Server-Timing headers and the Prometheus metrics endpoint."""
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_complete.return_value = "Optimized resume content"
+
+    response = client.post('/api/v1/optimize', json={'resume_content': sample_resume})
+    stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+    assert stages[0] == 'models'
+    assert {'compact', 'prompt', 'cache', 'provider', 'serialize'} <= set(stages)
+    assert stages[-1] == 'total'
+
+    # Rejected providers and models add no series
+    for body in ({'ai_provider': 'bogus-provider'}, {'model': 'bogus-model'}):
+        response = client.post('/api/v1/optimize', json=dict(body, resume_content=sample_resume))
+        assert response.status_code == 400
+
+    response = client.get('/api/v1/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.data.decode()
+    assert 'bogus' not in body
+    assert ('resume_optimizer_stage_duration_seconds_count'
+            '{model="mistral-large-latest",provider="mistral",stage="models"} 1') in body
+    assert ('resume_optimizer_stage_duration_seconds_count'
+            '{model="mistral-large-latest",provider="mistral",stage="provider"} 1') in body
+    assert ('resume_optimizer_completions_total'
+            '{cache="miss",model="mistral-large-latest",provider="mistral"} 1') in body
+    assert ('resume_optimizer_request_duration_seconds_count'
+            '{endpoint="/api/v1/optimize",method="POST",status="200"} 1') in body
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._complete')
+def test_optimize_resume_file(mock_complete, mock_fetch, client, sample_resume):
+    """Test optimizing an uploaded resume file, the extraction cache and the upload size limit."""
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_complete.return_value = "Optimized resume content"
+
+    def upload(content, filename='resume.txt', **fields):
+        return client.post('/api/v1/optimize/file', content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(content), filename), **fields})
+
+    response = upload(sample_resume.encode(), job_description='Python developer', cache='false')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['optimized_content'] == "Optimized resume content"
+    assert data['extraction']['type'] == 'text'
+    assert data['extraction']['cached'] is False
+    assert 'John Doe' in mock_complete.call_args[0][0]
+    assert 'Python developer' in mock_complete.call_args[0][0]
+
+    assert json.loads(upload(sample_resume.encode()).data)['extraction']['cached'] is True
+
+    response = client.post('/api/v1/optimize/file', content_type='multipart/form-data', data={})
+    assert response.status_code == 400
+    assert upload(b'%PDF-1.4 broken', 'resume.pdf').status_code == 400
+    assert upload(b'x' * (TestConfig.MAX_UPLOAD_BYTES + 1)).status_code == 413
+
+@patch('app.Config', TestConfig)
+def test_score_matches(client, sample_resume):
+    """Test ranking job descriptions for resumes without a provider call, and request validation."""
+    jobs = ["Frontend developer: React, TypeScript and CSS", "Python developer with Flask and SQL experience"]
+    response = client.post('/api/v1/score', json={
+        'resumes': ["Backend engineer writing Python services with Flask and PostgreSQL (SQL)"],
+        'job_descriptions': jobs,
+        'top_k': 1,
+        'keywords': 3
+    })
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['method'] == 'bm25'
+    assert data['pairs'] == 2
+    match, = data['results'][0]['matches']
+    assert match['job'] == 1
+    assert 0 < match['score'] <= 1
+    assert set(match['matched']) <= {'python', 'flask', 'sql', 'developer', 'experience'}
+
+    response = client.post('/api/v1/score', json={'resume_content': sample_resume, 'job_description': jobs[0],
+                                                  'method': 'tfidf'})
+    assert response.status_code == 200
+    assert json.loads(response.data)['results'][0]['matches'][0]['job'] == 0
+
+    for body in ({'job_descriptions': jobs},
+                 {'resumes': [sample_resume], 'job_descriptions': []},
+                 {'resumes': [sample_resume, 42], 'job_descriptions': jobs},
+                 {'resumes': [sample_resume], 'job_descriptions': jobs, 'method': 'cosine'},
+                 {'resumes': [sample_resume], 'job_descriptions': jobs, 'top_k': 0},
+                 {'resumes': [sample_resume], 'job_descriptions': jobs * (TestConfig.SCORE_MAX_DOCUMENTS // 2 + 1)}):
+        assert client.post('/api/v1/score', json=body).status_code == 400
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._complete')
+def test_optimize_resume_near_duplicates(mock_complete, mock_fetch, client, sample_resume, tmp_path, monkeypatch):
+    """Test that a reposted job description reuses the canonical posting's cached optimization."""
+    from near_duplicates import NearDuplicateIndex
+    index = NearDuplicateIndex(str(tmp_path / "near_duplicates.sqlite3"))
+    monkeypatch.setattr(app, 'near_duplicate_index', index)
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_complete.return_value = "Optimized resume content"
+    job_description = ("Senior Python Engineer at Acme. You will design data pipelines, review code and "
+                       "mentor engineers. Requirements: Python, SQL, Airflow and five years of experience "
+                       "building distributed systems in production. Posted 2025-01-10, job ID 48213.")
+    repost = job_description.replace("2025-01-10, job ID 48213", "2025-02-02, job ID 51877")
+
+    def optimize(description, mode):
+        return client.post('/api/v1/optimize', json={'resume_content': sample_resume, 'job_description': description,
+                                                     'near_duplicates': mode, 'compact': False})
+
+    first = optimize(job_description, 'reuse')
+    assert json.loads(first.data)['near_duplicate']['duplicate'] is False
+
+    flagged = optimize(repost, 'flag')
+    report = json.loads(flagged.data)['near_duplicate']
+    assert report['duplicate'] is True
+    assert report['reused'] is False
+    assert flagged.headers['X-Cache'] == 'MISS'
+
+    reused = optimize(repost, 'reuse')
+    assert json.loads(reused.data)['near_duplicate'] == {**report, 'reused': True}
+    assert reused.headers['X-Cache'] == 'HIT'
+    assert mock_complete.call_count == 2
+
+    assert 'near_duplicate' not in json.loads(optimize(repost, 'off').data)
+    assert optimize(repost, 'always').status_code == 400
+    index.close()
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._complete')
+def test_optimize_resume_diff(mock_complete, mock_fetch, client, sample_resume):
+    """Test that optimizations can return a diff against the original, cached with the result."""
+    from resume_diff import apply_diff
+    mock_fetch.return_value = ['mistral-large-latest']
+    optimized = sample_resume.replace("Developed web applications", "Built web services")
+    mock_complete.return_value = optimized
+
+    first = json.loads(client.post('/api/v1/optimize', json={'resume_content': sample_resume, 'diff': 'word'}).data)
+    assert first['diff']['granularity'] == 'word'
+    assert first['diff']['cached'] is False
+    assert apply_diff(sample_resume, first['diff']) == optimized
+
+    second = client.post('/api/v1/optimize', json={'resume_content': sample_resume, 'diff': True})
+    assert second.headers['X-Cache'] == 'HIT'
+    assert json.loads(second.data)['diff'] == {**first['diff'], 'cached': True}
+
+    assert 'diff' not in json.loads(client.post('/api/v1/optimize', json={'resume_content': sample_resume}).data)
+    assert client.post('/api/v1/optimize', json={'resume_content': sample_resume, 'diff': 'chars'}).status_code == 400
+
+def test_diff_endpoint(client):
+    """Test the standalone diff endpoint, its NDJSON stream and validation."""
+    body = {'original_content': "Led team of 3\nPython\n", 'optimized_content': "Led a team of 3\nPython, SQL\n"}
+    response = client.post('/api/v1/diff', json={**body, 'granularity': 'line'})
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'MISS'
+    data = json.loads(response.data)
+    assert data['stats'] == {'unchanged': 0, 'deleted': 2, 'inserted': 2}
+
+    response = client.post('/api/v1/diff?stream=1', json=body)
+    assert response.headers['X-Cache'] == 'MISS'
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert lines[-1] == {'granularity': 'word', 'stats': {'unchanged': 5, 'deleted': 0, 'inserted': 3}}
+    assert [line['op'] for line in lines[:-1]] == ['equal', 'insert', 'equal', 'insert', 'equal']
+    assert client.post('/api/v1/diff', json=body).headers['X-Cache'] == 'HIT'
+
+    assert client.post('/api/v1/diff', json={'original_content': "text"}).status_code == 400
+    assert client.post('/api/v1/diff', json={**body, 'granularity': 'chars'}).status_code == 400
+
+@patch('app.Config', TestConfig)
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._complete')
+def test_compressed_requests_and_responses(mock_complete, mock_fetch, client, sample_resume):
+    """Test gzip request bodies, negotiated response compression and its size threshold."""
+    import gzip
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_complete.return_value = "Optimized resume content. " * 100
+    body = gzip.compress(json.dumps({'resume_content': sample_resume}).encode())
+
+    response = client.post('/api/v1/optimize', data=body, content_type='application/json',
+                           headers={'Content-Encoding': 'gzip', 'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) == len(response.data) < 1024
+    assert json.loads(gzip.decompress(response.data))['optimized_content'] == mock_complete.return_value
+
+    # Small responses and clients that do not accept gzip get plain JSON
+    assert 'Content-Encoding' not in client.get('/api/v1/health', headers={'Accept-Encoding': 'gzip'}).headers
+    plain = client.post('/api/v1/optimize', json={'resume_content': sample_resume})
+    assert 'Content-Encoding' not in plain.headers
+    assert json.loads(plain.data)['optimized_content'] == mock_complete.return_value
+
+    response = client.post('/api/v1/optimize', data=body, content_type='application/json',
+                           headers={'Content-Encoding': 'compress'})
+    assert response.status_code == 415
+
+    # A small body that decompresses beyond the limit
+    from compression import RequestDecompressionMiddleware
+    bomb = gzip.compress(b' ' * (2 * 1024 * 1024))
+    with patch.object(app.app, 'wsgi_app', RequestDecompressionMiddleware(app.app.wsgi_app.app, 1024 * 1024)):
+        response = client.post('/api/v1/optimize', data=bomb, content_type='application/json',
+                               headers={'Content-Encoding': 'gzip'})
+    assert response.status_code == 413
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import patch, AsyncMock
+from asgi import AsyncOptimizerApp
+from app import app as flask_app
+
+def call_asgi(asgi_app, method, path, body=None, headers=None):
+    """Run a single HTTP request through an ASGI app and collect the response."""
+    body = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 1234),
+        "http_version": "1.1",
+        "headers": [(b"content-type", b"application/json")] + (headers or [])
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    response_body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return start["status"], dict(start["headers"]), json.loads(response_body)
+
+@pytest.fixture
+def asgi_app():
+    return AsyncOptimizerApp(flask_app, max_concurrency=2)
+
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._acomplete', new_callable=AsyncMock)
+def test_async_optimize(mock_acomplete, mock_fetch, asgi_app, sample_resume):
+    """Test the async optimize endpoint and its response cache headers."""
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_acomplete.return_value = "Optimized resume content"
+
+    status, headers, data = call_asgi(asgi_app, "POST", "/api/v1/optimize", {'resume_content': sample_resume})
+    assert status == 200
+    assert data.pop("compaction")["tokens_saved"] > 0
+    assert data == {
+        "status": "success",
+        "optimized_content": "Optimized resume content",
+        "provider": "mistral",
+        "model": "mistral-large-latest",
+        "usage": {
+            "input_tokens": None,
+            "cached_input_tokens": None,
+            "uncached_input_tokens": None,
+            "output_tokens": None
+        }
+    }
+    assert headers[b"x-cache"] == b"MISS"
+    assert b"provider;dur=" in headers[b"server-timing"]
+
+    _, headers, data = call_asgi(asgi_app, "POST", "/api/v1/optimize", {'resume_content': sample_resume, 'diff': 'line'})
+    assert headers[b"x-cache"] == b"HIT"
+    assert data["diff"]["ops"][-1] == {"op": "insert", "text": "Optimized resume content"}
+    mock_acomplete.assert_awaited_once()
+
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._acomplete', new_callable=AsyncMock)
+def test_async_optimize_compression(mock_acomplete, mock_fetch, asgi_app, sample_resume):
+    """Test gzip request bodies and negotiated response compression."""
+    import gzip
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_acomplete.return_value = "Optimized resume content. " * 100
+    body = gzip.compress(json.dumps({'resume_content': sample_resume}).encode())
+    scope = {"type": "http", "method": "POST", "path": "/api/v1/optimize",
+             "headers": [(b"content-encoding", b"gzip"), (b"accept-encoding", b"gzip, br;q=0")]}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+    headers = dict(sent[0]["headers"])
+    assert sent[0]["status"] == 200
+    assert headers[b"content-encoding"] == b"gzip"
+    assert json.loads(gzip.decompress(sent[1]["body"]))["optimized_content"] == mock_acomplete.return_value
+
+def test_async_optimize_missing_content(asgi_app):
+    """Test that validation errors match the Flask endpoint."""
+    status, _, data = call_asgi(asgi_app, "POST", "/api/v1/optimize", {})
+    assert status == 400
+    assert 'Resume content is required' in data['error']
+
+def test_async_optimize_body_limit(sample_resume):
+    """Test that bodies over the limit are rejected with 413, with or without a Content-Length."""
+    asgi_app = AsyncOptimizerApp(flask_app, max_body_bytes=1024)
+    status, _, data = call_asgi(asgi_app, "POST", "/api/v1/optimize", {"resume_content": "x" * 2000})
+    assert status == 413
+    assert '1024 bytes' in data['error']
+
+    status, _, _ = call_asgi(asgi_app, "POST", "/api/v1/optimize", {"resume_content": "x"},
+                             headers=[(b"content-length", b"4096")])
+    assert status == 413
+
+def test_async_concurrency_cap(sample_resume):
+    """Test that the semaphore caps in-flight provider calls."""
+    asgi_app = AsyncOptimizerApp(flask_app, max_concurrency=2)
+    active = 0
+    peak = 0
+
+    async def slow_complete(prompt, usage):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return "Optimized"
+
+    async def run_many():
+        async def one(i):
+            scope = {"type": "http", "method": "POST", "path": "/api/v1/optimize", "headers": []}
+            body = json.dumps({'resume_content': f"{sample_resume} {i}"}).encode()
+            sent = []
+
+            async def receive():
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            async def send(message):
+                sent.append(message)
+
+            await asgi_app(scope, receive, send)
+            return sent[0]["status"]
+        return await asyncio.gather(*(one(i) for i in range(6)))
+
+    with patch('ai_utils.AIProvider._fetch_available_models', return_value=['mistral-large-latest']), \
+         patch('ai_utils.AIProvider._acomplete', side_effect=slow_complete):
+        statuses = asyncio.run(run_many())
+
+    assert statuses == [200] * 6
+    assert peak == 2
+
+def test_asgi_delegates_to_flask(asgi_app):
+    """Test that other routes are served by the Flask app."""
+    status, _, data = call_asgi(asgi_app, "GET", "/api/v1/health")
+    assert status == 200
+    assert data['status'] == 'healthy'
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import pytest
+import openai
+from config import Config
+from ai_utils import AIProvider, last_completion
+from benchmarks.fake_provider import FakeProviderSettings, create_server, base_urls
+from benchmarks.load_test import fixture_strings, load_payloads, percentile, summarize, compare
+from benchmarks import wire_size
+
+@pytest.fixture
+def fake_provider(monkeypatch):
+    """Point the real provider SDKs at a local fake provider."""
+    server = create_server("127.0.0.1", 0, FakeProviderSettings(first_token_latency=0.0, tokens_per_second=0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    for name, value in base_urls(server).items():
+        monkeypatch.setattr(Config, name, value)
+    for name in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "MISTRAL_API_KEY"):
+        monkeypatch.setattr(Config, name, "test-key")
+    monkeypatch.setattr(openai, "base_url", None)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.mark.parametrize("provider", ["openai", "anthropic", "mistral"])
+def test_fake_provider_with_real_clients(fake_provider, provider):
+    """Test sync, streaming and async optimizations through each SDK against the fake provider."""
+    optimizer = AIProvider(provider)
+
+    content = optimizer.optimize_resume("Jane Doe, Data Engineer", use_cache=False)
+    assert "Jane Doe, Data Engineer" in content
+    assert last_completion.get().usage["output_tokens"] > 0
+
+    events = list(optimizer.stream_optimize("Jim Roe, Designer", use_cache=False))
+    assert "Jim Roe, Designer" in "".join(event["text"] for event in events if event["event"] == "token")
+    assert events[-1]["event"] == "done"
+
+    content = asyncio.run(optimizer.aoptimize_resume("Ann Lee, Nurse", use_cache=False))
+    assert "Ann Lee, Nurse" in content
+    assert fake_provider.RequestHandlerClass.settings.stats()["requests"] == 3
+
+def test_fake_provider_rate_limit():
+    """Test that requests beyond the configured rate are answered with 429 and a Retry-After."""
+    settings = FakeProviderSettings(rate_limit=1.0)
+    assert settings.admit() == (None, None)
+    status, wait = settings.admit()
+    assert status == 429
+    assert 0 < wait <= 1.0
+    assert settings.stats() == {"requests": 2, "rate_limited": 1, "errors": 0}
+
+def test_load_test_payloads():
+    """Test that payloads replay the conftest resumes with the inputs/ files."""
+    assert "John Doe" in fixture_strings()["sample_resume"]
+    payloads = load_payloads(model="mistral-small-latest")
+    assert any(payload.get("job_description") for payload in payloads)
+    assert all(payload["model"] == "mistral-small-latest" for payload in payloads)
+
+def test_load_test_summary_and_compare():
+    """Test percentiles, the run summary and the comparison against a baseline."""
+    assert percentile([], 50) is None
+    assert percentile([0.3, 0.1, 0.2, 0.4], 50) == 0.2
+    assert percentile([0.3, 0.1, 0.2, 0.4], 99) == 0.4
+
+    summary = summarize([(0.1, 0.05, True), (0.2, 0.1, True), (1.0, None, False)], elapsed=2.0)
+    assert summary["requests"] == 3
+    assert summary["errors"] == 1
+    assert summary["rps"] == 1.0
+    assert summary["latency_ms"]["p50"] == 100.0
+
+    baseline = {"scenarios": {"optimize": {**summary, "rps": 0.5}}}
+    lines = compare({"scenarios": {"optimize": summary}}, baseline)
+    assert any("rps" in line and "+100.0%" in line for line in lines)
+
+def test_wire_size_measure_and_compare():
+    """Test that bodies are measured per content coding and JSON provider, and compared to a baseline."""
+    bodies = wire_size.build_bodies()
+    assert len(bodies["batch"]["results"]) == wire_size.BATCH_SIZE
+    assert bodies["optimize_diff"]["diff"]["ops"]
+
+    stats = wire_size.measure(bodies["batch"], repeat=1)
+    assert stats["bytes"]["gzip"] < stats["bytes"]["identity"]
+    assert set(stats["serialize_us"]) >= {"default"}
+
+    baseline = {"bodies": {"batch": {**stats, "bytes": {"gzip": stats["bytes"]["gzip"] * 2}}}}
+    lines = wire_size.compare({"bodies": {"batch": stats}}, baseline)
+    assert any("bytes.gzip" in line and "-50.0%" in line for line in lines)
@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+import pytest
+from pathlib import Path
+from bulk import expand_paths, cross_product, read_mapping, run_bulk, collect_pairs, CHECKPOINT_FILE
+
+@pytest.fixture
+def inputs(tmp_path):
+    resumes = tmp_path / 'resumes'
+    jobs = tmp_path / 'jobs'
+    resumes.mkdir()
+    jobs.mkdir()
+    for name in ('alice', 'bob', 'carol'):
+        (resumes / f'{name}.txt').write_text(f'{name} resume')
+    (resumes / 'notes.csv').write_text('ignored')
+    for name in ('backend', 'data'):
+        (jobs / f'{name}.txt').write_text(f'{name} job')
+    return tmp_path
+
+def load_resume(path):
+    return Path(path).read_text()
+
+def test_collect_pairs(inputs):
+    """Test directories, globs and the cross product of resumes and job descriptions."""
+    resumes = expand_paths([str(inputs / 'resumes')], {'.txt'})
+    assert [path.name for path in resumes] == ['alice.txt', 'bob.txt', 'carol.txt']
+    assert expand_paths([str(inputs / 'resumes' / 'a*.txt')], {'.txt'}) == [inputs / 'resumes' / 'alice.txt']
+    with pytest.raises(ValueError):
+        expand_paths([str(inputs / 'missing-*.txt')], {'.txt'})
+
+    pairs = collect_pairs([str(inputs / 'resumes')], [str(inputs / 'jobs' / '*.txt')], None)
+    assert len(pairs) == 6
+    assert len({pair.name for pair in pairs}) == 6
+    assert [pair.job_description for pair in cross_product(resumes, [])] == [None] * 3
+
+def test_read_mapping(inputs):
+    """Test CSV and JSON mapping files with paths relative to the mapping file."""
+    (inputs / 'pairs.csv').write_text('resume,job_description\nresumes/alice.txt,jobs/data.txt\nresumes/bob.txt,\n')
+    pairs = read_mapping(str(inputs / 'pairs.csv'))
+    assert pairs[0].resume == inputs / 'resumes' / 'alice.txt'
+    assert pairs[0].job_description == inputs / 'jobs' / 'data.txt'
+    assert pairs[1].job_description is None
+
+    (inputs / 'pairs.json').write_text(json.dumps([{'resume': 'resumes/carol.txt', 'job_description': 'jobs/backend.txt'}]))
+    assert read_mapping(str(inputs / 'pairs.json'))[0].resume == inputs / 'resumes' / 'carol.txt'
+
+def test_run_bulk_writes_results_and_resumes(inputs):
+    """Test that results are written per pair and a rerun only retries what did not succeed."""
+    pairs = collect_pairs([str(inputs / 'resumes' / '*.txt')], [str(inputs / 'jobs')], None)
+    calls = []
+
+    def flaky(resume_content, job_description):
+        calls.append((resume_content, job_description))
+        if resume_content.startswith('bob') and job_description.startswith('data'):
+            raise RuntimeError('provider unavailable')
+        return f'{resume_content} for {job_description}'
+
+    output = inputs / 'out'
+    summary = run_bulk(pairs, str(output), flaky, load_resume, concurrency=3)
+    assert summary['succeeded'] == 5
+    assert summary['failed'] == 1
+    assert summary['pairs_per_second'] > 0
+    assert (output / f'{pairs[0].name}.txt').read_text() == 'alice resume for backend job'
+    entries = [json.loads(line) for line in (output / CHECKPOINT_FILE).read_text().splitlines()]
+    assert len(entries) == 6
+
+    calls.clear()
+    summary = run_bulk(pairs, str(output), lambda r, j: f'{r} for {j}', load_resume, concurrency=3)
+    assert summary['skipped'] == 5
+    assert summary['succeeded'] == 1
+    assert not list(output.glob('*.part'))
+
+    # Changed settings or inputs invalidate the checkpoint
+    (inputs / 'resumes' / 'alice.txt').write_text('alice resume, updated')
+    summary = run_bulk(pairs, str(output), lambda r, j: r, load_resume, concurrency=3)
+    assert summary['succeeded'] == 2
+    summary = run_bulk(pairs, str(output), lambda r, j: r, load_resume, settings={'model': 'other'})
+    assert summary['succeeded'] == 6
+
+def test_run_bulk_bounds_concurrency(inputs):
+    """Test that no more than `concurrency` optimizations run at once."""
+    pairs = collect_pairs([str(inputs / 'resumes')], [str(inputs / 'jobs')], None)
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def slow(resume_content, job_description):
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.pop()
+        return resume_content
+
+    summary = run_bulk(pairs, str(inputs / 'out'), slow, load_resume, concurrency=2)
+    assert summary['succeeded'] == 6
+    assert max(peak) <= 2
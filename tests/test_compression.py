@@ -0,0 +1,49 @@
+import gzip
+import io
+import pytest
+from unittest.mock import patch
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from compression import CODECS, negotiate, compress_body, decompress, decompressing_stream
+
+PAYLOAD = b'{"optimized_content": "' + b"Led a team of five engineers. " * 200 + b'"}'
+
+def test_negotiate():
+    """Test that the preferred available encoding the client accepts is chosen."""
+    with patch('compression.Config.RESPONSE_COMPRESSION', ['zstd', 'br', 'gzip']), \
+         patch.dict(CODECS['zstd'].__dict__, {'_available': False}), \
+         patch.dict(CODECS['br'].__dict__, {'_available': False}):
+        assert negotiate("gzip, deflate, br") == 'gzip'
+        assert negotiate("*") == 'gzip'
+        assert negotiate("gzip;q=0, *") is None
+        assert negotiate("identity") is None
+        assert negotiate(None) is None
+    with patch('compression.Config.RESPONSE_COMPRESSION', []):
+        assert negotiate("gzip") is None
+
+def test_compress_body_threshold():
+    """Test that only bodies above the size threshold are compressed."""
+    body, encoding = compress_body(PAYLOAD, "gzip")
+    assert encoding == 'gzip'
+    assert gzip.decompress(body) == PAYLOAD
+    assert len(body) < len(PAYLOAD) / 10
+    assert compress_body(b'{"status": "healthy"}', "gzip") == (b'{"status": "healthy"}', None)
+
+@pytest.mark.parametrize("name", ["gzip", "br", "zstd"])
+def test_codec_round_trip(name):
+    """Test that each installed codec decodes what it encodes, through a streaming reader."""
+    codec = CODECS[name]
+    if not codec.available():
+        pytest.skip(f"{name} is not installed")
+    assert decompress(codec.compress(PAYLOAD), name) == PAYLOAD
+    assert decompressing_stream(io.BytesIO(codec.compress(PAYLOAD)), name).read(10) == PAYLOAD[:10]
+
+def test_decompress_limits_and_errors():
+    """Test that decompressed bodies are capped and unknown encodings are rejected."""
+    bomb = gzip.compress(b"\0" * (1024 * 1024))
+    assert len(bomb) < 2048
+    with pytest.raises(RequestEntityTooLarge):
+        decompress(bomb, "gzip", max_bytes=64 * 1024)
+    with pytest.raises(UnsupportedMediaType):
+        decompress(b"data", "compress")
+    assert decompress(PAYLOAD, "identity") == PAYLOAD
+    assert decompress(gzip.compress(gzip.compress(PAYLOAD)), "gzip, gzip") == PAYLOAD
@@ -9,6 +9,12 @@ class TestConfig:
     TESTING = True
     MAX_INPUT_LENGTH = 5000
     DEFAULT_AI_PROVIDER = 'mistral'
+    BATCH_MAX_ITEMS = 10
+    BATCH_MAX_CONCURRENCY = 2
+    MAX_UPLOAD_BYTES = 64 * 1024
+    INCREMENTAL_OPTIMIZATION = False
+    SCORE_MAX_DOCUMENTS = 20
+    NEAR_DUPLICATE_MODE = 'off'
     
     # Mock API keys and settings for testing
     MISTRAL_API_KEY = os.getenv('MISTRAL_API_KEY', 'test-mistral-key')
@@ -0,0 +1,74 @@
+import argparse
+import sys
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+import demo
+
+ROOT = Path(__file__).parent.parent
+
+@patch('ai_utils.AIProvider._fetch_available_models')
+@patch('ai_utils.AIProvider._complete')
+def test_run_in_process(mock_complete, mock_fetch, tmp_path, monkeypatch, capsys):
+    """Test the in-process demo path: no servers, the PDF is extracted locally."""
+    mock_fetch.return_value = ['mistral-large-latest']
+    mock_complete.return_value = "Optimized resume content"
+    monkeypatch.setattr(demo, 'OUTPUT_DIR', tmp_path)
+
+    args = argparse.Namespace(
+        resume=str(ROOT / 'inputs' / 'sample.pdf'),
+        guidelines=str(ROOT / 'inputs' / 'RESUME_GUIDELINES.md'),
+        job_description=str(ROOT / 'inputs' / 'job_description.txt'),
+        custom_prompt=None, model=None, debug=False, base_prompt=None
+    )
+    with patch('demo.subprocess.Popen') as popen:
+        demo.run_in_process(args)
+    popen.assert_not_called()
+
+    prompt = mock_complete.call_args[0][0]
+    assert 'ALEXANDER MITCHELL' in prompt
+    outputs = list(tmp_path.iterdir())
+    assert outputs[0].read_text() == "Optimized resume content"
+    assert "Optimized resume content" in capsys.readouterr().out
+
+def test_start_server_waits_for_ready_line():
+    """Test that a server is ready once it logs its address, and that a crashed one is reported."""
+    ready = demo.start_server([sys.executable, '-c',
+                               'import sys, time; print(" * Running on http://127.0.0.1:5000", file=sys.stderr, '
+                               'flush=True); time.sleep(30)'])
+    assert ready is not None
+    ready.terminate()
+    ready.wait()
+
+    assert demo.start_server([sys.executable, '-c', 'raise SystemExit(1)']) is None
+
+def test_run_bulk_uses_provider_default_model(tmp_path, capsys):
+    """Test that bulk runs without --model leave the model to the provider's default."""
+    resume = tmp_path / "resume.txt"
+    resume.write_text("Jane Doe, Data Engineer")
+    job_description = tmp_path / "job.txt"
+    job_description.write_text("Data engineer with Python")
+    args = argparse.Namespace(
+        resumes=None, resume=str(resume), job_descriptions=[str(job_description)], job_description=None,
+        pairs=None, guidelines=None, custom_prompt=None, model=None, provider="openai",
+        output_dir=str(tmp_path / "out"), concurrency=1
+    )
+    client = demo.load_app().test_client()
+    with patch('demo.load_app') as load_app:
+        load_app.return_value.test_client.return_value = client
+        with patch.object(client, 'post', wraps=client.post) as post, \
+                patch('ai_utils.AIProvider._fetch_available_models', return_value=['gpt-4']), \
+                patch('ai_utils.AIProvider._complete', return_value="Optimized"):
+            demo.run_bulk(args)
+
+    payload = post.call_args.kwargs["json"]
+    assert payload["ai_provider"] == "openai"
+    assert "model" not in payload
+    assert "job.txt: ok" in capsys.readouterr().out
+
+def test_bulk_requires_resumes(monkeypatch):
+    """Test that --job-descriptions without a resume source is a usage error."""
+    monkeypatch.setattr(sys, 'argv', ['demo.py', '--job-descriptions', 'inputs/job_description.txt'])
+    with pytest.raises(SystemExit) as error:
+        demo.main()
+    assert error.value.code == 2
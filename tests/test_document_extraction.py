@@ -0,0 +1,89 @@
+import io
+import zipfile
+import pytest
+from document_extraction import DocumentExtractor, detect_type
+
+DOCUMENT_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    '<w:p><w:r><w:t>Jane Doe</w:t></w:r></w:p>'
+    '<w:p><w:r><w:t>Skills:</w:t><w:tab/><w:t xml:space="preserve">Python, </w:t></w:r><w:r><w:t>SQL</w:t></w:r></w:p>'
+    '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>Acme Corp</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+    '</w:body></w:document>'
+)
+
+def make_docx(document_xml=DOCUMENT_XML):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('word/document.xml', document_xml)
+    return buffer.getvalue()
+
+def make_pdf(pages):
+    """A PDF repeating the sample resume page `pages` times."""
+    pypdf = pytest.importorskip('pypdf')
+    reader = pypdf.PdfReader('inputs/sample.pdf')
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_page(reader.pages[0])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+def test_detect_type():
+    """Test that documents are identified by content first and by extension otherwise."""
+    assert detect_type(b'%PDF-1.5 ...', 'resume.txt') == 'pdf'
+    assert detect_type(make_docx(), 'resume') == 'docx'
+    assert detect_type(b'plain text', 'resume.md') == 'text'
+    with pytest.raises(ValueError, match='not a valid PDF'):
+        detect_type(b'plain text', 'resume.pdf')
+    with pytest.raises(ValueError, match='Unsupported'):
+        detect_type(b'\x00\x01', 'resume.exe')
+
+def test_extract_docx():
+    """Test paragraph, tab and table text extraction from DOCX."""
+    extraction = DocumentExtractor(workers=1).extract(make_docx(), 'resume.docx')
+    assert extraction.text == "Jane Doe\nSkills:\tPython, SQL\nAcme Corp"
+    assert extraction.document_type == 'docx'
+
+def test_extract_pdf_sample():
+    """Test extracting the sample resume PDF."""
+    extraction = DocumentExtractor(workers=1).extract(make_pdf(1), 'sample.pdf')
+    assert extraction.pages == 1
+    assert 'ALEXANDER MITCHELL' in extraction.text
+
+def test_extract_pdf_in_parallel():
+    """Test that long PDFs are split across the process pool and keep their page order."""
+    data = make_pdf(5)
+    inline = DocumentExtractor(workers=1).extract(data)
+    extractor = DocumentExtractor(workers=2, parallel_min_pages=2)
+    try:
+        parallel = extractor.extract(data)
+        assert extractor._executor is not None
+    finally:
+        extractor.shutdown()
+    assert parallel.pages == 5
+    assert parallel.text == inline.text
+    assert parallel.text.count('ALEXANDER MITCHELL') == 5
+
+def test_extraction_cache():
+    """Test that re-uploading the same bytes skips extraction."""
+    extractor = DocumentExtractor(workers=1)
+    first = extractor.extract(b'John Doe\nEngineer', 'resume.txt')
+    second = extractor.extract(b'John Doe\nEngineer', 'other-name.txt')
+    assert first.cached is False
+    assert second.cached is True
+    assert second.text == first.text
+    assert second.digest == first.digest
+    assert extractor.stats()['entries'] == 1
+
+def test_extraction_errors():
+    """Test empty, undecodable and textless documents."""
+    extractor = DocumentExtractor(workers=1)
+    with pytest.raises(ValueError, match='empty'):
+        extractor.extract(b'', 'resume.txt')
+    with pytest.raises(ValueError, match='UTF-8'):
+        extractor.extract(b'\xff\xfe\xfa', 'resume.txt')
+    with pytest.raises(ValueError, match='No text'):
+        extractor.extract(make_docx('<w:document xmlns:w="http://schemas.openxmlformats.org/'
+                                    'wordprocessingml/2006/main"><w:body/></w:document>'))
@@ -0,0 +1,115 @@
+import pytest
+from unittest.mock import MagicMock
+from config import Config
+from input_compaction import estimate_tokens, token_budget, normalize_text, trim_job_description, compact_inputs
+from prompt_templates import template_registry
+
+JOB_DESCRIPTION = """Product Engineer
+Vienna, Austria
+
+Your responsibilities:
+
+• Perform data analysis and drive yield enhancement.
+
+Your qualifications:
+
+• Master's degree in Electrical Engineering.
+
+Your benefits:
+
+• Hybrid working model and a modern office.
+
+• Free lunch every Friday.
+
+We are an equal opportunity employer and consider all applicants without regard to race or gender.
+
+See how you compare to 20 applicants.
+
+Exclusive Job Seeker Insights
+About the company
+TriLite Technologies has 50 employees.
+"""
+
+def make_optimizer(model="mistral-large-latest"):
+    optimizer = MagicMock()
+    optimizer.provider = "mistral"
+    optimizer.get_current_model.return_value = model
+    optimizer.build_prompt.side_effect = lambda **fields: template_registry.get(fields.get("template")).render(**fields)
+    return optimizer
+
+def test_estimate_tokens():
+    """Test the character based estimate and empty input."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(None) == 0
+    assert estimate_tokens("a" * 40, "openai") == 10
+    assert estimate_tokens("a" * 35, "anthropic") == 10
+
+def test_token_budget(monkeypatch):
+    """Test that the longest matching model prefix picks the context window."""
+    monkeypatch.setattr(Config, "INPUT_TOKEN_BUDGET", 0)
+    monkeypatch.setattr(Config, "MAX_OUTPUT_TOKENS", 1000)
+    assert token_budget("gpt-4") == 8192 - 1000
+    assert token_budget("gpt-4-turbo-preview") == 128000 - 1000
+    assert token_budget("claude-3-opus-20240229") == 200000 - 1000
+    assert token_budget("unknown-model") == 8192 - 1000
+
+    monkeypatch.setattr(Config, "INPUT_TOKEN_BUDGET", 500)
+    assert token_budget("gpt-4") == 500
+
+def test_normalize_text():
+    """Test that PDF extraction noise is removed and line structure is kept."""
+    text = "John\u00a0 Doe(cid:3)\n\n\n\nSoft\u00adware engineer at  ACME  \n\f\nPage 2 of 3\n\u200bPython"
+    assert normalize_text(text) == "John Doe\n\nSoftware engineer at ACME\n\nPython"
+
+def test_trim_job_description():
+    """Test that benefits, EEO text and job board widgets are dropped."""
+    trimmed = trim_job_description(JOB_DESCRIPTION)
+    assert "Your responsibilities:" in trimmed
+    assert "Your qualifications:" in trimmed
+    assert "Master's degree" in trimmed
+    assert "benefits" not in trimmed
+    assert "Free lunch" not in trimmed
+    assert "equal opportunity" not in trimmed
+    assert "applicants" not in trimmed
+    assert "employees" not in trimmed
+
+def test_trim_job_description_ends_boilerplate_at_any_heading():
+    """Test that a heading without a colon ends a boilerplate section."""
+    text = ("Senior Engineer\nOur benefits\n- free lunch\nRequirements\n- 5 years Python\n- AWS\n"
+            "Responsibilities\n- build things")
+    assert trim_job_description(text) == ("Senior Engineer\nRequirements\n- 5 years Python\n- AWS\n"
+                                           "Responsibilities\n- build things")
+
+def test_trim_job_description_matches_whole_headings():
+    """Test that lines merely starting with a boilerplate word are kept."""
+    text = "Platform Engineer\nSalary and impact matter here: we ship weekly.\n- Python\n- Kubernetes"
+    assert trim_job_description(text) == text
+
+def test_compact_inputs_reports_savings(monkeypatch):
+    """Test that options are compacted in place and tokens saved are reported."""
+    monkeypatch.setattr(Config, "INPUT_TOKEN_BUDGET", 0)
+    options = {"resume_content": "John   Doe  \n\n\n\nEngineer ", "job_description": JOB_DESCRIPTION}
+    report = compact_inputs(make_optimizer(), options)
+
+    assert options["resume_content"] == "John Doe\n\nEngineer"
+    assert "Free lunch" not in options["job_description"]
+    assert report["tokens_saved"] == report["tokens_before"] - report["tokens_after"]
+    assert report["tokens_saved"] > 0
+    assert report["token_budget"] == token_budget("mistral-large-latest")
+
+def test_compact_inputs_truncates_job_description(monkeypatch):
+    """Test that the job description is shortened to fit the budget."""
+    optimizer = make_optimizer()
+    base_tokens = estimate_tokens(optimizer.build_prompt(resume_content="Resume"), "mistral")
+    monkeypatch.setattr(Config, "INPUT_TOKEN_BUDGET", base_tokens + 100)
+    options = {"resume_content": "Resume", "job_description": "Requirement. " * 500}
+
+    report = compact_inputs(optimizer, options)
+    assert report["tokens_after"] <= base_tokens + 100
+    assert 0 < len(options["job_description"]) < len("Requirement. " * 500)
+
+def test_compact_inputs_over_budget(monkeypatch):
+    """Test that a resume that cannot fit the budget is rejected."""
+    monkeypatch.setattr(Config, "INPUT_TOKEN_BUDGET", 50)
+    with pytest.raises(ValueError, match="allows 50"):
+        compact_inputs(make_optimizer(), {"resume_content": "Experience " * 200})
@@ -0,0 +1,158 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from jobs import JobStore, JobQueue, RUNNING, SUCCEEDED, FAILED, CANCELLED
+
+def payload(resume="Sample resume"):
+    return {"provider": "mistral", "model": "mistral-large-latest", "options": {"resume_content": resume}}
+
+def wait_for(queue, job_id, statuses, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job and job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not reach {statuses}")
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield store
+    store.close()
+
+@pytest.fixture
+def mock_provider():
+    with patch('ai_utils.AIProvider._fetch_available_models', return_value=['mistral-large-latest']):
+        yield
+
+def test_store_claims_by_priority(store):
+    """Test that higher priority jobs are claimed first, then oldest first."""
+    low = store.create(payload(), priority=0)
+    high = store.create(payload(), priority=5)
+    later_low = store.create(payload(), priority=0)
+
+    assert store.claim_next()["id"] == high
+    assert store.claim_next()["id"] == low
+    assert store.claim_next()["id"] == later_low
+    assert store.claim_next() is None
+
+def test_store_requeues_jobs_with_expired_leases(tmp_path):
+    """Test that a running job is left to its worker until the lease expires, then queued again."""
+    path = str(tmp_path / "jobs.sqlite3")
+    first = JobStore(path, lease_seconds=0.2)
+    job_id = first.create(payload())
+    assert first.claim_next()["owner"] == first.owner
+
+    second = JobStore(path, lease_seconds=0.2)
+    assert second.get(job_id)["status"] == RUNNING
+    assert second.claim_next() is None
+
+    time.sleep(0.3)
+    reclaimed = second.claim_next()
+    assert reclaimed["id"] == job_id
+    assert reclaimed["owner"] == second.owner
+
+    # The first worker lost the job, so its outcome is not recorded
+    first.finish(job_id, SUCCEEDED, result="stale")
+    assert second.get(job_id)["status"] == RUNNING
+    second.finish(job_id, SUCCEEDED, result="done")
+    assert second.get(job_id)["result"] == "done"
+    first.close()
+    second.close()
+
+def test_store_renews_leases(store):
+    """Test that renewing keeps a running job leased."""
+    store.lease_seconds = 0.2
+    job_id = store.create(payload())
+    store.claim_next()
+    before = store.get(job_id)["lease_expires_at"]
+    time.sleep(0.05)
+    store.renew([job_id])
+    assert store.get(job_id)["lease_expires_at"] > before
+
+def test_stores_claim_each_job_once(tmp_path):
+    """Test that stores of several processes sharing the database never claim the same job."""
+    path = str(tmp_path / "jobs.sqlite3")
+    stores = [JobStore(path) for _ in range(4)]
+    job_ids = {stores[0].create(payload()) for _ in range(20)}
+    claimed = []
+
+    def claim(store):
+        while True:
+            job = store.claim_next()
+            if job is None:
+                return
+            claimed.append(job["id"])
+
+    threads = [threading.Thread(target=claim, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for store in stores:
+        store.close()
+
+    assert sorted(claimed) == sorted(job_ids)
+
+def test_store_expires_finished_jobs(store):
+    """Test that finished jobs disappear after their TTL."""
+    job_id = store.create(payload())
+    store.claim_next()
+    store.finish(job_id, SUCCEEDED, result="done", ttl=-1)
+    assert store.get(job_id) is None
+    assert store.purge_expired() == 1
+
+def test_store_cancel(store):
+    """Test that cancelled jobs are not claimed and finished jobs cannot be cancelled."""
+    job_id = store.create(payload())
+    assert store.cancel(job_id)
+    assert store.claim_next() is None
+    assert not store.cancel(job_id)
+
+def test_queue_runs_jobs(tmp_path, mock_provider):
+    """Test that workers run jobs to completion and record the result."""
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=2)
+    with patch('ai_utils.AIProvider._stream', side_effect=lambda prompt, usage: iter(["Optimized ", "resume"])):
+        job_id = queue.submit(payload())
+        job = wait_for(queue, job_id, (SUCCEEDED, FAILED))
+    queue.stop(timeout=5)
+
+    assert job["status"] == SUCCEEDED
+    assert job["result"] == "Optimized resume"
+    assert job["progress"] == 1.0
+
+def test_queue_records_failures(tmp_path, mock_provider):
+    """Test that provider errors mark the job as failed."""
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1)
+    with patch('ai_utils.AIProvider._stream', side_effect=Exception("API Error")):
+        job_id = queue.submit(payload())
+        job = wait_for(queue, job_id, (SUCCEEDED, FAILED))
+    queue.stop(timeout=5)
+
+    assert job["status"] == FAILED
+    assert "API Error" in job["error"]
+
+def test_queue_cancels_running_job(tmp_path, mock_provider):
+    """Test that a running job stops streaming once cancelled."""
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1)
+    release = threading.Event()
+
+    def slow_stream(prompt, usage):
+        yield "Optimized"
+        release.wait(5)
+        for _ in range(100):
+            yield " more"
+
+    with patch('ai_utils.AIProvider._stream', side_effect=slow_stream):
+        job_id = queue.submit(payload("x" * 20))
+        wait_for(queue, job_id, (RUNNING,))
+        assert queue.cancel(job_id)
+        release.set()
+        time.sleep(0.1)
+        job = queue.get(job_id)
+    queue.stop(timeout=5)
+
+    assert job["status"] == CANCELLED
+    assert job["result"] is None
@@ -0,0 +1,54 @@
+import datetime
+import decimal
+import json
+import pytest
+from flask import Flask
+from json_backends import (FastJSONProvider, JSONBackend, get_json_backend, register_json_backend,
+                           _backend_specs, _backends)
+
+DOCUMENT = {"status": "success", "optimized_content": "Résumé • ✓", "usage": {"input_tokens": None}, "scores": [0.5, 1]}
+
+@pytest.mark.parametrize("name", ["json", "orjson"])
+def test_backend_round_trip(name):
+    """Test that each backend writes compact UTF-8 JSON that decodes to the same document."""
+    try:
+        backend = get_json_backend(name)
+    except ImportError:
+        pytest.skip(f"{name} is not installed")
+    encoded = backend.dumps({**DOCUMENT, 1: "key", "big": 2 ** 70}, FastJSONProvider.default)
+    assert b'"optimized_content":"R\xc3\xa9sum' in encoded
+    assert backend.loads(encoded) == {**DOCUMENT, "1": "key", "big": 2 ** 70}
+
+def test_provider_matches_flask_encoding():
+    """Test that jsonify encodes like Flask's provider, dates and decimals included."""
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    document = {**DOCUMENT, "created": datetime.datetime(2024, 5, 1, 12, 0), "price": decimal.Decimal("1.5")}
+    with app.app_context():
+        response = app.json.response(document)
+        assert response.mimetype == "application/json"
+        assert json.loads(response.get_data()) == json.loads(app.json.dumps(document))
+        assert json.loads(response.get_data())["created"] == "Wed, 01 May 2024 12:00:00 GMT"
+        assert app.json.loads(b'{"a": [1, 2]}') == {"a": [1, 2]}
+        # Extra arguments go through Flask's provider
+        assert "\n" in app.json.dumps(DOCUMENT, indent=2)
+
+def test_register_backend():
+    """Test a plugged-in backend and unknown names."""
+    class UpperBackend(JSONBackend):
+        def dumps(self, obj, default):
+            return json.dumps(obj).upper().encode()
+
+        def loads(self, data):
+            return json.loads(data)
+
+    register_json_backend('upper', UpperBackend)
+    try:
+        app = Flask(__name__)
+        app.json = FastJSONProvider(app, get_json_backend('upper'))
+        assert app.json.dumps({"a": "b"}) == '{"A": "B"}'
+    finally:
+        _backend_specs.pop('upper')
+        _backends.pop('upper', None)
+    with pytest.raises(ValueError):
+        get_json_backend('missing')
@@ -0,0 +1,63 @@
+import pytest
+import match_scoring
+from match_scoring import MatchScorer, tokenize
+
+pytest.importorskip('numpy')
+
+JOB_DESCRIPTION = open('inputs/job_description.txt', encoding='utf-8').read()
+NPI_RESUME = ("Product engineer. Led new product introduction (NPI) for laser modules: characterization data "
+              "analysis, yield enhancement and product cost reduction with Test Engineering and Quality.")
+FRONTEND_RESUME = "Frontend developer building React and TypeScript applications with CSS and Node.js."
+FRONTEND_JOB = "Frontend Developer: React, TypeScript and CSS. Node.js is a plus."
+
+def test_tokenize():
+    """Test that tokens are lowercased, plural-folded and keep technology spellings."""
+    assert tokenize("Built CI/CD pipelines in C++ and Node.js; 5 years of Technologies.") == \
+        ['built', 'ci/cd', 'pipeline', 'c++', 'node.js', 'technology']
+    assert tokenize(None) == []
+
+@pytest.mark.parametrize("method", ["bm25", "tfidf"])
+def test_rank_matches_resumes_to_jobs(method):
+    """Test that each resume ranks its matching job description first, with keywords."""
+    rankings = MatchScorer(method).rank([NPI_RESUME, FRONTEND_RESUME], [FRONTEND_JOB, JOB_DESCRIPTION], keywords=5)
+
+    assert [match["job"] for match in rankings[0]] == [1, 0]
+    assert [match["job"] for match in rankings[1]] == [0, 1]
+    assert all(0 <= match["score"] <= 1 for ranking in rankings for match in ranking)
+    assert "react" in rankings[1][0]["matched"]
+    assert rankings[1][0]["missing"] == []
+    assert len(rankings[0][0]["missing"]) == 5
+    assert rankings[0][1]["matched"] == []
+    # Boilerplate such as the job board's hiring team widget does not count
+    assert "hiring" not in rankings[0][0]["matched"] + rankings[0][0]["missing"]
+
+def test_score_matrix_and_top_k():
+    """Test the score matrix shape and that top_k keeps the best matches in order."""
+    scorer = MatchScorer()
+    jobs = [FRONTEND_JOB, JOB_DESCRIPTION, "Accountant with SAP experience"]
+    scores = scorer.score([NPI_RESUME, FRONTEND_RESUME], jobs)
+    assert scores.shape == (2, 3)
+    assert scores[1, 0] == scores[1].max()
+
+    rankings = scorer.rank([NPI_RESUME, FRONTEND_RESUME], jobs, top_k=1)
+    assert [len(ranking) for ranking in rankings] == [1, 1]
+    assert rankings[1][0]["job"] == 0
+    assert rankings[1][0]["score"] == pytest.approx(float(scores[1, 0]), abs=1e-4)
+
+def test_unknown_method():
+    """Test that unknown scoring methods are rejected."""
+    with pytest.raises(ValueError):
+        MatchScorer("cosine")
+
+@pytest.mark.parametrize("method", ["bm25", "tfidf"])
+def test_blocks_match_single_block(monkeypatch, method):
+    """Test that scoring in small resume and job description blocks gives the same scores."""
+    resumes = [NPI_RESUME, FRONTEND_RESUME, NPI_RESUME + " " + FRONTEND_RESUME]
+    jobs = [JOB_DESCRIPTION, FRONTEND_JOB, "Data engineer: Python, SQL and Spark."]
+    scores = MatchScorer(method).score(resumes, jobs)
+
+    monkeypatch.setattr(match_scoring, 'RESUME_CHUNK', 2)
+    monkeypatch.setattr(match_scoring, 'JOB_CHUNK', 1)
+    assert MatchScorer(method).score(resumes, jobs) == pytest.approx(scores, abs=1e-6)
+    rankings = MatchScorer(method).rank(resumes, jobs, top_k=1)
+    assert rankings[1][0]["job"] == 1
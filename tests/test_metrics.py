@@ -0,0 +1,49 @@
+from metrics import (MetricsRegistry, start_request, server_timing, stage, record_completion,
+                     completions_total, tokens_total)
+
+def test_histogram_exposition():
+    """Test cumulative buckets, sum and count in the Prometheus text format."""
+    registry = MetricsRegistry(namespace="test")
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    histogram.observe(0.05, provider="mistral")
+    histogram.observe(0.5, provider="mistral")
+    histogram.observe(5.0, provider="mistral")
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP test_latency_seconds Latency.", "# TYPE test_latency_seconds histogram"]
+    assert 'test_latency_seconds_bucket{provider="mistral",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{provider="mistral",le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{provider="mistral",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_sum{provider="mistral"} 5.55' in lines
+    assert 'test_latency_seconds_count{provider="mistral"} 3' in lines
+
+def test_counter_exposition_escapes_labels():
+    """Test that label values are escaped."""
+    registry = MetricsRegistry(namespace="test")
+    counter = registry.counter("requests_total", "Requests.")
+    counter.inc(model='say "hi"')
+    counter.inc(2, model='say "hi"')
+    assert 'test_requests_total{model="say \\"hi\\""} 3' in registry.render()
+
+def test_server_timing_collects_stages():
+    """Test that stages timed during a request are listed in order, followed by the total."""
+    start_request()
+    with stage("prompt", "mistral", "mistral-large-latest"):
+        pass
+    with stage("provider", "mistral", "mistral-large-latest"):
+        pass
+    header = server_timing(0.25)
+    names = [entry.split(";")[0] for entry in header.split(", ")]
+    assert names == ["prompt", "provider", "total"]
+    assert header.endswith("total;dur=250.0")
+
+def test_record_completion():
+    """Test cache status and token counters."""
+    record_completion("mistral", "large", "miss", {"input_tokens": 100, "cached_input_tokens": None,
+                                                   "output_tokens": 40})
+    record_completion("mistral", "large", "hit")
+    assert completions_total.value(provider="mistral", model="large", cache="miss") == 1
+    assert completions_total.value(provider="mistral", model="large", cache="hit") == 1
+    assert tokens_total.value(provider="mistral", model="large", kind="input") == 100
+    assert tokens_total.value(provider="mistral", model="large", kind="output") == 40
+    assert tokens_total.value(provider="mistral", model="large", kind="cached_input") == 0
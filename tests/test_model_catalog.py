@@ -0,0 +1,104 @@
+import threading
+import pytest
+from unittest.mock import MagicMock
+from model_catalog import ModelCatalog
+
+FALLBACK = ['fallback-model']
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def catalog(clock):
+    return ModelCatalog(ttl=100, refresh_ahead=0.8, failure_backoff=5, max_failure_backoff=20, clock=clock)
+
+def fallback():
+    return list(FALLBACK)
+
+def test_catalog_caches_within_ttl(catalog, clock):
+    """Test that lookups inside the TTL do not hit the loader again."""
+    loader = MagicMock(return_value=['model-a', 'model-b'])
+    assert catalog.get('mistral', loader, fallback) == ['model-a', 'model-b']
+    clock.now += 50
+    assert catalog.get('mistral', loader, fallback) == ['model-a', 'model-b']
+    assert loader.call_count == 1
+
+def test_catalog_refreshes_in_background(catalog, clock):
+    """Test that a stale entry is served while a background refresh runs."""
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(5)
+            return ['model-new']
+        return ['model-old']
+
+    catalog.get('mistral', loader, fallback)
+    clock.now += 90
+    # Past the refresh point: the old list comes back immediately
+    assert catalog.get('mistral', loader, fallback) == ['model-old']
+    release.set()
+    catalog.wait('mistral', timeout=5)
+    assert catalog.get('mistral', loader, fallback) == ['model-new']
+    assert len(calls) == 2
+
+def test_catalog_negative_caching_with_backoff(catalog, clock):
+    """Test that failures serve the fallback and are retried with backoff."""
+    loader = MagicMock(side_effect=Exception("API Error"))
+    assert catalog.get('mistral', loader, fallback) == FALLBACK
+    clock.now += 1
+    assert catalog.get('mistral', loader, fallback) == FALLBACK
+    assert loader.call_count == 1
+
+    # After the backoff a single background retry is made
+    clock.now += 5
+    catalog.get('mistral', loader, fallback)
+    catalog.wait('mistral', timeout=5)
+    assert loader.call_count == 2
+    assert catalog._entries['mistral'].refresh_at == clock.now + 10
+
+def test_catalog_keeps_last_good_list_on_failure(catalog, clock):
+    """Test that a failed refresh keeps serving the previous good list."""
+    loader = MagicMock(return_value=['model-a'])
+    catalog.get('mistral', loader, fallback)
+    loader.side_effect = Exception("API Error")
+    clock.now += 90
+    catalog.get('mistral', loader, fallback)
+    catalog.wait('mistral', timeout=5)
+    assert catalog.get('mistral', loader, fallback) == ['model-a']
+
+def test_catalog_single_flight(catalog):
+    """Test that concurrent cold lookups share one fetch."""
+    started = threading.Event()
+    release = threading.Event()
+    loader = MagicMock()
+
+    def slow_loader():
+        started.set()
+        release.wait(5)
+        return ['model-a']
+    loader.side_effect = slow_loader
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(catalog.get('mistral', loader, fallback)))
+               for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [['model-a']] * 5
+    assert loader.call_count == 1
@@ -0,0 +1,93 @@
+import random
+import sqlite3
+import time
+import pytest
+from near_duplicates import NearDuplicateIndex, minhash, similarity, shingles, band_layout
+
+JOB_DESCRIPTION = open('inputs/job_description.txt', encoding='utf-8').read()
+REPOST = (JOB_DESCRIPTION.replace("Hiring", "Now hiring")
+          + "\nLocation: Berlin, Germany (hybrid)\nPosted 2025-03-14 · Ref #A81723")
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "near_duplicates.sqlite3"), threshold=0.85)
+    yield index
+    index.close()
+
+def _posting(seed: int) -> str:
+    rng = random.Random(seed)
+    words = ["".join(rng.choices("abcdefghij", k=4)) for _ in range(300)]
+    return " ".join(words)
+
+def test_shingles_ignore_numbers_and_case():
+    """Test that dates and IDs do not change a posting's shingles."""
+    assert shingles("Senior Engineer, job 1234, posted 2024-01-02") == \
+        shingles("senior engineer, JOB 98, posted 2025-12-31")
+    assert shingles("") == set()
+
+def test_minhash_estimates_similarity():
+    """Test that signatures of a repost are close and those of unrelated postings are not."""
+    assert similarity(minhash(JOB_DESCRIPTION), minhash(REPOST)) > 0.9
+    assert similarity(minhash(JOB_DESCRIPTION), minhash(_posting(1))) < 0.1
+    assert minhash(JOB_DESCRIPTION) == minhash(JOB_DESCRIPTION)
+
+def test_band_layout_uses_signature():
+    """Test that the bands fit in the signature and stricter thresholds use longer bands."""
+    bands, rows = band_layout(0.85)
+    assert bands * rows <= 64
+    assert band_layout(0.95)[1] > rows > band_layout(0.5)[1]
+
+def test_match_or_add(index):
+    """Test that a repost is matched to the canonical posting and unrelated postings are added."""
+    first, duplicate = index.match_or_add(JOB_DESCRIPTION)
+    assert duplicate is False
+    assert first.text == JOB_DESCRIPTION
+
+    match, duplicate = index.match_or_add(REPOST)
+    assert duplicate is True
+    assert match.canonical == first.canonical
+    assert match.similarity >= 0.85
+    assert match.text == JOB_DESCRIPTION
+
+    assert index.match_or_add(_posting(1))[1] is False
+    assert index.find(JOB_DESCRIPTION).similarity == 1.0
+    assert index.find(_posting(2)) is None
+    assert index.stats()["entries"] == 2
+
+def test_index_persists_and_syncs(index, tmp_path):
+    """Test that postings survive a restart and are shared between processes."""
+    canonical = index.match_or_add(JOB_DESCRIPTION)[0].canonical
+
+    other = NearDuplicateIndex(index.path, threshold=0.85)
+    try:
+        assert other.find(REPOST).canonical == canonical
+        other.match_or_add(_posting(3))
+    finally:
+        other.close()
+    # Added by the other instance after this one loaded the database
+    assert index.find(_posting(3)) is not None
+
+    with sqlite3.connect(index.path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0] == 2
+
+def test_index_prunes_oldest(tmp_path):
+    """Test that the oldest postings are dropped beyond max_entries."""
+    index = NearDuplicateIndex(str(tmp_path / "index.sqlite3"), max_entries=10)
+    for seed in range(12):
+        index.match_or_add(_posting(seed))
+    assert index.stats()["entries"] <= 10
+    assert index.find(_posting(0)) is None
+    assert index.find(_posting(11)) is not None
+    index.close()
+
+def test_index_is_compact_and_sublinear(index):
+    """Test the memory per posting and that lookups stay fast as the index grows."""
+    for seed in range(500):
+        index.match_or_add(_posting(seed))
+    stats = index.stats()
+    assert stats["index_bytes"] / stats["entries"] < 512
+
+    started = time.perf_counter()
+    for seed in range(500, 550):
+        assert index.find(_posting(seed)) is None
+    assert (time.perf_counter() - started) / 50 < 0.05
@@ -0,0 +1,84 @@
+import os
+import pytest
+from prompt_templates import PromptTemplate, TemplateRegistry
+
+def legacy_prompt(base, resume_content, guidelines=None, job_description=None, custom_prompt=None):
+    """Prompt assembly with the original sections, guidelines first."""
+    prompt = base
+    if guidelines:
+        prompt += (f"Resume Guidelines:\n```\n{guidelines}\n```\n\n"
+                   "Follow these guidelines strictly for formatting and structure.\n\n")
+    if job_description:
+        prompt += f"Job Description to optimize for:\n```\n{job_description}\n```\n\n"
+    if custom_prompt:
+        prompt += f"Custom prompt:\n{custom_prompt}\n\n"
+    prompt += f"Resume content:\n```\n{resume_content}\n```\n\n"
+    return prompt
+
+@pytest.mark.parametrize("values", [
+    {"resume_content": "Resume"},
+    {"resume_content": "Resume", "guidelines": "Guide", "job_description": "Job", "custom_prompt": "Custom"},
+    {"resume_content": "", "custom_prompt": "Custom"},
+])
+def test_default_sections_match_legacy_prompt(values):
+    """Test that templates without slots render the original sections."""
+    template = PromptTemplate("base", "Base prompt\n\n")
+    assert template.render(**values) == legacy_prompt("Base prompt\n\n", **values)
+
+def test_explicit_slots():
+    """Test that templates can place slots themselves."""
+    template = PromptTemplate("custom", "Role: {{ job_description }}\nResume:\n{{resume_content}}")
+    assert template.slots == ["job_description", "resume_content"]
+    assert template.render(resume_content="R", job_description="J") == "Role: J\nResume:\nR"
+    assert template.render(resume_content="R") == "Role: \nResume:\nR"
+
+def test_registry_caches_and_reloads_on_change(tmp_path):
+    """Test that files are read once and re-read when their mtime changes."""
+    base = tmp_path / "base.md"
+    base.write_text("First\n")
+    registry = TemplateRegistry(str(tmp_path / "prompts"), str(base), check_interval=0)
+
+    first = registry.get()
+    assert registry.get() is first
+
+    base.write_text("Second version\n")
+    stat = os.stat(base)
+    os.utime(base, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert registry.get().source == "Second version\n"
+
+def test_registry_check_interval(tmp_path):
+    """Test that the file is not checked again within the check interval."""
+    base = tmp_path / "base.md"
+    base.write_text("First\n")
+    registry = TemplateRegistry(str(tmp_path), str(base), check_interval=3600)
+    registry.get()
+    base.write_text("Second version\n")
+    assert registry.get().source == "First\n"
+    registry.reload()
+    assert registry.get().source == "Second version\n"
+
+def test_registry_named_templates(tmp_path):
+    """Test selecting named templates and rejecting unknown or unsafe names."""
+    prompts = tmp_path / "prompts"
+    prompts.mkdir()
+    (prompts / "concise.md").write_text("Be concise.\n")
+    registry = TemplateRegistry(str(prompts), str(tmp_path / "base.md"))
+
+    assert registry.names() == ["default", "concise"]
+    assert registry.get("concise").source == "Be concise.\n"
+    with pytest.raises(ValueError):
+        registry.get("missing")
+    with pytest.raises(ValueError):
+        registry.get("../secrets")
+
+
+def test_render_splits_static_prefix():
+    """Test that the template text and guidelines form the prompt prefix."""
+    template = PromptTemplate("base", "Base\n")
+    prompt = template.render(resume_content="Resume", guidelines="Guide", job_description="Job")
+    assert prompt.prefix.startswith("Base\nResume Guidelines:")
+    assert prompt.suffix.startswith("Job Description to optimize for:")
+    assert prompt == prompt.prefix + prompt.suffix
+
+    other = template.render(resume_content="Other resume", guidelines="Guide", job_description="Other job")
+    assert other.prefix == prompt.prefix
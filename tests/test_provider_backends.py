@@ -0,0 +1,149 @@
+import contextvars
+import subprocess
+import sys
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from config import Config
+from ai_utils import AIProvider
+from provider_backends import (ProviderBackend, BackendRegistry, backend_registry, register_backend, get_backend,
+                               StreamAbort, StreamAborted, stream_abort, _register_close, _abortable, _read_usage)
+
+class EchoBackend(ProviderBackend):
+    name = 'echo'
+    fallback_models = ['echo-1']
+
+    def create_client(self):
+        return None
+
+    def list_models(self, client):
+        return ['echo-1', 'echo-2']
+
+    def complete(self, client, model, prompt, temperature, usage):
+        return f"{model}: {prompt}"
+
+@pytest.fixture
+def echo_backend():
+    register_backend('echo', EchoBackend)
+    yield
+    backend_registry._specs.pop('echo', None)
+    backend_registry._backends.pop('echo', None)
+
+def test_app_import_loads_no_provider_sdk():
+    """Test that importing the app imports no SDK and a Mistral provider imports only mistralai."""
+    script = (
+        "import sys, app\n"
+        "sdks = ('openai', 'anthropic', 'mistralai')\n"
+        "assert not [name for name in sdks if name in sys.modules]\n"
+        "from ai_utils import AIProvider\n"
+        "AIProvider('mistral', 'mistral-large-latest')\n"
+        "print(','.join(name for name in sdks if name in sys.modules))\n"
+    )
+    completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.strip() == 'mistralai'
+
+def test_backends_load_on_first_use():
+    """Test that a backend is instantiated once, on first lookup."""
+    registry = BackendRegistry()
+    created = []
+
+    class CountingBackend(EchoBackend):
+        def __init__(self):
+            created.append(self)
+
+    registry.register('counting', CountingBackend)
+    assert registry.loaded() == []
+    assert registry.get('Counting') is registry.get('counting')
+    assert len(created) == 1
+    assert registry.loaded() == ['counting']
+    assert 'counting' not in Config.supported_providers()
+
+def test_backend_registered_by_spec():
+    """Test that a "module:Class" spec is imported when the provider is first used."""
+    registry = BackendRegistry()
+    registry.register('echo', 'tests.test_provider_backends:EchoBackend')
+    assert isinstance(registry.get('echo'), EchoBackend)
+
+def test_unknown_backend():
+    """Test that unregistered providers are rejected."""
+    with pytest.raises(ValueError) as exc_info:
+        get_backend('invalid')
+    assert 'Unsupported AI provider' in str(exc_info.value)
+
+def test_plugin_backend_provider(echo_backend):
+    """Test that AIProvider runs on a registered backend."""
+    assert Config.validate_provider('echo')
+    assert 'echo' not in Config.SUPPORTED_PROVIDERS
+    provider = AIProvider('echo')
+    assert provider.model == 'echo-1'
+    assert provider.optimize_resume("Resume", use_cache=False).startswith("echo-1: ")
+
+def test_known_model_skips_models_fetch():
+    """Test that a fallback-listed model is accepted without fetching the models list."""
+    with patch('ai_utils.AIProvider._fetch_available_models') as mock_fetch:
+        mock_fetch.return_value = ['open-mixtral-8x22b']
+        provider = AIProvider('mistral', 'mistral-small-latest')
+        assert provider.model == 'mistral-small-latest'
+        assert mock_fetch.call_count == 0
+
+        AIProvider('mistral', 'open-mixtral-8x22b')
+        assert mock_fetch.call_count == 1
+
+class FakeStream(list):
+    response = None
+
+def test_openai_stream_reads_final_usage():
+    """Test that OpenAI streams request usage and read it from the final, choiceless chunk."""
+    backend = get_backend('openai')
+    stream = FakeStream([
+        MagicMock(choices=[MagicMock(delta=MagicMock(content="Optimized"))]),
+        MagicMock(choices=[], usage=MagicMock(spec=['prompt_tokens', 'completion_tokens'],
+                                              prompt_tokens=100, completion_tokens=1))
+    ])
+    usage = {}
+    with patch.object(backend, 'openai') as openai:
+        openai.chat.completions.create.return_value = stream
+        assert list(backend.stream(None, 'gpt-4', "Resume", 0.7, usage)) == ["Optimized"]
+    assert openai.chat.completions.create.call_args.kwargs["extra_body"] == {"stream_options": {"include_usage": True}}
+    assert usage["input_tokens"] == 100
+    assert usage["output_tokens"] == 1
+
+@pytest.mark.parametrize("provider", ["openai", "anthropic"])
+def test_missing_usage_is_none(provider):
+    """Test that usage a provider did not report reads as None rather than 0."""
+    assert set(_read_usage(provider, None).values()) == {None}
+    assert _read_usage(provider, MagicMock(spec=[]))["input_tokens"] is None
+
+def test_stream_abort_closes_blocked_stream():
+    """Test that aborting closes a stream waiting for data and that the cut-off stream raises."""
+    abort = StreamAbort()
+    unblocked = threading.Event()
+
+    def blocked_stream():
+        yield "first"
+        unblocked.wait(5)  # a read that returns once the stream is closed
+
+    def consume():
+        stream_abort.set(abort)
+        _register_close(unblocked.set)
+        return list(_abortable(blocked_stream()))
+
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(error=_run_catching(consume)))
+    thread.start()
+    abort.abort()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert isinstance(result["error"], StreamAborted)
+
+    # Streams opened after the abort are closed as soon as they are registered
+    closed = threading.Event()
+    contextvars.copy_context().run(lambda: (stream_abort.set(abort), _register_close(closed.set)))
+    assert closed.is_set()
+
+def _run_catching(function):
+    try:
+        function()
+    except Exception as e:
+        return e
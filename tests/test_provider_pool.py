@@ -0,0 +1,55 @@
+import pytest
+from unittest.mock import patch
+from provider_pool import ProviderPool
+
+@pytest.fixture
+def pool():
+    pool = ProviderPool()
+    yield pool
+    pool.shutdown()
+
+def test_pool_reuses_provider(pool):
+    """Test that the same (provider, model) returns the same client."""
+    with patch('ai_utils.AIProvider._fetch_available_models') as mock_fetch:
+        # A model outside the fallback list is validated with a fetch, once per client
+        mock_fetch.return_value = ['mistral-large-latest', 'open-mixtral-8x22b']
+        first = pool.get('mistral', 'open-mixtral-8x22b')
+        second = pool.get('mistral', 'open-mixtral-8x22b')
+        assert first is second
+        assert mock_fetch.call_count == 1
+        assert pool._creation_locks == {}
+
+def test_pool_default_model_shares_client(pool):
+    """Test that the default model and its explicit name share one client."""
+    with patch('ai_utils.AIProvider._fetch_available_models') as mock_fetch:
+        mock_fetch.return_value = ['mistral-large-latest', 'mistral-medium-latest']
+        default = pool.get('mistral')
+        assert pool.get('mistral', 'mistral-large-latest') is default
+        assert pool.get('mistral', 'mistral-medium-latest') is not default
+        assert len(pool) == 2
+
+def test_pool_invalid_provider(pool):
+    """Test that construction errors propagate to the caller."""
+    with pytest.raises(ValueError):
+        pool.get('invalid')
+
+def test_pool_forgets_failed_keys(pool):
+    """Test that requests for invalid models leave nothing behind in the pool."""
+    with patch('ai_utils.AIProvider._fetch_available_models') as mock_fetch:
+        mock_fetch.return_value = ['mistral-large-latest']
+        for index in range(3):
+            with pytest.raises(ValueError):
+                pool.get('mistral', f'missing-model-{index}')
+    assert pool._creation_locks == {}
+    assert len(pool) == 0
+
+def test_pool_warm_up_and_shutdown(pool):
+    """Test warm-up creates clients, skips bad providers and shutdown closes them."""
+    with patch('ai_utils.AIProvider._fetch_available_models') as mock_fetch, \
+         patch('ai_utils.AIProvider.close') as mock_close:
+        mock_fetch.return_value = ['mistral-large-latest']
+        pool.warm_up(['mistral', 'invalid'])
+        assert len(pool) == 1
+        pool.shutdown()
+        assert len(pool) == 0
+        mock_close.assert_called_once()
@@ -0,0 +1,195 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from ai_utils import CompletionInfo, ProviderError, last_completion
+from provider_backends import StreamAborted, _register_close
+from provider_router import ProviderHealth, ProviderRouter
+
+class FakeOptimizer:
+    """Stands in for a pooled AIProvider with a fixed delay before its first token."""
+
+    def __init__(self, provider, delay=0.0, error=None, cache="miss"):
+        self.provider = provider
+        self.model = f"{provider}-model"
+        self.delay = delay
+        self.error = error
+        self.cache = cache
+        self.closed = threading.Event()
+        self.calls = 0
+
+    def __call__(self, **options):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        last_completion.set(CompletionInfo(self.provider, self.model, self.cache))
+        return f"{self.provider}: {options['resume_content']}"
+
+    def stream_optimize(self, **options):
+        self.calls += 1
+        try:
+            # Waits like a provider stream that can be closed from another thread
+            aborted = threading.Event()
+            _register_close(aborted.set)
+            if aborted.wait(self.delay):
+                raise StreamAborted("The stream was aborted")
+            if self.error:
+                raise self.error
+            for word in (self.provider, ": ", options['resume_content']):
+                yield {"event": "token", "text": word}
+                time.sleep(0.01)
+            yield {"event": "done", "provider": self.provider, "model": self.model,
+                   "cache": self.cache, "usage": None}
+        finally:
+            self.closed.set()
+
+class FakePool:
+    def __init__(self, *optimizers):
+        self.optimizers = {optimizer.provider: optimizer for optimizer in optimizers}
+
+    def get(self, provider, model=None):
+        if provider not in self.optimizers:
+            raise ValueError(f"Unsupported AI provider: {provider}")
+        return self.optimizers[provider]
+
+def test_health_score():
+    """Test that errors and slow tails lower the health score."""
+    health = ProviderHealth(window=10)
+    assert health.score() == 1.0
+    for _ in range(4):
+        health.record_success(1.0)
+    health.record_failure()
+    assert health.error_rate() == pytest.approx(0.2)
+    assert health.latency_quantile(0.95) == 1.0
+    assert health.score() == pytest.approx(0.8 / 2.0)
+
+def test_failover_in_order():
+    """Test that a failing provider falls over to the next one in the list."""
+    mistral = FakeOptimizer("mistral", error=ProviderError("boom"))
+    openai = FakeOptimizer("openai")
+    anthropic = FakeOptimizer("anthropic")
+    router = ProviderRouter(failover=["openai", "anthropic"], hedge=False)
+
+    with patch('provider_router.provider_pool', FakePool(mistral, openai, anthropic)):
+        content, used = router.optimize(mistral, {"resume_content": "Resume"})
+
+    assert content == "openai: Resume"
+    assert used is openai
+    assert anthropic.calls == 0
+    assert router.health("mistral").error_rate() == 1.0
+
+def test_all_providers_fail():
+    """Test that the last error is raised once every provider failed."""
+    mistral = FakeOptimizer("mistral", error=ProviderError("first"))
+    openai = FakeOptimizer("openai", error=ProviderError("second"))
+    router = ProviderRouter(failover=["openai"], hedge=False)
+
+    with patch('provider_router.provider_pool', FakePool(mistral, openai)):
+        with pytest.raises(ProviderError, match="second"):
+            router.optimize(mistral, {"resume_content": "Resume"})
+
+@pytest.mark.parametrize("hedge", [False, True])
+def test_request_errors_not_failed_over(hedge):
+    """Test that errors caused by the request are raised at once and not counted against health."""
+    mistral = FakeOptimizer("mistral", error=ValueError("Unknown prompt template: missing"))
+    openai = FakeOptimizer("openai")
+    router = ProviderRouter(failover=["openai"], hedge=hedge, hedge_delay=5.0)
+
+    with patch('provider_router.provider_pool', FakePool(mistral, openai)):
+        with pytest.raises(ValueError, match="Unknown prompt template"):
+            router.optimize(mistral, {"resume_content": "Resume"})
+
+    assert openai.calls == 0
+    assert router.health("mistral").samples == 0
+
+def test_unavailable_backup_skipped():
+    """Test that a backup provider that cannot be set up counts as failed and the next one is tried."""
+    mistral = FakeOptimizer("mistral", error=ProviderError("boom"))
+    anthropic = FakeOptimizer("anthropic")
+    router = ProviderRouter(failover=["openai", "anthropic"], hedge=False)
+
+    with patch('provider_router.provider_pool', FakePool(mistral, anthropic)):
+        content, _ = router.optimize(mistral, {"resume_content": "Resume"})
+
+    assert content == "anthropic: Resume"
+    assert router.health("openai").error_rate() == 1.0
+
+def test_unhealthy_provider_tried_last():
+    """Test that a provider with a high recent error rate is demoted."""
+    router = ProviderRouter(failover=["openai", "anthropic"], min_samples=2)
+    for _ in range(2):
+        router.health("mistral").record_failure()
+    assert router.candidates("mistral", "large") == [("openai", None), ("anthropic", None), ("mistral", "large")]
+    assert router.stats()["mistral"]["healthy"] is False
+
+def test_hedge_slow_primary():
+    """Test that a backup request wins when the primary is slow and the primary is cancelled."""
+    mistral = FakeOptimizer("mistral", delay=0.5)
+    openai = FakeOptimizer("openai")
+    router = ProviderRouter(failover=["openai"], hedge=True, hedge_delay=0.05)
+
+    with patch('provider_router.provider_pool', FakePool(mistral, openai)):
+        started = time.monotonic()
+        content, used = router.optimize(mistral, {"resume_content": "Resume"})
+
+    assert time.monotonic() - started < 0.5
+    assert content == "openai: Resume"
+    assert used is openai
+    assert mistral.closed.wait(2)
+    # The cancelled request does not count against the primary's health
+    assert router.health("mistral").samples == 0
+
+def test_hedge_aborts_stalled_loser_at_once():
+    """Test that a primary stalled before its first token is closed as soon as the backup wins."""
+    mistral = FakeOptimizer("mistral", delay=30)
+    openai = FakeOptimizer("openai")
+    router = ProviderRouter(failover=["openai"], hedge=True, hedge_delay=0.05)
+
+    with patch('provider_router.provider_pool', FakePool(mistral, openai)):
+        content, _ = router.optimize(mistral, {"resume_content": "Resume"})
+
+    assert content == "openai: Resume"
+    assert mistral.closed.wait(1)
+    assert router.health("mistral").samples == 0
+
+def test_cache_hits_not_recorded_as_provider_latency():
+    """Test that answers from the response cache leave the provider's health untouched."""
+    cached = FakeOptimizer("mistral", cache="hit")
+    router = ProviderRouter(failover=[], hedge=False)
+    router.optimize(cached, {"resume_content": "Resume"})
+    assert router.health("mistral").samples == 0
+
+    fresh = FakeOptimizer("mistral")
+    router.optimize(fresh, {"resume_content": "Resume"})
+    assert router.health("mistral").samples == 1
+
+    hedged = ProviderRouter(failover=["openai"], hedge=True, hedge_delay=1.0)
+    with patch('provider_router.provider_pool', FakePool(cached, FakeOptimizer("openai"))):
+        hedged.optimize(cached, {"resume_content": "Resume"})
+    assert hedged.health("mistral").samples == 0
+
+def test_hedge_not_needed_for_fast_primary():
+    """Test that no backup is sent when the primary answers within the hedge delay."""
+    mistral = FakeOptimizer("mistral")
+    openai = FakeOptimizer("openai")
+    router = ProviderRouter(failover=["openai"], hedge=True, hedge_delay=1.0)
+
+    with patch('provider_router.provider_pool', FakePool(mistral, openai)):
+        content, used = router.optimize(mistral, {"resume_content": "Resume"})
+
+    assert content == "mistral: Resume"
+    assert openai.calls == 0
+    assert router.health("mistral").latency_quantile(0.95, first_token=True) is not None
+
+def test_hedge_primary_error_fails_over():
+    """Test that an erroring primary hands over to the backup without waiting for the hedge delay."""
+    mistral = FakeOptimizer("mistral", error=ProviderError("boom"))
+    openai = FakeOptimizer("openai")
+    router = ProviderRouter(failover=["openai"], hedge=True, hedge_delay=5.0)
+
+    with patch('provider_router.provider_pool', FakePool(mistral, openai)):
+        started = time.monotonic()
+        content, _ = router.optimize(mistral, {"resume_content": "Resume"})
+
+    assert time.monotonic() - started < 1.0
+    assert content == "openai: Resume"
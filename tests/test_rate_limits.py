@@ -0,0 +1,266 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from rate_limits import (RateLimitedError, SharedTokenBucket, AdaptiveConcurrency, ProviderLimiter,
+                         retry_after, is_retryable, reached_provider)
+
+class APIConnectionError(Exception):
+    """Mimics an SDK error for a request that could not be sent."""
+
+class FakeAPIError(Exception):
+    """Mimics an SDK error carrying an HTTP status and response headers."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+@pytest.fixture
+def bucket(tmp_path):
+    bucket = SharedTokenBucket(str(tmp_path / "limits.sqlite3"))
+    yield bucket
+    bucket.close()
+
+def make_limiter(bucket, **kwargs):
+    kwargs.setdefault("concurrency", AdaptiveConcurrency(max_limit=4))
+    return ProviderLimiter("mistral", bucket, max_retries=kwargs.pop("max_retries", 3), **kwargs)
+
+def test_retry_after_parsing():
+    """Test Retry-After in seconds, milliseconds and as an HTTP date."""
+    assert retry_after(FakeAPIError(429, {"Retry-After": "7"})) == 7.0
+    assert retry_after(FakeAPIError(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after(FakeAPIError(429, {"retry-after-ms": "-200"})) == 0.0
+    assert retry_after(FakeAPIError(429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert retry_after(FakeAPIError(429)) is None
+    assert is_retryable(FakeAPIError(503))
+    assert not is_retryable(FakeAPIError(400))
+
+def test_token_bucket_shared_between_instances(bucket, tmp_path):
+    """Test that reservations beyond capacity wait and that the quota is shared."""
+    other = SharedTokenBucket(str(tmp_path / "limits.sqlite3"))
+    assert bucket.reserve("openai:requests", 1, rate=1.0, capacity=2) == 0.0
+    assert other.reserve("openai:requests", 1, rate=1.0, capacity=2) == 0.0
+    assert bucket.reserve("openai:requests", 1, rate=1.0, capacity=2) == pytest.approx(1.0, abs=0.05)
+    # Reservations queue up behind each other rather than failing
+    assert other.reserve("openai:requests", 1, rate=1.0, capacity=2) == pytest.approx(2.0, abs=0.05)
+    other.refund("openai:requests", 2)
+    assert bucket.reserve("openai:requests", 1, rate=1.0, capacity=2) == pytest.approx(1.0, abs=0.05)
+    other.close()
+
+def test_aimd_limit():
+    """Test additive increase on success and multiplicative decrease on 429."""
+    concurrency = AdaptiveConcurrency(max_limit=8, cooldown=0)
+    concurrency.limit = 4.0
+    assert concurrency.acquire(0)
+    concurrency.release(latency=0.1)
+    assert concurrency.limit == pytest.approx(4.25)
+    assert concurrency.acquire(0)
+    concurrency.release(overloaded=True)
+    assert concurrency.limit == pytest.approx(2.125)
+    assert concurrency.stats() == {"limit": 2, "in_flight": 0, "waiting": 0}
+
+def test_aimd_latency_spike():
+    """Test that a call far slower than the moving average lowers the limit."""
+    concurrency = AdaptiveConcurrency(max_limit=8, cooldown=0)
+    for _ in range(10):
+        concurrency.acquire(0)
+        concurrency.release(latency=1.0)
+    concurrency.acquire(0)
+    concurrency.release(latency=5.0)
+    assert concurrency.limit == pytest.approx(4.0)
+
+def test_concurrency_waiters_served_in_order():
+    """Test that queued callers get slots first come, first served and can time out."""
+    concurrency = AdaptiveConcurrency(max_limit=1)
+    assert concurrency.acquire(0)
+    assert not concurrency.acquire(0.01)
+
+    order = []
+    def waiter(name):
+        concurrency.acquire()
+        order.append(name)
+        concurrency.release()
+
+    threads = []
+    for name in ("first", "second", "third"):
+        thread = threading.Thread(target=waiter, args=(name,))
+        thread.start()
+        threads.append(thread)
+        while concurrency.stats()["waiting"] < len(threads):
+            time.sleep(0.001)
+    concurrency.release()
+    for thread in threads:
+        thread.join(2)
+    assert order == ["first", "second", "third"]
+
+@patch('rate_limits.time.sleep')
+def test_call_retries_rate_limits(mock_sleep, bucket):
+    """Test that 429s are retried after at least the Retry-After delay."""
+    responses = [FakeAPIError(429, {"Retry-After": "3"}), FakeAPIError(503), "Optimized"]
+
+    def request():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    limiter = make_limiter(bucket)
+    assert limiter.call(request) == "Optimized"
+    delays = [call.args[0] for call in mock_sleep.call_args_list if call.args[0] > 0]
+    assert delays[0] >= 3
+    assert len(delays) == 2
+    assert limiter.concurrency.limit < 4
+
+@patch('rate_limits.time.sleep')
+def test_call_gives_up_with_rate_limited_error(mock_sleep, bucket):
+    """Test that persistent 429s surface as RateLimitedError and other errors are not retried."""
+    limiter = make_limiter(bucket, max_retries=2)
+    calls = []
+
+    def rate_limited():
+        calls.append(1)
+        raise FakeAPIError(429, {"Retry-After": "2"})
+
+    with pytest.raises(RateLimitedError) as error:
+        limiter.call(rate_limited)
+    assert error.value.retry_after == 2.0
+    assert len(calls) == 3
+
+    def bad_request():
+        calls.append(1)
+        raise FakeAPIError(400)
+
+    with pytest.raises(FakeAPIError):
+        limiter.call(bad_request)
+    assert len(calls) == 4
+
+def test_quota_exhausted(bucket):
+    """Test that a request which would queue longer than max_wait is rejected."""
+    limiter = make_limiter(bucket, rpm=1, max_wait=5)
+    assert limiter.call(lambda: "first") == "first"
+    with pytest.raises(RateLimitedError) as error:
+        limiter.call(lambda: "second")
+    assert error.value.retry_after == pytest.approx(60, abs=1)
+
+def test_token_quota_reconciled_with_usage(bucket):
+    """Test that unused reserved tokens are given back once usage is known."""
+    limiter = make_limiter(bucket, tpm=6000)
+    usage = {"input_tokens": 100, "output_tokens": 400}
+    limiter.call(lambda: "done", tokens=5000, usage=usage)
+    # 500 tokens used, so a further 5000 are available without waiting
+    assert bucket.reserve("mistral:tokens", 5000, rate=100, capacity=6000) == 0.0
+
+def test_quota_refunded_only_if_request_never_sent(bucket):
+    """Test that failed requests the provider received keep their quota and unsent ones are refunded."""
+    assert reached_provider(FakeAPIError(400))
+    assert not reached_provider(APIConnectionError("refused"))
+    limiter = make_limiter(bucket, rpm=2, tpm=10000, max_retries=0)
+
+    def unsent():
+        raise APIConnectionError("refused")
+
+    def bad_request():
+        raise FakeAPIError(400)
+
+    with pytest.raises(APIConnectionError):
+        limiter.call(unsent, tokens=6000)
+    with pytest.raises(FakeAPIError):
+        limiter.call(bad_request, tokens=6000)
+    # Only the bad request's 6000 tokens and one request stay spent
+    assert bucket.reserve("mistral:tokens", 4000, rate=1, capacity=10000) == 0.0
+    assert bucket.reserve("mistral:tokens", 1, rate=1, capacity=10000) > 0.0
+    assert bucket.reserve("mistral:requests", 1, rate=1 / 30, capacity=2) == 0.0
+    assert bucket.reserve("mistral:requests", 1, rate=1 / 30, capacity=2) > 0.0
+
+@patch('rate_limits.time.sleep')
+def test_stream_retries_only_before_first_chunk(mock_sleep, bucket):
+    """Test that a stream failing before output is retried and one failing midway is not."""
+    attempts = []
+
+    def failing_then_working():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise FakeAPIError(429)
+        yield "a"
+        yield "b"
+
+    limiter = make_limiter(bucket)
+    assert list(limiter.stream(failing_then_working)) == ["a", "b"]
+    assert len(attempts) == 2
+
+    def failing_midway():
+        yield "a"
+        raise FakeAPIError(503)
+
+    stream = limiter.stream(failing_midway)
+    assert next(stream) == "a"
+    with pytest.raises(FakeAPIError):
+        next(stream)
+    assert limiter.concurrency.in_flight == 0
+
+def test_stream_failing_midway_refunds_only_unused_tokens(bucket):
+    """Test that a stream failing after output keeps the prompt and streamed tokens reserved."""
+    limiter = make_limiter(bucket, tpm=10000)
+
+    def failing_midway():
+        yield "a" * 400
+        raise FakeAPIError(503)
+
+    usage = {"input_tokens": 1000, "output_tokens": None}
+    stream = limiter.stream(failing_midway, tokens=5000, usage=usage)
+    next(stream)
+    with pytest.raises(FakeAPIError):
+        next(stream)
+    # 1000 prompt tokens and about 112 streamed tokens stay spent out of the 10000 capacity
+    assert bucket.reserve("mistral:tokens", 8800, rate=1, capacity=10000) == 0.0
+    assert bucket.reserve("mistral:tokens", 200, rate=1, capacity=10000) > 0.0
+
+def test_stream_closed_by_consumer_reconciled(bucket):
+    """Test that a stream the consumer stops reading gives back the tokens it did not use."""
+    limiter = make_limiter(bucket, tpm=10000)
+
+    def long_stream():
+        while True:
+            yield "a" * 400
+
+    usage = {"input_tokens": 1000, "output_tokens": None}
+    stream = limiter.stream(long_stream, tokens=5000, usage=usage)
+    next(stream)
+    stream.close()
+    assert limiter.concurrency.in_flight == 0
+    assert bucket.reserve("mistral:tokens", 8800, rate=1, capacity=10000) == 0.0
+    assert bucket.reserve("mistral:tokens", 200, rate=1, capacity=10000) > 0.0
+
+def test_async_call_cancelled_releases_slot(bucket):
+    """Test that cancelling an in-flight async call frees its concurrency slot."""
+    limiter = make_limiter(bucket, concurrency=AdaptiveConcurrency(max_limit=1))
+
+    async def hang():
+        await asyncio.sleep(30)
+
+    async def main():
+        task = asyncio.create_task(limiter.acall(hang))
+        await asyncio.sleep(0.05)
+        assert limiter.concurrency.in_flight == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert limiter.concurrency.in_flight == 0
+
+def test_async_call(bucket):
+    """Test the async path retries and releases its slot."""
+    responses = [FakeAPIError(429, {"retry-after-ms": "10"}), "Optimized"]
+
+    async def request():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    limiter = make_limiter(bucket)
+    assert asyncio.run(limiter.acall(request)) == "Optimized"
+    assert limiter.concurrency.in_flight == 0
@@ -0,0 +1,78 @@
+import pytest
+from response_cache import make_key, MemoryTier, SQLiteTier, DirectoryTier, ResponseCache
+
+def test_make_key_depends_on_all_inputs():
+    """Test that the key changes with prompt, provider, model and temperature."""
+    base = make_key("prompt", "mistral", "mistral-large-latest", 0.7)
+    assert base == make_key("prompt", "mistral", "mistral-large-latest", 0.7)
+    assert base != make_key("prompt!", "mistral", "mistral-large-latest", 0.7)
+    assert base != make_key("prompt", "openai", "mistral-large-latest", 0.7)
+    assert base != make_key("prompt", "mistral", "mistral-small-latest", 0.7)
+    assert base != make_key("prompt", "mistral", "mistral-large-latest", 0.2)
+
+def test_memory_tier_evicts_lru_by_bytes():
+    """Test that the memory tier evicts least recently used entries past its byte limit."""
+    tier = MemoryTier(max_bytes=10)
+    tier.put("a", "aaaa")
+    tier.put("b", "bbbb")
+    assert tier.get("a") == "aaaa"
+    tier.put("c", "cccc")
+    assert tier.get("b") is None
+    assert tier.get("a") == "aaaa"
+    assert tier.stats() == {"entries": 2, "bytes": 8, "max_bytes": 10, "evictions": 1}
+
+def test_memory_tier_skips_oversized_values():
+    """Test that values larger than the tier are not cached."""
+    tier = MemoryTier(max_bytes=3)
+    tier.put("a", "aaaa")
+    assert tier.get("a") is None
+
+@pytest.mark.parametrize("tier_class,name", [(SQLiteTier, "cache.sqlite3"), (DirectoryTier, "cache")])
+def test_disk_tiers_survive_restart(tmp_path, tier_class, name):
+    """Test that disk tiers persist values across instances and prune old entries."""
+    path = str(tmp_path / name)
+    tier = tier_class(path, max_entries=2)
+    tier.put("a" * 64, "first")
+    tier.put("b" * 64, "second")
+    tier.put("c" * 64, "third")
+
+    reopened = tier_class(path, max_entries=2)
+    assert reopened.get("c" * 64) == "third"
+    assert reopened.stats()["entries"] == 2
+
+def test_response_cache_promotes_disk_hits(tmp_path):
+    """Test that disk hits are promoted to memory and counted."""
+    disk = SQLiteTier(str(tmp_path / "cache.sqlite3"))
+    disk.put("key", "value")
+    cache = ResponseCache(MemoryTier(1024), disk)
+
+    assert cache.get("missing") is None
+    assert cache.get("key") == "value"
+    assert cache.memory.get("key") == "value"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["disk"]["entries"] == 1
+
+def test_directory_tier_prunes_in_batches(tmp_path, monkeypatch):
+    """Test that the directory tier only scans its files once it is over its limit."""
+    tier = DirectoryTier(str(tmp_path / "cache"), max_entries=10)
+    prune = tier._prune
+    calls = []
+    monkeypatch.setattr(tier, '_prune', lambda: (calls.append(1), prune()))
+    for index in range(10):
+        tier.put(f"{index:064d}", "value")
+    tier.put("0" * 64, "rewritten")
+    assert calls == []
+
+    tier.put("f" * 64, "eleventh")
+    assert calls == [1]
+    assert tier.stats()["entries"] == 9
+    assert tier.get("f" * 64) == "eleventh"
+
+def test_response_cache_skips_empty_values():
+    """Test that empty or missing completions are not cached."""
+    cache = ResponseCache(MemoryTier(1024))
+    cache.put("none", None)
+    cache.put("empty", "")
+    assert cache.memory.stats()["entries"] == 0
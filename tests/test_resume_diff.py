@@ -0,0 +1,71 @@
+import random
+import pytest
+from resume_diff import tokenize, opcodes, diff_texts, apply_diff, cached_diff
+
+ORIGINAL = "John Doe\n\nExperience:\n- Wrote Python code\n- Led team of 3\n\nSkills:\nPython, SQL\n"
+OPTIMIZED = "John Doe\n\nExperience:\n- Built Python services\n- Led team of 3\n\nSkills:\nPython, SQL, Airflow\n"
+
+def _lcs_length(a, b):
+    lengths = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) - 1, -1, -1):
+        for j in range(len(b) - 1, -1, -1):
+            lengths[i][j] = lengths[i + 1][j + 1] + 1 if a[i] == b[j] else max(lengths[i + 1][j], lengths[i][j + 1])
+    return lengths[0][0]
+
+def test_tokenize_round_trips():
+    """Test that joining the tokens gives back the text."""
+    for granularity in ("line", "word"):
+        assert "".join(tokenize(OPTIMIZED, granularity)) == OPTIMIZED
+    assert tokenize("a b\nc", "word") == ["a", " ", "b", "\n", "c"]
+
+def test_opcodes_are_minimal():
+    """Test that the edit scripts rebuild the target and keep a longest common subsequence."""
+    rng = random.Random(0)
+    for _ in range(500):
+        a = rng.choices("abcd", k=rng.randrange(30))
+        b = rng.choices("abcd", k=rng.randrange(30))
+        rebuilt, equal = [], 0
+        for tag, i1, i2, j1, j2 in opcodes(a, b):
+            if tag == "equal":
+                assert a[i1:i2] == b[j1:j2]
+                equal += i2 - i1
+            if tag != "delete":
+                rebuilt += b[j1:j2]
+        assert rebuilt == b
+        assert equal == _lcs_length(a, b)
+
+def test_word_diff():
+    """Test that a word diff only reports the changed words and carries lengths for unchanged text."""
+    diff = diff_texts(ORIGINAL, OPTIMIZED, "word")
+    changes = [(op["op"], op["text"]) for op in diff["ops"] if op["op"] != "equal"]
+    assert changes == [("delete", "Wrote"), ("insert", "Built"), ("delete", "code"), ("insert", "services"),
+                       ("insert", ", Airflow")]
+    assert all(set(op) == {"op", "length"} for op in diff["ops"] if op["op"] == "equal")
+    assert diff["stats"]["inserted"] == 4
+    assert apply_diff(ORIGINAL, diff) == OPTIMIZED
+
+def test_line_diff():
+    """Test that a line diff replaces whole lines."""
+    diff = diff_texts(ORIGINAL, OPTIMIZED, "line")
+    assert diff["stats"] == {"unchanged": 6, "deleted": 2, "inserted": 2}
+    assert {"op": "insert", "text": "- Built Python services\n"} in diff["ops"]
+    assert apply_diff(ORIGINAL, diff) == OPTIMIZED
+
+@pytest.mark.parametrize("original, optimized", [("", OPTIMIZED), (ORIGINAL, ""), (ORIGINAL, ORIGINAL),
+                                                 ("no newline", "no newline at the end\n")])
+def test_diff_edge_cases(original, optimized):
+    """Test empty, identical and unterminated texts."""
+    for granularity in ("line", "word"):
+        assert apply_diff(original, diff_texts(original, optimized, granularity)) == optimized
+
+def test_unknown_granularity():
+    """Test that unknown granularities are rejected."""
+    with pytest.raises(ValueError):
+        diff_texts(ORIGINAL, OPTIMIZED, "character")
+
+def test_cached_diff():
+    """Test that repeated diffs come from the cache."""
+    first, cached = cached_diff(ORIGINAL, OPTIMIZED)
+    assert cached is False
+    assert cached_diff(ORIGINAL, OPTIMIZED) == (first, True)
+    assert cached_diff(ORIGINAL, OPTIMIZED, "line")[1] is False
@@ -0,0 +1,60 @@
+from resume_sections import split_sections, join_sections, strip_fences
+
+RESUME = """Jane Doe
+jane@example.com | Berlin
+
+## Summary
+Data engineer with 8 years of experience.
+
+## Experience
+Senior Data Engineer, Acme (2020-2024)
+- Built streaming pipelines
+- Led a team of 4
+
+Data Engineer, Beta (2016-2020)
+- Wrote ETL jobs
+Analyst, Gamma (2014-2016)
+- Built reports
+
+SKILLS
+Python, SQL, Spark
+
+Education:
+BSc Computer Science
+"""
+
+def test_split_sections_blocks():
+    """Test that headings start sections and experience entries are separate blocks."""
+    sections = split_sections(RESUME)
+    assert [section.kind for section in sections] == [
+        'header', 'heading', 'summary', 'heading', 'experience', 'experience', 'experience',
+        'heading', 'skills', 'heading', 'education'
+    ]
+    assert [section.optimize for section in sections][:3] == [False, False, True]
+    entries = [section.text for section in sections if section.kind == 'experience']
+    assert entries[1] == "Data Engineer, Beta (2016-2020)\n- Wrote ETL jobs"
+    assert entries[2].startswith("Analyst, Gamma")
+    assert sections[4].label() == "one entry of the Experience section"
+
+def test_join_sections_round_trip():
+    """Test that blocks join back into the original text, with replacements in place."""
+    for resume in (RESUME, "Just one paragraph\nof text.", "## A\n\n## B\n\n\ntext\n", "## Skills\n### Tools\n- Git"):
+        sections = split_sections(resume)
+        assert join_sections(sections) == resume.strip()
+
+    sections = split_sections(RESUME)
+    texts = [section.text.upper() if section.kind == 'skills' else section.text for section in sections]
+    assert "PYTHON, SQL, SPARK\n\nEducation:" in join_sections(sections, texts)
+
+def test_resume_without_headings_is_one_block():
+    """Test that a resume without recognizable headings is optimized as a whole."""
+    sections = split_sections("John Doe\nBuilt things.\n\nMore things.")
+    assert len(sections) == 1
+    assert sections[0].kind == 'resume'
+    assert sections[0].optimize
+
+def test_strip_fences():
+    """Test that a fence around a whole completion is removed."""
+    assert strip_fences("```markdown\n- Built pipelines\n```") == "- Built pipelines"
+    assert strip_fences("  plain text \n") == "plain text"
+    assert strip_fences("a\n```\ncode\n```") == "a\n```\ncode\n```"
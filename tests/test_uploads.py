@@ -0,0 +1,82 @@
+import io
+import tracemalloc
+import pytest
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from uploads import receive_upload, spooled_file, file_path
+from document_extraction import DocumentExtractor
+from tests.test_document_extraction import make_pdf
+
+BOUNDARY = "----resume-upload"
+
+def multipart_environ(content, filename="resume.pdf", chunked=False, **fields):
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b"\r\n")
+    body = b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "CONTENT_TYPE": f"multipart/form-data; boundary={BOUNDARY}",
+        "wsgi.input": io.BytesIO(body),
+    }
+    if chunked:
+        # The server de-chunks the body and signals that it terminates the stream
+        environ["wsgi.input_terminated"] = True
+    else:
+        environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+def test_receive_upload_fields_and_spooling():
+    """Test that small files stay in memory, large ones are spooled to a named file on disk."""
+    form, upload = receive_upload(multipart_environ(b"John Doe", "resume.txt", job_description="Python"),
+                                  max_bytes=1024 * 1024, spool_bytes=1024)
+    assert form == {"job_description": "Python"}
+    assert upload.filename == "resume.txt"
+    assert upload.stream.read() == b"John Doe"
+    assert file_path(upload.stream) is None
+    upload.close()
+
+    form, upload = receive_upload(multipart_environ(b"x" * 10000), max_bytes=1024 * 1024, spool_bytes=1024)
+    path = file_path(upload.stream)
+    assert path is not None
+    with open(path, "rb") as f:
+        assert f.read() == b"x" * 10000
+    upload.close()
+
+def test_receive_upload_memory_stays_flat():
+    """Test that receiving a large upload holds about one spool buffer in memory, not the file."""
+    environ = multipart_environ(b"%PDF-" + b"0" * (8 * 1024 * 1024))
+    tracemalloc.start()
+    try:
+        _, upload = receive_upload(environ, max_bytes=16 * 1024 * 1024, spool_bytes=256 * 1024)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    upload.close()
+    assert peak < 2 * 1024 * 1024
+
+def test_receive_upload_limits():
+    """Test that the size limit applies to declared and to chunked uploads."""
+    with pytest.raises(RequestEntityTooLarge):
+        receive_upload(multipart_environ(b"x" * 5000), max_bytes=1000)
+    with pytest.raises(RequestEntityTooLarge):
+        receive_upload(multipart_environ(b"x" * 5000, chunked=True), max_bytes=1000)
+    with pytest.raises(BadRequest):
+        receive_upload({"CONTENT_TYPE": "application/json", "wsgi.input": io.BytesIO(b"{}")})
+
+def test_extract_spooled_pdf_in_parallel():
+    """Test that worker processes read a spooled PDF by path and match inline extraction."""
+    data = make_pdf(4)
+    upload = spooled_file(1024)
+    upload.write(data)
+    assert file_path(upload) is not None
+
+    extractor = DocumentExtractor(workers=2, parallel_min_pages=2)
+    try:
+        extraction = extractor.extract(upload, "resume.pdf")
+    finally:
+        extractor.shutdown()
+        upload.close()
+    assert extraction.pages == 4
+    assert extraction.text == DocumentExtractor(workers=1).extract(data).text
@@ -0,0 +1,77 @@
+from typing import Dict, Tuple, BinaryIO, Optional
+from tempfile import SpooledTemporaryFile, NamedTemporaryFile
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import BadRequest
+from werkzeug.formparser import FormDataParser
+from werkzeug.http import parse_options_header
+from werkzeug.wsgi import get_input_stream, get_content_length
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Largest non-file form field (job description, guidelines, ...) kept in memory
+MAX_FORM_FIELD_BYTES = 512 * 1024
+
+class SpooledUpload(SpooledTemporaryFile):
+    """A temporary file kept in memory up to `max_size` bytes and then moved to disk.
+
+    Unlike SpooledTemporaryFile it rolls over to a named file, so extraction worker
+    processes can open a large upload by path instead of receiving a copy of it.
+    """
+
+    def rollover(self):
+        if self._rolled:
+            return
+        memory = self._file
+        named = NamedTemporaryFile(mode="w+b", prefix="upload-", dir=Config.UPLOAD_TEMP_DIR or None)
+        named.write(memory.getbuffer())
+        named.seek(memory.tell())
+        memory.close()
+        self._file = named
+        self._rolled = True
+
+def spooled_file(spool_bytes: int = Config.UPLOAD_SPOOL_BYTES) -> SpooledUpload:
+    return SpooledUpload(max_size=spool_bytes, mode="w+b")
+
+def receive_upload(environ, field: str = "file", max_bytes: int = Config.MAX_UPLOAD_BYTES,
+                   spool_bytes: int = Config.UPLOAD_SPOOL_BYTES) -> Tuple[Dict[str, str], Optional[FileStorage]]:
+    """Parse a multipart request straight from the WSGI input stream.
+
+    The file part is written in chunks to a spooled temporary file, so at most
+    `spool_bytes` of it are held in memory. The request size limit is enforced while
+    the bytes arrive, for chunked requests as well, by raising RequestEntityTooLarge.
+
+    Returns the other form fields and the uploaded file, or None if `field` is missing.
+    The caller closes the file.
+    """
+    mimetype, options = parse_options_header(environ.get("CONTENT_TYPE", ""))
+    if mimetype != "multipart/form-data":
+        raise BadRequest("Uploads must be sent as multipart/form-data")
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        return spooled_file(spool_bytes)
+
+    parser = FormDataParser(
+        stream_factory=stream_factory,
+        max_form_memory_size=MAX_FORM_FIELD_BYTES,
+        max_content_length=max_bytes,
+        silent=False
+    )
+    stream = get_input_stream(environ, max_content_length=max_bytes)
+    try:
+        _, form, files = parser.parse(stream, mimetype, get_content_length(environ), options)
+    except ValueError as e:
+        raise BadRequest(f"Invalid multipart body: {str(e)}")
+
+    upload = files.get(field)
+    for name, other in files.items(multi=True):
+        if other is not upload:
+            other.close()
+    return form.to_dict(), upload
+
+def file_path(stream: BinaryIO) -> Optional[str]:
+    """Path of the file behind `stream` if it is on disk (a rolled-over spooled file), else None."""
+    stream = getattr(stream, "_file", stream)
+    name = getattr(stream, "name", None)
+    return name if isinstance(name, str) else None